@@ -1,2 +1,19 @@
 from .map_generator import MapGenerator
-from .tiff_processor import TiffProcessor
\ No newline at end of file
+from .tiff_processor import TiffProcessor
+from .vectorizer import GridVectorizer
+from .vector_tiles import VectorTileMapWriter
+from .raster_tiles import RasterTileMapWriter
+from .topojson_writer import TopoJsonMapWriter
+from .leaflet_writer import LeafletMapWriter
+from .basemap import BasemapTileStore
+from .backdrop import OrthophotoBackdrop
+from .map_server import MapServer, ServerMapWriter
+from .copy_engine import ParallelCopier
+from .ingest_manifest import IngestManifest
+from .frame_thinning import FrameThinner
+from .odm_planner import OdmProfilePlanner
+from .quick_look import QuickLookMapper
+from .odm_backend import OdmBackend, LocalDockerBackend, NodeOdmBackend, create_odm_backend
+from .odm_workspace import OdmWorkspaces, OdmRun
+from .odm_progress import OdmProgressTracker, OdmRunHistory
+from .mosaic import build_virtual_mosaic, mosaic_sources
\ No newline at end of file
@@ -0,0 +1,105 @@
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+import logging
+
+import numpy as np
+import rasterio
+from PIL import Image
+from rasterio.enums import ColorInterp, Resampling
+from rasterio.transform import from_bounds
+from rasterio.warp import reproject, transform_bounds
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+
+# Overviews are built down to roughly this size on the longest side
+OVERVIEW_MIN_SIZE = 256
+
+
+class Backdrop(NamedTuple):
+    """A rendered orthophoto image next to the map page and its WGS84 bounds."""
+    image: str
+    bounds_wgs84: Tuple[float, float, float, float]
+
+
+class OrthophotoBackdrop:
+    """Renders a low-resolution RGB backdrop of the orthophoto from its internal overviews."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.max_size = config.backdrop_max_size
+        self.logger.info("OrthophotoBackdrop initialized successfully")
+    
+    def build_overviews(self, orthophoto_path: Path) -> List[int]:
+        """Build internal average overviews once; later backdrops only read an overview level."""
+        with rasterio.open(orthophoto_path, "r+") as src:
+            factors = src.overviews(1)
+            if factors:
+                return factors
+            
+            factor = 2
+            while max(src.width, src.height) / factor >= OVERVIEW_MIN_SIZE:
+                factors.append(factor)
+                factor *= 2
+            if factors:
+                src.build_overviews(factors, Resampling.average)
+                src.update_tags(ns="rio_overview", resampling="average")
+                self.logger.info(f"Built overviews {factors} for {orthophoto_path.name}")
+        return factors
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def render(self, orthophoto_path: Path, output_path: Path) -> Backdrop:
+        """Write an RGBA PNG of the orthophoto in Web Mercator to output_path."""
+        factors = self.build_overviews(orthophoto_path)
+        with rasterio.open(orthophoto_path) as src:
+            size = max(src.width, src.height)
+        
+        # Smallest overview that still has at least max_size pixels on its longest side
+        open_options = {}
+        for level, factor in enumerate(factors):
+            if size / factor >= self.max_size:
+                open_options = {"overview_level": level}
+        
+        with rasterio.open(orthophoto_path, **open_options) as src:
+            rgb = src.read([1, 2, 3])
+            if src.count >= 4 and src.colorinterp[3] == ColorInterp.alpha:
+                alpha = src.read(4)
+            else:
+                alpha = src.dataset_mask()
+            if rgb.dtype != np.uint8:
+                rgb = self._stretch(rgb, alpha > 0)
+            
+            mercator_bounds = transform_bounds(src.crs, "EPSG:3857", *src.bounds)
+            west, south, east, north = mercator_bounds
+            scale = min(self.max_size, max(src.width, src.height)) / max(east - west, north - south)
+            width = max(1, int(round((east - west) * scale)))
+            height = max(1, int(round((north - south) * scale)))
+            dst_transform = from_bounds(*mercator_bounds, width, height)
+            
+            rgba = np.zeros((4, height, width), dtype=np.uint8)
+            warp = dict(
+                src_transform=src.transform,
+                src_crs=src.crs,
+                dst_transform=dst_transform,
+                dst_crs="EPSG:3857"
+            )
+            reproject(source=rgb, destination=rgba[:3], resampling=Resampling.bilinear, **warp)
+            reproject(source=alpha, destination=rgba[3], resampling=Resampling.nearest, **warp)
+        
+        Image.fromarray(np.moveaxis(rgba, 0, -1), "RGBA").save(output_path)
+        level = open_options.get("overview_level")
+        source = "full resolution" if level is None else f"overview level {level}"
+        self.logger.info(f"Orthophoto backdrop {width}x{height} rendered from {source}")
+        return Backdrop(output_path.name, transform_bounds("EPSG:3857", "EPSG:4326", *mercator_bounds))
+    
+    @staticmethod
+    def _stretch(rgb: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """2-98 percentile stretch of non-8-bit imagery to uint8."""
+        stretched = np.zeros(rgb.shape, dtype=np.uint8)
+        for i, band in enumerate(rgb):
+            values = band[valid] if valid.any() else band.ravel()
+            low, high = np.percentile(values, (2, 98))
+            scaled = (band.astype(np.float32) - low) / max(high - low, 1e-6) * 255
+            stretched[i] = np.clip(scaled, 0, 255).astype(np.uint8)
+        return stretched
@@ -0,0 +1,172 @@
+from pathlib import Path
+from typing import Optional
+import logging
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+
+from rasterio.warp import transform_bounds
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.vector_tiles import tile_range
+
+USER_AGENT = "Research_Prepare sugarcane growth map"
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER,
+    tile_column INTEGER,
+    tile_row INTEGER,
+    tile_data BLOB,
+    last_access REAL,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles (last_access);
+"""
+
+
+class BasemapTileStore:
+    """
+    Local basemap tiles: a read-only MBTiles file first, then an MBTiles-format tile
+    cache that can fetch a bounded number of missing tiles from the tile server and
+    is capped by evicting the least recently used tiles.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.mbtiles_path = config.basemap_mbtiles_path
+        self.cache_path = config.basemap_cache_path
+        self.logger.info("BasemapTileStore initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def export(self, bounds_wgs84, tiles_dir: Path) -> int:
+        """
+        Write every basemap tile covering bounds_wgs84 (map_min_zoom..basemap_max_zoom)
+        to tiles_dir/{z}/{x}/{y}.png so the map page only reads local files. Missing tiles
+        are fetched only if enabled, up to basemap_fetch_max_zoom and basemap_fetch_max_tiles.
+        """
+        mercator_bounds = transform_bounds("EPSG:4326", "EPSG:3857", *bounds_wgs84)
+        fetch_missing = self.config.basemap_cache_enabled and self.config.basemap_fetch_missing
+        fetch_budget = self.config.basemap_fetch_max_tiles
+        source = self._open_source()
+        cache = self._open_cache() if self.config.basemap_cache_enabled else None
+        counts = {"mbtiles": 0, "cache": 0, "fetched": 0, "missing": 0}
+        
+        try:
+            for zoom in range(self.config.map_min_zoom, self.config.basemap_max_zoom + 1):
+                for x, y in tile_range(mercator_bounds, zoom):
+                    data, origin = self._lookup(source, cache, zoom, x, y)
+                    fetchable = data is None and fetch_missing and zoom <= self.config.basemap_fetch_max_zoom
+                    if fetchable and fetch_budget <= 0:
+                        self.logger.warning(
+                            f"Fetched {self.config.basemap_fetch_max_tiles} basemap tiles for this map; not fetching more"
+                        )
+                        fetch_missing = fetchable = False
+                    if fetchable:
+                        fetch_budget -= 1
+                        try:
+                            data = self._fetch(zoom, x, y)
+                        except (urllib.error.URLError, OSError) as e:
+                            # Offline: do not wait on the network again for this map
+                            self.logger.warning(f"Basemap tile server unreachable ({e}); using local tiles only")
+                            fetch_missing = False
+                        if data is not None:
+                            self._cache_put(cache, zoom, x, y, data)
+                            origin = "fetched"
+                    if data is None:
+                        counts["missing"] += 1
+                        continue
+                    
+                    counts[origin] += 1
+                    # Browsers sniff the image type, so JPEG/WebP MBTiles tiles work under .png too
+                    tile_path = tiles_dir / str(zoom) / str(x) / f"{y}.png"
+                    tile_path.parent.mkdir(parents=True, exist_ok=True)
+                    tile_path.write_bytes(data)
+            
+            if cache is not None:
+                cache.commit()
+                self._evict(cache, self._exported_bytes(tiles_dir.parent))
+        finally:
+            if source is not None:
+                source.close()
+            if cache is not None:
+                cache.close()
+        
+        self.logger.info(
+            f"Basemap tiles: {counts['mbtiles']} from MBTiles, {counts['cache']} from cache, "
+            f"{counts['fetched']} fetched, {counts['missing']} unavailable"
+        )
+        return counts["mbtiles"] + counts["cache"] + counts["fetched"]
+    
+    def _open_source(self) -> Optional[sqlite3.Connection]:
+        if self.mbtiles_path is None:
+            return None
+        return sqlite3.connect(f"{self.mbtiles_path.resolve().as_uri()}?mode=ro", uri=True)
+    
+    def _open_cache(self) -> sqlite3.Connection:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache = sqlite3.connect(self.cache_path)
+        cache.executescript(CACHE_SCHEMA)
+        cache.execute("INSERT OR IGNORE INTO metadata VALUES ('name', 'basemap cache'), ('format', 'png')")
+        return cache
+    
+    def _lookup(self, source, cache, zoom: int, x: int, y: int):
+        # MBTiles rows are in TMS order (y counted from the south)
+        key = (zoom, x, 2 ** zoom - 1 - y)
+        query = "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?"
+        if source is not None:
+            row = source.execute(query, key).fetchone()
+            if row is not None:
+                return row[0], "mbtiles"
+        if cache is not None:
+            row = cache.execute(query, key).fetchone()
+            if row is not None:
+                cache.execute(
+                    "UPDATE tiles SET last_access = ? WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                    (time.time(), *key)
+                )
+                return row[0], "cache"
+        return None, None
+    
+    def _fetch(self, zoom: int, x: int, y: int) -> Optional[bytes]:
+        """Download one tile; connection failures propagate so the caller can stop fetching."""
+        url = self.config.basemap_tile_url.format(z=zoom, x=x, y=y)
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=self.config.basemap_fetch_timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            self.logger.debug(f"Basemap tile {zoom}/{x}/{y} not served: {e}")
+            return None
+    
+    def _cache_put(self, cache, zoom: int, x: int, y: int, data: bytes):
+        cache.execute(
+            "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)",
+            (zoom, x, 2 ** zoom - 1 - y, data, time.time())
+        )
+    
+    @staticmethod
+    def _exported_bytes(maps_dir: Path) -> int:
+        """Size of the basemap tiles exported next to the maps in maps_dir."""
+        return sum(path.stat().st_size for path in maps_dir.glob("*_basemap/*/*/*.png"))
+    
+    def _evict(self, cache: sqlite3.Connection, exported_bytes: int = 0):
+        """Drop least recently used tiles until the cache and the exported copies fit basemap_cache_max_bytes."""
+        total = cache.execute("SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles").fetchone()[0]
+        excess = total + exported_bytes - self.config.basemap_cache_max_bytes
+        if excess <= 0:
+            return
+        
+        evict = []
+        for rowid, size in cache.execute("SELECT rowid, LENGTH(tile_data) FROM tiles ORDER BY last_access"):
+            evict.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        cache.executemany("DELETE FROM tiles WHERE rowid = ?", evict)
+        cache.commit()
+        self.logger.info(f"Evicted {len(evict)} least recently used basemap tiles from the cache")
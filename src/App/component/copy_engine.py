@@ -0,0 +1,90 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Sequence, Tuple
+import logging
+
+# Bytes per kernel copy call; also the granularity of progress callbacks
+COPY_CHUNK = 32 * 1024 * 1024
+FALLBACK_BUFFER = 1024 * 1024
+
+
+class ParallelCopier:
+    """
+    Copies files on a bounded thread pool with kernel-side copies
+    (copy_file_range, then sendfile), falling back to buffered reads.
+    """
+    
+    def __init__(self, workers: int):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(1, workers)
+    
+    def copy_files(self, jobs: Sequence[Tuple[str, str]], on_bytes: Callable[[int], None]):
+        """Copy every (src, dest) pair; on_bytes is called from worker threads with each chunk size."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy") as pool:
+            futures = [pool.submit(self.copy_file, src, dest, on_bytes) for src, dest in jobs]
+            for future in as_completed(futures):
+                future.result()
+    
+    def copy_file(self, src_path: str, dest_path: str, on_bytes: Callable[[int], None]):
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+            size = os.fstat(src.fileno()).st_size
+            offset = 0
+            for copy in (self._copy_file_range, self._sendfile):
+                try:
+                    offset = copy(src.fileno(), dest.fileno(), size, on_bytes)
+                    break
+                except OSError as e:
+                    # Only switch strategy if nothing was written yet
+                    if os.fstat(dest.fileno()).st_size:
+                        raise
+                    self.logger.debug(f"{copy.__name__} unavailable for {src_path}: {e}")
+            if offset < size:
+                # Kernel copies may stop short (FUSE, NFS/SMB, some cross-filesystem copies)
+                if offset:
+                    self.logger.debug(f"Kernel copy of {src_path} stopped at {offset} of {size} bytes; continuing buffered")
+                self._buffered(src.fileno(), dest.fileno(), offset, on_bytes)
+            copied = os.fstat(dest.fileno()).st_size
+            if copied != size:
+                raise OSError(f"Incomplete copy of {src_path}: {copied} of {size} bytes")
+        shutil.copystat(src_path, dest_path)
+    
+    @staticmethod
+    def _copy_file_range(src_fd: int, dest_fd: int, size: int, on_bytes) -> int:
+        if not hasattr(os, "copy_file_range"):
+            raise OSError("copy_file_range not available")
+        offset = 0
+        while offset < size:
+            copied = os.copy_file_range(src_fd, dest_fd, min(COPY_CHUNK, size - offset), offset, offset)
+            if copied == 0:
+                break
+            offset += copied
+            on_bytes(copied)
+        return offset
+    
+    @staticmethod
+    def _sendfile(src_fd: int, dest_fd: int, size: int, on_bytes) -> int:
+        if not hasattr(os, "sendfile"):
+            raise OSError("sendfile not available")
+        offset = 0
+        while offset < size:
+            copied = os.sendfile(dest_fd, src_fd, offset, min(COPY_CHUNK, size - offset))
+            if copied == 0:
+                break
+            offset += copied
+            on_bytes(copied)
+        return offset
+    
+    @staticmethod
+    def _buffered(src_fd: int, dest_fd: int, offset: int, on_bytes):
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dest_fd, offset, os.SEEK_SET)
+        while True:
+            chunk = os.read(src_fd, FALLBACK_BUFFER)
+            if not chunk:
+                break
+            view = memoryview(chunk)
+            while view:
+                written = os.write(dest_fd, view)
+                view = view[written:]
+            on_bytes(len(chunk))
@@ -0,0 +1,161 @@
+import math
+from typing import Dict, List, NamedTuple, Set
+import logging
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+from shapely.affinity import rotate
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+
+# ODM runtime grows roughly as n^1.3 with the number of images (feature matching dominates)
+ODM_SCALING_EXPONENT = 1.3
+# A bearing change larger than this between consecutive captures starts a new flight line
+LINE_TURN_DEGREES = 30.0
+# A dropped capture is restored if the kept footprints cover less of it than this
+MIN_COVERAGE = 0.98
+
+
+class Capture(NamedTuple):
+    """One camera trigger: all band images sharing a position and capture time."""
+    dests: List[str]
+    size: int
+    x: float
+    y: float
+    height: float
+
+
+class ThinningResult(NamedTuple):
+    kept: Set[str]
+    removed: List[str]
+    report: str
+
+
+class FrameThinner:
+    """
+    Drops redundant captures before ODM: footprints are estimated from the EXIF GPS
+    position and altitude, and along each flight line only as many captures are kept
+    as needed for neighbouring footprints to overlap by target_overlap.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.target_overlap = config.thinning_target_overlap
+        self.flight_height = config.flight_height
+        self.fov_across, self.fov_along = config.camera_fov
+        self.logger.info(f"FrameThinner initialized with target overlap {self.target_overlap:.0%}")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def thin(self, frames: List[dict]) -> ThinningResult:
+        """frames are ingest manifest rows; returns the destination names to keep."""
+        located = [frame for frame in frames if frame["gps_lat"] is not None and frame["gps_lon"] is not None]
+        # Images without a position cannot be judged and are always kept
+        kept = {frame["dest"] for frame in frames if frame["gps_lat"] is None or frame["gps_lon"] is None}
+        captures = self._captures(located)
+        if len(captures) < 3:
+            kept.update(dest for capture in captures for dest in capture.dests)
+            return ThinningResult(kept, [], "Frame thinning: too few geotagged captures, all kept")
+        
+        keep = np.zeros(len(captures), dtype=bool)
+        footprints = np.empty(len(captures), dtype=object)
+        for line in self._flight_lines(captures):
+            bearing = self._bearing(captures[line[0]], captures[line[-1]])
+            for i in line:
+                footprints[i] = self._footprint(captures[i], bearing)
+            keep[line[0]] = keep[line[-1]] = True
+            last = line[0]
+            for current, following in zip(line[1:-1], line[2:]):
+                # current is redundant if its neighbours still overlap enough without it
+                if self._overlap(footprints[last], footprints[following]) < self.target_overlap:
+                    keep[current] = True
+                    last = current
+        
+        # Never open a hole: restore captures whose ground the kept footprints do not cover
+        tree = shapely.STRtree(footprints[keep])
+        kept_footprints = footprints[keep]
+        for i in np.flatnonzero(~keep):
+            neighbours = kept_footprints[tree.query(footprints[i], predicate="intersects")]
+            covered = shapely.union_all(shapely.intersection(neighbours, footprints[i])).area if len(neighbours) else 0.0
+            if covered / footprints[i].area < MIN_COVERAGE:
+                keep[i] = True
+        
+        removed = [dest for capture, k in zip(captures, keep) if not k for dest in capture.dests]
+        kept.update(dest for capture, k in zip(captures, keep) if k for dest in capture.dests)
+        return ThinningResult(kept, removed, self._report(captures, keep, len(frames), len(removed)))
+    
+    def _captures(self, frames: List[dict]) -> List[Capture]:
+        """Group band images into captures in flight order and project them to metres."""
+        groups: Dict[tuple, List[dict]] = {}
+        for frame in sorted(frames, key=lambda frame: (frame["taken_at"] or "", frame["path"])):
+            key = (frame["taken_at"], round(frame["gps_lat"], 7), round(frame["gps_lon"], 7))
+            groups.setdefault(key, []).append(frame)
+        
+        lats = np.array([group[0]["gps_lat"] for group in groups.values()])
+        lons = np.array([group[0]["gps_lon"] for group in groups.values()])
+        # Azimuthal equidistant projection around the flight keeps distances true in metres
+        transformer = Transformer.from_crs(
+            "EPSG:4326", f"+proj=aeqd +lat_0={lats.mean()} +lon_0={lons.mean()} +units=m", always_xy=True
+        )
+        xs, ys = transformer.transform(lons, lats)
+        altitudes = [group[0]["gps_alt"] for group in groups.values()]
+        median_altitude = float(np.median([a for a in altitudes if a is not None] or [0.0]))
+        
+        captures = []
+        for group, x, y, altitude in zip(groups.values(), xs, ys, altitudes):
+            # flight_height is above ground at the median altitude; follow each capture's deviation
+            height = self.flight_height + ((altitude - median_altitude) if altitude is not None else 0.0)
+            captures.append(Capture(
+                [frame["dest"] for frame in group], sum(frame["size"] for frame in group),
+                float(x), float(y), max(height, 1.0)
+            ))
+        return captures
+    
+    def _flight_lines(self, captures: List[Capture]) -> List[List[int]]:
+        """Split the capture sequence where the bearing turns by more than LINE_TURN_DEGREES."""
+        lines = [[0]]
+        line_bearing = None
+        for i in range(1, len(captures)):
+            bearing = self._bearing(captures[i - 1], captures[i])
+            if line_bearing is not None and self._angle(bearing, line_bearing) > LINE_TURN_DEGREES:
+                lines.append([i])
+                line_bearing = None
+                continue
+            lines[-1].append(i)
+            if line_bearing is None:
+                line_bearing = bearing
+        return lines
+    
+    def _footprint(self, capture: Capture, bearing: float) -> shapely.Polygon:
+        half_across = capture.height * math.tan(math.radians(self.fov_across) / 2)
+        half_along = capture.height * math.tan(math.radians(self.fov_along) / 2)
+        footprint = shapely.box(
+            capture.x - half_across, capture.y - half_along, capture.x + half_across, capture.y + half_along
+        )
+        # The long side of the image is across track
+        return rotate(footprint, -bearing, origin=(capture.x, capture.y))
+    
+    @staticmethod
+    def _overlap(a: shapely.Polygon, b: shapely.Polygon) -> float:
+        return a.intersection(b).area / a.area
+    
+    @staticmethod
+    def _bearing(a: Capture, b: Capture) -> float:
+        """Compass bearing from a to b in degrees."""
+        return math.degrees(math.atan2(b.x - a.x, b.y - a.y)) % 360
+    
+    @staticmethod
+    def _angle(a: float, b: float) -> float:
+        return abs((a - b + 180) % 360 - 180)
+    
+    def _report(self, captures: List[Capture], keep: np.ndarray, frame_count: int, removed_count: int) -> str:
+        removed_bytes = sum(capture.size for capture, k in zip(captures, keep) if not k)
+        kept_ratio = (frame_count - removed_count) / frame_count
+        saving = 1 - kept_ratio ** ODM_SCALING_EXPONENT
+        return (
+            f"Frame thinning to {self.target_overlap:.0%} overlap: removed {int((~keep).sum())} of "
+            f"{len(captures)} captures ({removed_count} of {frame_count} images, "
+            f"{removed_bytes / 1e9:.2f} GB); expected ODM time saving ~{saving:.0%}"
+        )
@@ -0,0 +1,107 @@
+import errno
+import os
+import shutil
+import sys
+from collections import Counter
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from src.App.config import Config
+from src.App.component.copy_engine import ParallelCopier
+
+INGEST_METHODS = ("hardlink", "reflink", "symlink", "copy")
+# ioctl(dest_fd, FICLONE, src_fd) shares extents on btrfs/XFS/bcachefs (Linux)
+FICLONE = 0x40049409
+
+
+class ImageIngest:
+    """
+    Places source images into the ODM image directory without copying bytes when
+    possible: hardlink, reflink, or symlink with the source directory mounted
+    read-only into the ODM container. Falls back to a copy.
+    """
+    
+    def __init__(self, config: Config):
+        self.logger = logging.getLogger(__name__)
+        mode = config.ingest_mode
+        methods = INGEST_METHODS if mode == "auto" else (mode, "copy")
+        if os.name == "nt":
+            # Docker Desktop cannot mount host paths at the same path inside the container
+            methods = tuple(method for method in methods if method != "symlink")
+        self.methods = tuple(dict.fromkeys(methods))
+        self.counts = Counter()
+        self.copier = ParallelCopier(config.ingest_copy_workers)
+        # (method, st_dev of the source) pairs that already failed
+        self._failed: Set[Tuple[str, int]] = set()
+        self.logger.info(f"ImageIngest initialized with methods {self.methods}")
+    
+    def link(self, src_path: str, dest_path: str) -> Optional[str]:
+        """Link src_path at dest_path without copying; return the method used, or None."""
+        device = os.stat(src_path).st_dev
+        for method in self.methods:
+            if method == "copy" or (method, device) in self._failed:
+                continue
+            try:
+                getattr(self, f"_{method}")(src_path, dest_path)
+            except OSError as e:
+                self.logger.info(f"{method} not possible for {src_path} ({e}); trying next method")
+                self._failed.add((method, device))
+                if os.path.lexists(dest_path):
+                    os.unlink(dest_path)
+                continue
+            
+            self.counts[method] += 1
+            return method
+        return None
+    
+    def copy_files(self, jobs: Sequence[Tuple[str, str]], on_bytes: Callable[[int], None]):
+        """Copy the (src, dest) pairs that could not be linked, in parallel."""
+        self.copier.copy_files(jobs, on_bytes)
+        self.counts["copy"] += len(jobs)
+    
+    def place(self, src_path: str, dest_path: str) -> str:
+        """Put src_path at dest_path and return the method used."""
+        method = self.link(src_path, dest_path)
+        if method is None:
+            self.copier.copy_file(src_path, dest_path, lambda size: None)
+            self.counts["copy"] += 1
+            method = "copy"
+        return method
+    
+    @staticmethod
+    def mounts(images_dir: str) -> List[str]:
+        """
+        Directories the ODM container must mount read-only (at the same path) for the
+        symlinks in images_dir, including those kept from earlier ingests.
+        """
+        directories = set()
+        for entry in os.scandir(images_dir):
+            if entry.is_symlink():
+                target = os.path.join(images_dir, os.readlink(entry.path))
+                directories.add(os.path.dirname(os.path.normpath(target)))
+        mounts = []
+        for directory in sorted(directories):
+            if not any(directory.startswith(parent.rstrip(os.sep) + os.sep) for parent in mounts):
+                mounts.append(directory)
+        return mounts
+    
+    def summary(self) -> str:
+        return ", ".join(f"{count} {method}" for method, count in self.counts.items()) or "no files"
+    
+    def _hardlink(self, src_path: str, dest_path: str):
+        os.link(src_path, dest_path)
+    
+    def _reflink(self, src_path: str, dest_path: str):
+        if fcntl is None or not sys.platform.startswith("linux"):
+            raise OSError(errno.EOPNOTSUPP, "reflinks are only supported on Linux")
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        shutil.copystat(src_path, dest_path)
+    
+    def _symlink(self, src_path: str, dest_path: str):
+        os.symlink(os.path.abspath(src_path), dest_path)
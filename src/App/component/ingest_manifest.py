@@ -0,0 +1,308 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+
+import exifread
+
+from src.App.config import Config
+
+IMAGE_EXTENSIONS = ('.tif', '.tiff')
+# Bytes hashed at each end of a file; with the size this identifies drone frames cheaply
+FAST_HASH_BLOCK = 256 * 1024
+IMAGE_NAME = re.compile(r"image_(\d+)\.")
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    fast_hash TEXT,
+    dest TEXT,
+    gps_lat REAL,
+    gps_lon REAL,
+    gps_alt REAL,
+    taken_at TEXT,
+    camera TEXT,
+    focal_length REAL,
+    width INTEGER,
+    height INTEGER,
+    heading REAL,
+    band_name TEXT
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    file_count INTEGER,
+    total_bytes INTEGER,
+    scanned_at REAL
+);
+"""
+EXIF_COLUMNS = (
+    "gps_lat", "gps_lon", "gps_alt", "taken_at", "camera", "focal_length", "width", "height", "heading", "band_name"
+)
+# Yaw and band name in the XMP packet (TIFF tag 700) of MicaSense and DJI multispectral frames
+XMP_YAW_DEGREES = re.compile(rb'(?:FlightYawDegree|GimbalYawDegree)(?:="|>)\s*([-+\d.]+)')
+XMP_YAW_RADIANS = re.compile(rb'DLS:Yaw(?:="|>)\s*([-+\d.eE]+)')
+XMP_BAND_NAME = re.compile(rb'Camera:BandName(?:="|>)\s*([^"<]+)')
+TEXT_COLUMNS = ("taken_at", "camera", "band_name")
+
+
+class SourceFile(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class IngestPlan(NamedTuple):
+    """What a re-ingest has to do to make the image directory match the selected sources."""
+    unchanged: List[str]
+    to_place: List[Tuple[SourceFile, str]]
+    duplicates: List[str]
+
+
+class DirectorySummary(NamedTuple):
+    file_count: int
+    total_bytes: int
+    scanned_at: float
+    stale: bool
+
+
+class IngestManifest:
+    """
+    SQLite manifest of ingested source images (size, mtime, fast content hash and
+    EXIF fields) and of scanned directories, so a re-ingest only places new or
+    changed files and directory totals are known without walking the disk.
+    """
+    
+    def __init__(self, config: Config):
+        self.logger = logging.getLogger(__name__)
+        self.path = config.ingest_manifest_path
+        with closing(self._connect()):
+            pass
+        self.logger.info(f"IngestManifest initialized at {self.path}")
+    
+    def scan(self, directories: Iterable[str], progress: Optional[Callable[[int], None]] = None) -> List[SourceFile]:
+        """Stat every TIFF under directories and record per-directory totals; progress gets the images found so far."""
+        files: List[SourceFile] = []
+        scanned = []
+        stack = [os.path.abspath(directory) for directory in reversed(list(directories))]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError as e:
+                self.logger.warning(f"Cannot scan {directory}: {e}")
+                continue
+            
+            count = size = 0
+            subdirectories = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    files.append(SourceFile(entry.path, stat.st_size, stat.st_mtime_ns))
+                    count += 1
+                    size += stat.st_size
+            stack.extend(reversed(subdirectories))
+            scanned.append((directory, mtime_ns, count, size, time.time()))
+            if progress is not None:
+                progress(len(files))
+        
+        with closing(self._connect()) as db, db:
+            db.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)", scanned)
+        self.logger.info(f"Scanned {len(scanned)} directories: {len(files)} images")
+        return files
+    
+    def directory_summary(self, directory: str) -> Optional[DirectorySummary]:
+        """Totals of the last scan of directory and its subdirectories, or None if never scanned."""
+        directory = os.path.abspath(directory)
+        prefix = directory.rstrip(os.sep) + os.sep
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT path, mtime_ns, file_count, total_bytes, scanned_at FROM directories "
+                "WHERE path = ? OR substr(path, 1, ?) = ?",
+                (directory, len(prefix), prefix)
+            ).fetchall()
+        if not rows:
+            return None
+        
+        # Adding or removing entries changes a directory's mtime; no need to list files
+        stale = False
+        for path, mtime_ns, _, _, _ in rows:
+            try:
+                stale = os.stat(path).st_mtime_ns != mtime_ns
+            except OSError:
+                stale = True
+            if stale:
+                break
+        return DirectorySummary(
+            sum(row[2] for row in rows), sum(row[3] for row in rows), min(row[4] for row in rows), stale
+        )
+    
+    def plan(self, files: List[SourceFile], images_dir: str,
+             progress: Optional[Callable[[int, int], None]] = None) -> IngestPlan:
+        """
+        Compare the scanned sources with the manifest and the image directory. New and
+        changed files are hashed and their EXIF read; destination names stay stable.
+        progress gets (files checked, total) after each file.
+        """
+        unchanged, to_place, duplicates = [], [], []
+        with closing(self._connect()) as db, db:
+            known: Dict[str, tuple] = {
+                row[0]: row for row in db.execute("SELECT path, size, mtime_ns, fast_hash, dest FROM files")
+            }
+            numbers = [int(m.group(1)) for row in known.values() if row[4] and (m := IMAGE_NAME.match(row[4]))]
+            next_number = max(numbers, default=0) + 1
+            selected = set()
+            hashes = set()
+            
+            for i, source in enumerate(files, 1):
+                if progress is not None:
+                    progress(i, len(files))
+                row = known.get(source.path)
+                dest = row[4] if row else None
+                changed = False
+                if row is not None and (row[1], row[2]) == (source.size, source.mtime_ns):
+                    fast_hash = row[3]
+                else:
+                    fast_hash = self.fast_hash(source.path)
+                    # A touched but identical file keeps its placed copy
+                    changed = row is None or (row[1], row[3]) != (source.size, fast_hash)
+                    self._record(db, source, fast_hash, self.read_exif(source.path))
+                
+                if fast_hash in hashes:
+                    duplicates.append(source.path)
+                    continue
+                hashes.add(fast_hash)
+                
+                if dest is None:
+                    dest = f"image_{next_number:04d}{os.path.splitext(source.path)[1]}"
+                    next_number += 1
+                    db.execute("UPDATE files SET dest = ? WHERE path = ?", (dest, source.path))
+                selected.add(source.path)
+                
+                dest_path = os.path.join(images_dir, dest)
+                if not changed and os.path.exists(dest_path) and os.stat(dest_path).st_size == source.size:
+                    unchanged.append(dest)
+                else:
+                    to_place.append((source, dest))
+            
+            # Sources that are no longer selected give up their destination name
+            db.executemany(
+                "UPDATE files SET dest = NULL WHERE path = ?",
+                [(path,) for path, row in known.items() if row[4] and path not in selected]
+            )
+        
+        self.logger.info(
+            f"Ingest plan: {len(unchanged)} unchanged, {len(to_place)} to place, {len(duplicates)} duplicates"
+        )
+        return IngestPlan(unchanged, to_place, duplicates)
+    
+    def frames(self) -> List[dict]:
+        """Manifest rows, with EXIF fields, of the images placed by the latest plan."""
+        with closing(self._connect()) as db:
+            db.row_factory = sqlite3.Row
+            return [dict(row) for row in db.execute("SELECT * FROM files WHERE dest IS NOT NULL ORDER BY path")]
+    
+    @staticmethod
+    def fast_hash(path: str) -> str:
+        """BLAKE2 of the size and the first and last FAST_HASH_BLOCK bytes."""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            digest.update(size.to_bytes(8, "little"))
+            digest.update(f.read(FAST_HASH_BLOCK))
+            if size > 2 * FAST_HASH_BLOCK:
+                f.seek(-FAST_HASH_BLOCK, os.SEEK_END)
+                digest.update(f.read(FAST_HASH_BLOCK))
+        return digest.hexdigest()
+    
+    def read_exif(self, path: str) -> Dict[str, object]:
+        """GPS position, capture time, camera and image size from the EXIF tags."""
+        try:
+            with open(path, "rb") as f:
+                tags = exifread.process_file(f, details=False)
+        except Exception as e:
+            self.logger.warning(f"Cannot read EXIF of {path}: {e}")
+            return {}
+        
+        def number(tag):
+            values = getattr(tags.get(tag), "values", None)
+            if not values:
+                return None
+            return [float(v.num) / v.den if hasattr(v, "den") else float(v) for v in values if getattr(v, "den", 1)]
+        
+        def coordinate(tag, negative_ref):
+            values = number(tag)
+            if not values:
+                return None
+            degrees = sum(value / 60 ** i for i, value in enumerate(values[:3]))
+            return -degrees if str(tags.get(f"{tag}Ref", "")).strip() == negative_ref else degrees
+        
+        altitude = number("GPS GPSAltitude")
+        if altitude and str(tags.get("GPS GPSAltitudeRef", "0")).strip() == "1":
+            altitude = [-altitude[0]]
+        focal_length = number("EXIF FocalLength")
+        width = number("Image ImageWidth") or number("EXIF ExifImageWidth")
+        height = number("Image ImageLength") or number("EXIF ExifImageLength")
+        taken_at = tags.get("EXIF DateTimeOriginal") or tags.get("Image DateTime")
+        heading = number("GPS GPSImgDirection")
+        xmp = bytes(getattr(tags.get("Image ApplicationNotes"), "values", None) or b"")
+        band_name = XMP_BAND_NAME.search(xmp)
+        if not heading:
+            yaw = XMP_YAW_DEGREES.search(xmp)
+            yaw_radians = XMP_YAW_RADIANS.search(xmp)
+            if yaw:
+                heading = [float(yaw.group(1))]
+            elif yaw_radians:
+                heading = [math.degrees(float(yaw_radians.group(1)))]
+        camera = " ".join(str(tags[tag]).strip() for tag in ("Image Make", "Image Model") if tag in tags)
+        return {
+            "gps_lat": coordinate("GPS GPSLatitude", "S"),
+            "gps_lon": coordinate("GPS GPSLongitude", "W"),
+            "gps_alt": altitude[0] if altitude else None,
+            "taken_at": str(taken_at) if taken_at else None,
+            "camera": camera or None,
+            "focal_length": focal_length[0] if focal_length else None,
+            "width": int(width[0]) if width else None,
+            "height": int(height[0]) if height else None,
+            "heading": heading[0] % 360 if heading else None,
+            "band_name": band_name.group(1).decode("utf-8", "replace").strip() if band_name else None
+        }
+    
+    def _record(self, db: sqlite3.Connection, source: SourceFile, fast_hash: str, exif: Dict[str, object]):
+        db.execute(
+            "INSERT INTO files (path, directory, size, mtime_ns, fast_hash) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "fast_hash = excluded.fast_hash",
+            (source.path, os.path.dirname(source.path), source.size, source.mtime_ns, fast_hash)
+        )
+        db.execute(
+            f"UPDATE files SET {', '.join(f'{column} = ?' for column in EXIF_COLUMNS)} WHERE path = ?",
+            (*(exif.get(column) for column in EXIF_COLUMNS), source.path)
+        )
+    
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        db.executescript(MANIFEST_SCHEMA)
+        # Add columns missing from older manifests and have every file's EXIF read again once
+        columns = {row[1] for row in db.execute("PRAGMA table_info(files)")}
+        missing = [column for column in EXIF_COLUMNS if column not in columns]
+        if missing:
+            with db:
+                for column in missing:
+                    db.execute(f"ALTER TABLE files ADD COLUMN {column} {'TEXT' if column in TEXT_COLUMNS else 'REAL'}")
+                db.execute("UPDATE files SET mtime_ns = NULL")
+        return db
@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+import logging
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.web_map import leaflet_page_parts
+
+# Features per L.geoJSON addData() call, so the page parses the data incrementally
+FEATURE_CHUNK = 2000
+# ~1 cm at the equator
+COORDINATE_DECIMALS = 7
+
+
+class LeafletMapWriter:
+    """
+    Streams growth-stage features into a prebuilt Leaflet page. Styling is a single
+    JS lookup on growth_stage, so nothing is evaluated in Python per feature.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.logger.info("LeafletMapWriter initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def write_map(self, geo_data: gpd.GeoDataFrame, output_path: Path, bounds_wgs84=None, backdrop=None) -> Path:
+        """Write the HTML map for geo_data, which must be in EPSG:4326."""
+        bounds = bounds_wgs84 if bounds_wgs84 is not None else geo_data.total_bounds
+        head, tail = leaflet_page_parts(self.config, output_path.stem, bounds, backdrop=backdrop)
+        
+        geometries = shapely.transform(
+            geo_data.geometry.values, lambda coords: np.round(coords, COORDINATE_DECIMALS)
+        )
+        properties = geo_data.drop(columns=geo_data.geometry.name).astype(str).to_dict("records")
+        
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(head)
+            f.write("""
+var stageLayer = L.geoJSON(null, {
+    style: function (feature) { return stageStyle(feature.properties); },
+    onEachFeature: function (feature, layer) { layer.bindTooltip(feature.properties.growth_stage); }
+}).addTo(map);
+""")
+            for start in range(0, len(geometries), FEATURE_CHUNK):
+                chunk = shapely.to_geojson(geometries[start:start + FEATURE_CHUNK])
+                f.write('stageLayer.addData({"type":"FeatureCollection","features":[')
+                f.write(",".join(
+                    f'{{"type":"Feature","properties":{json.dumps(props)},"geometry":{geometry}}}'
+                    for props, geometry in zip(properties[start:start + FEATURE_CHUNK], chunk)
+                ))
+                f.write("]});\n")
+            f.write(tail)
+        
+        self.logger.info(f"Streamed {len(geometries)} features into {output_path}")
+        return output_path
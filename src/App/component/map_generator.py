@@ -1,13 +1,24 @@
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 import geopandas as gpd
-from folium import Map, GeoJson, GeoJsonTooltip
+from folium import Map, GeoJson, GeoJsonTooltip, LayerControl
+from folium.raster_layers import ImageOverlay
 import logging
+import os
 import shutil
 from datetime import datetime
 
 from src.App.utils import log_execution_time
 from src.App.config import Config
+from src.App.component.vector_tiles import VectorTileMapWriter
+from src.App.component.raster_tiles import RasterTileMapWriter
+from src.App.component.topojson_writer import TopoJsonMapWriter
+from src.App.component.leaflet_writer import LeafletMapWriter
+from src.App.component.web_map import asset_url, basemap_url
+from src.App.component.basemap import BasemapTileStore
+from src.App.component.backdrop import OrthophotoBackdrop
+from src.App.component.map_server import ServerMapWriter
+from src.App.component.mosaic import build_virtual_mosaic, mosaic_sources
 
 class MapGenerator:
     """Generates interactive maps from GeoJSON files."""
@@ -15,26 +26,40 @@ class MapGenerator:
     def __init__(self, config: Config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.vector_tile_writer = VectorTileMapWriter(config)
+        self.raster_tile_writer = RasterTileMapWriter(config)
+        self.topojson_writer = TopoJsonMapWriter(config)
+        self.leaflet_writer = LeafletMapWriter(config)
+        self.basemap = BasemapTileStore(config)
+        self.backdrop = OrthophotoBackdrop(config)
+        self.server_writer = ServerMapWriter(config)
         self.logger.info("MapGenerator initialized successfully")
     
     @log_execution_time(logging.getLogger(__name__))
     def generate_map(
         self,
-        geojson_path: Path,
+        classified: Union[Path, gpd.GeoDataFrame],
         output_dir: Optional[Path] = None,
-        map_name: str = "sugarcane_growth_map.html"
+        map_name: str = "sugarcane_growth_map.html",
+        provisional: bool = False,
+        orthophoto_path: Optional[Path] = None
     ) -> Path:
         """
-        Generate an interactive map from a GeoJSON file.
+        Generate an interactive map from a GeoJSON file, or directly from the
+        in-memory GeoDataFrame returned by TiffProcessor.process_field(in_memory=True).
+        A provisional map (quick look while ODM runs) has no backdrop and leaves the
+        ODM project untouched. orthophoto_path is the ODM result in its workspace; when
+        omitted it is searched for in the temp directory.
         """
         output_dir = output_dir or self.config.temp_map_dir
         output_dir.mkdir(parents=True, exist_ok=True)
         output_path = output_dir / map_name
+        in_memory = isinstance(classified, gpd.GeoDataFrame)
         
-        self.logger.info(f"Generating map from {geojson_path}")
+        self.logger.info(f"Generating map from {'in-memory result' if in_memory else classified}")
         
         try:
-            geo_data = gpd.read_file(geojson_path)
+            geo_data = classified if in_memory else gpd.read_file(classified)
             
             if geo_data.empty:
                 error_msg = "GeoJSON file is empty. Cannot create map."
@@ -42,34 +67,103 @@ class MapGenerator:
                 raise ValueError(error_msg)
             
             # Convert to WGS84 (EPSG:4326) for Folium
-            geo_data = geo_data.to_crs("EPSG:4326")
-            centroid = geo_data.geometry.centroid
-            map_center = [centroid.y.mean(), centroid.x.mean()]
-            
-            self.logger.debug(f"Map center coordinates: {map_center}")
-            
-            m = Map(location=map_center, zoom_start=16, tiles="OpenStreetMap")
-            
-            GeoJson(
-                geo_data,
-                style_function=self._style_function,
-                tooltip=GeoJsonTooltip(fields=['growth_stage'])
-            ).add_to(m)
-            
-            m.save(output_path)
+            if geo_data.crs is None or geo_data.crs.to_epsg() != 4326:
+                geo_data = geo_data.to_crs("EPSG:4326")
+            
+            if self.config.basemap_source == "local":
+                basemap_dir = output_dir / f"{output_path.stem}_basemap"
+                if basemap_dir.exists():
+                    shutil.rmtree(basemap_dir)
+                self.basemap.export(geo_data.attrs.get("bounds_wgs84", geo_data.total_bounds), basemap_dir)
+            
+            backdrop = None
+            if self.config.backdrop_enabled and not provisional:
+                backdrop = self._render_backdrop(output_dir / f"{output_path.stem}_backdrop.png", orthophoto_path)
+            
+            map_mode = self.config.map_mode
+            if map_mode == "raster_tiles" and "label_grid" not in geo_data.attrs:
+                self.logger.warning("Raster tiles need the in-memory label grid; falling back to leaflet map")
+                map_mode = "leaflet"
+            
+            if map_mode == "vector_tiles":
+                self.vector_tile_writer.write_map(geo_data, output_path, geo_data.attrs.get("bounds_wgs84"), backdrop)
+            elif map_mode == "raster_tiles":
+                self.raster_tile_writer.write_map(geo_data.attrs["label_grid"], output_path, backdrop)
+            elif map_mode == "topojson":
+                self.topojson_writer.write_map(geo_data, output_path, geo_data.attrs.get("bounds_wgs84"), backdrop)
+            elif map_mode == "server":
+                self.server_writer.write_map(geo_data, output_path, geo_data.attrs.get("bounds_wgs84"), backdrop)
+            elif map_mode == "folium":
+                if "bounds_wgs84" in geo_data.attrs:
+                    west, south, east, north = geo_data.attrs["bounds_wgs84"]
+                    map_center = [(south + north) / 2, (west + east) / 2]
+                else:
+                    centroid = geo_data.geometry.centroid
+                    map_center = [centroid.y.mean(), centroid.x.mean()]
+                
+                self.logger.debug(f"Map center coordinates: {map_center}")
+                
+                if self.config.basemap_source == "local":
+                    m = Map(
+                        location=map_center,
+                        zoom_start=16,
+                        tiles=basemap_url(self.config, output_path.stem),
+                        attr="&copy; OpenStreetMap contributors",
+                        max_native_zoom=self.config.basemap_max_zoom
+                    )
+                else:
+                    m = Map(location=map_center, zoom_start=16, tiles="OpenStreetMap")
+                # Only Leaflet is used; load it from the vendored copy instead of Folium's CDN set
+                m.default_js = [("leaflet", asset_url(self.config, "leaflet.js"))]
+                m.default_css = [("leaflet_css", asset_url(self.config, "leaflet.css"))]
+                
+                if backdrop is not None:
+                    west, south, east, north = backdrop.bounds_wgs84
+                    ImageOverlay(
+                        image=str(output_dir / backdrop.image),
+                        bounds=[[south, west], [north, east]],
+                        name="Orthophoto"
+                    ).add_to(m)
+                
+                GeoJson(
+                    geo_data,
+                    style_function=self._style_function,
+                    tooltip=GeoJsonTooltip(fields=['growth_stage']),
+                    control=False
+                ).add_to(m)
+                if backdrop is not None:
+                    LayerControl().add_to(m)
+                
+                m.save(output_path)
+            else:
+                self.leaflet_writer.write_map(geo_data, output_path, geo_data.attrs.get("bounds_wgs84"), backdrop)
             self.logger.info(f"Interactive map saved to {output_path}")
             
             # Delete the classified_output.geojson file after map generation
-            self._cleanup_geojson(geojson_path)
+            if not in_memory:
+                self._cleanup_geojson(classified)
             
-            # Move and cleanup orthophoto files
-            self._manage_orthophoto_files()
+            # Back up the orthophoto; the ODM workspace is kept for later reruns
+            if not provisional:
+                self._manage_orthophoto_files(orthophoto_path)
             
             return output_path
         except Exception as e:
             self.logger.error(f"Failed to generate map: {e}")
             raise
     
+    def _render_backdrop(self, output_path: Path, orthophoto_path: Optional[Path] = None):
+        """Render the orthophoto backdrop."""
+        orthophoto_path = orthophoto_path or self._find_orthophoto_file()
+        if not orthophoto_path:
+            self.logger.warning("No orthophoto found; map is generated without a backdrop")
+            return None
+        try:
+            return self.backdrop.render(orthophoto_path, output_path)
+        except Exception as e:
+            self.logger.error(f"Failed to render orthophoto backdrop: {e}")
+            return None
+    
     def _style_function(self, feature):
         """Style function for GeoJSON features."""
         growth_stage = feature['properties'].get('growth_stage')
@@ -92,8 +186,8 @@ class MapGenerator:
         except Exception as e:
             self.logger.error(f"Error deleting GeoJSON file {geojson_path}: {e}")
     
-    def _manage_orthophoto_files(self):
-        """Move orthophoto file to resource folder and cleanup temp directory."""
+    def _manage_orthophoto_files(self, orthophoto_path: Optional[Path] = None):
+        """Back up the orthophoto to the resource folder, leaving the ODM workspace in place."""
         try:
             self.logger.info("=== Starting orthophoto file management ===")
             
@@ -101,7 +195,7 @@ class MapGenerator:
             self._log_directory_structure()
             
             # Find the orthophoto file
-            orthophoto_path = self._find_orthophoto_file()
+            orthophoto_path = orthophoto_path or self._find_orthophoto_file()
             
             if not orthophoto_path:
                 self.logger.error("No orthophoto file found to move")
@@ -119,13 +213,17 @@ class MapGenerator:
             # New path for the orthophoto file
             new_orthophoto_path = resource_folder / orthophoto_path.name
             
-            # Move the file
-            self.logger.info(f"Moving {orthophoto_path} to {new_orthophoto_path}")
-            shutil.move(str(orthophoto_path), str(new_orthophoto_path))
-            self.logger.info(f"Successfully moved orthophoto file")
-            
-            # Cleanup temp directory
-            self._cleanup_temp_directory()
+            self.logger.info(f"Backing up {orthophoto_path} to {new_orthophoto_path}")
+            if orthophoto_path.suffix.lower() == ".vrt":
+                # The mosaic only indexes submodel orthophotos inside the ODM workspace, which may be evicted
+                sources = []
+                for index, source in enumerate(mosaic_sources(orthophoto_path)):
+                    sources.append(resource_folder / f"{index:03d}_{source.name}")
+                    self._backup_file(source, sources[-1])
+                build_virtual_mosaic(sources, new_orthophoto_path, relative=True)
+            else:
+                self._backup_file(orthophoto_path, new_orthophoto_path)
+            self.logger.info(f"Successfully backed up orthophoto file")
             
             self.logger.info("=== Orthophoto file management completed ===")
             
@@ -134,6 +232,14 @@ class MapGenerator:
             import traceback
             self.logger.error(f"Traceback: {traceback.format_exc()}")
     
+    @staticmethod
+    def _backup_file(src_path: Path, dest_path: Path):
+        # Hardlink when possible; the workspace copy is what a rerun reuses
+        try:
+            os.link(src_path, dest_path)
+        except OSError:
+            shutil.copy2(src_path, dest_path)
+    
     def _log_directory_structure(self):
         """Log the directory structure for debugging."""
         try:
@@ -208,34 +314,3 @@ class MapGenerator:
         except Exception as e:
             self.logger.error(f"Error finding orthophoto file: {e}")
             return None
-    
-    def _cleanup_temp_directory(self):
-        """Delete the entire temp directory after moving the orthophoto."""
-        try:
-            self.logger.info(f"Attempting to cleanup temp directory: {self.config.temp_dir}")
-            
-            if not self.config.temp_dir.exists():
-                self.logger.warning(f"Temp directory does not exist: {self.config.temp_dir}")
-                return
-            
-            # Check directory contents before deletion
-            contents = list(self.config.temp_dir.rglob("*"))
-            self.logger.info(f"Temp directory contains {len(contents)} items")
-            
-            for item in contents:
-                self.logger.info(f"  - {item.relative_to(self.config.temp_dir)}")
-            
-            # Delete the directory
-            shutil.rmtree(self.config.temp_dir)
-            self.logger.info(f"Successfully deleted temp directory: {self.config.temp_dir}")
-            
-            # Verify deletion
-            if not self.config.temp_dir.exists():
-                self.logger.info("Temp directory deletion verified")
-            else:
-                self.logger.error("Temp directory still exists after deletion attempt")
-                
-        except Exception as e:
-            self.logger.error(f"Error deleting temp directory {self.config.temp_dir}: {e}")
-            import traceback
-            self.logger.error(f"Traceback: {traceback.format_exc()}")
\ No newline at end of file
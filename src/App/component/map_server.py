@@ -0,0 +1,274 @@
+import asyncio
+import json
+import math
+import mimetypes
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import logging
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.web_map import render_leaflet_page
+
+# Loaded feature stores kept in memory (one per map)
+MAX_OPEN_STORES = 4
+COORDINATE_DECIMALS = 7
+FEATURES_SUFFIX = "_features.parquet"
+
+mimetypes.add_type("application/x-protobuf", ".pbf")
+
+
+class FeatureStore(NamedTuple):
+    """Spatially indexed growth-stage features of one map run (EPSG:4326)."""
+    geometries: np.ndarray
+    properties: List[str]
+    tree: shapely.STRtree
+    mtime: float
+
+
+class ServerMapWriter:
+    """Writes the feature store of a run and a page that fetches only the features in view."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.logger.info("ServerMapWriter initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def write_map(self, geo_data: gpd.GeoDataFrame, output_path: Path, bounds_wgs84=None, backdrop=None) -> Path:
+        """Write '<map name>_features.parquet' and the HTML page; geo_data must be in EPSG:4326."""
+        store_path = output_path.parent / f"{output_path.stem}{FEATURES_SUFFIX}"
+        # A fresh frame without attrs: parquet metadata cannot hold the label grid or other attrs
+        features = gpd.GeoDataFrame(
+            {"growth_stage": geo_data["growth_stage"].to_numpy()},
+            geometry=geo_data.geometry.to_numpy(),
+            crs=geo_data.crs
+        )
+        features.to_parquet(store_path)
+        
+        bounds = bounds_wgs84 if bounds_wgs84 is not None else geo_data.total_bounds
+        layer_js = f"""
+var stageLayer = L.geoJSON(null, {{
+    style: function (feature) {{ return stageStyle(feature.properties); }},
+    onEachFeature: function (feature, layer) {{ layer.bindTooltip(feature.properties.growth_stage); }}
+}}).addTo(map);
+var viewportRequest = 0;
+function loadViewport() {{
+    var b = map.getBounds(), request = ++viewportRequest;
+    var url = "/features/" + encodeURIComponent({json.dumps(output_path.stem)}) +
+        "?bbox=" + [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].join(",") +
+        "&zoom=" + map.getZoom();
+    fetch(url).then(function (response) {{ return response.json(); }}).then(function (data) {{
+        if (request !== viewportRequest) {{ return; }}
+        stageLayer.clearLayers();
+        stageLayer.addData(data);
+    }});
+}}
+map.on("moveend", loadViewport);
+loadViewport();
+"""
+        html = render_leaflet_page(self.config, output_path.stem, bounds, layer_js, backdrop=backdrop)
+        output_path.write_text(html, encoding="utf-8")
+        self.logger.info(f"Feature store with {len(geo_data)} features written to {store_path}")
+        return output_path
+
+
+class MapServer:
+    """
+    Local-only asyncio HTTP server for generated maps. Serves the map directory,
+    the vendored web assets and viewport feature queries, running its event loop
+    in a daemon thread.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.root = config.output_dir
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stores: "OrderedDict[str, FeatureStore]" = OrderedDict()
+        self._responses: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self.logger.info("MapServer initialized successfully")
+    
+    def start(self) -> int:
+        """Start serving on 127.0.0.1 and return the bound port."""
+        ready = threading.Event()
+        
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", self.config.map_server_port)
+            )
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            try:
+                self._loop.run_forever()
+            finally:
+                server.close()
+                # Close idle keep-alive connections so their handlers see EOF and finish
+                for writer in list(self._connections):
+                    writer.close()
+                self._loop.run_until_complete(
+                    asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True)
+                )
+                self._loop.close()
+        
+        self._thread = threading.Thread(target=run, name="MapServer", daemon=True)
+        self._thread.start()
+        if not ready.wait(timeout=5):
+            raise RuntimeError("Map server did not start")
+        self.logger.info(f"Map server listening on http://127.0.0.1:{self.port}/")
+        return self.port
+    
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self.logger.info("Map server stopped")
+    
+    def url_for(self, map_path: Path) -> Optional[str]:
+        """HTTP URL of a map page under the served directory, or None."""
+        try:
+            relative = map_path.resolve().relative_to(self.root.resolve())
+        except ValueError:
+            return None
+        return f"http://127.0.0.1:{self.port}/maps/{relative.as_posix()}"
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        loop = asyncio.get_running_loop()
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # Headers are not needed; read up to the blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                
+                parts = request_line.decode("latin-1").split()
+                if len(parts) < 2 or parts[0] not in ("GET", "HEAD"):
+                    await self._respond(writer, HTTPStatus.METHOD_NOT_ALLOWED, b"")
+                    continue
+                
+                url = urlsplit(parts[1])
+                try:
+                    status, content_type, body = await loop.run_in_executor(None, self._route, url)
+                except Exception as e:
+                    self.logger.error(f"Map server error for {parts[1]}: {e}")
+                    status, content_type, body = HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain", str(e).encode()
+                await self._respond(writer, status, b"" if parts[0] == "HEAD" else body, content_type, len(body))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+    
+    async def _respond(self, writer, status: HTTPStatus, body: bytes, content_type="text/plain", length=None):
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body) if length is None else length}\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+    
+    def _route(self, url) -> Tuple[HTTPStatus, str, bytes]:
+        path = unquote(url.path)
+        if path.startswith("/maps/"):
+            return self._static(self.root, path[len("/maps/"):])
+        if path.startswith("/assets/"):
+            return self._static(self.config.web_assets_dir, path[len("/assets/"):])
+        if path.startswith("/features/"):
+            query = parse_qs(url.query)
+            try:
+                west, south, east, north = (float(v) for v in query["bbox"][0].split(","))
+                zoom = int(query["zoom"][0])
+            except (KeyError, ValueError):
+                return HTTPStatus.BAD_REQUEST, "text/plain", b"Expected ?bbox=west,south,east,north&zoom=z"
+            try:
+                body = self.features(path[len("/features/"):], (west, south, east, north), zoom)
+            except FileNotFoundError as e:
+                return HTTPStatus.NOT_FOUND, "text/plain", str(e).encode()
+            return HTTPStatus.OK, "application/json", body
+        return HTTPStatus.NOT_FOUND, "text/plain", b"Not found"
+    
+    def _static(self, directory: Path, relative: str) -> Tuple[HTTPStatus, str, bytes]:
+        path = (directory / relative).resolve()
+        if not path.is_relative_to(directory.resolve()) or not path.is_file():
+            return HTTPStatus.NOT_FOUND, "text/plain", b"Not found"
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        return HTTPStatus.OK, content_type, path.read_bytes()
+    
+    def features(self, map_name: str, bbox: Tuple[float, float, float, float], zoom: int) -> bytes:
+        """GeoJSON of the features intersecting bbox, simplified to half a screen pixel at zoom."""
+        # Snap outward to the zoom's tile grid so nearby viewports share cache entries
+        step = 360.0 / 2 ** zoom
+        west, south, east, north = bbox
+        snapped = (
+            math.floor(west / step) * step, math.floor(south / step) * step,
+            math.ceil(east / step) * step, math.ceil(north / step) * step
+        )
+        store = self._store(map_name)
+        key = (map_name, store.mtime, zoom, snapped)
+        with self._lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+        
+        candidates = np.sort(store.tree.query(shapely.box(*snapped), predicate="intersects"))
+        tolerance = 360.0 / (256 * 2 ** zoom) / 2
+        geometries = shapely.simplify(store.geometries[candidates], tolerance, preserve_topology=True)
+        geometries = shapely.transform(geometries, lambda coords: np.round(coords, COORDINATE_DECIMALS))
+        body = (
+            '{"type":"FeatureCollection","features":['
+            + ",".join(
+                f'{{"type":"Feature","id":{i},"properties":{store.properties[i]},"geometry":{geometry}}}'
+                for i, geometry in zip(candidates.tolist(), shapely.to_geojson(geometries))
+            )
+            + "]}"
+        ).encode("utf-8")
+        
+        with self._lock:
+            self._responses[key] = body
+            while len(self._responses) > self.config.map_server_cache_size:
+                self._responses.popitem(last=False)
+        return body
+    
+    def _store(self, map_name: str) -> FeatureStore:
+        path = (self.root / f"{map_name}{FEATURES_SUFFIX}").resolve()
+        if not path.is_relative_to(self.root.resolve()) or not path.is_file():
+            raise FileNotFoundError(f"No feature store for map {map_name}")
+        mtime = path.stat().st_mtime
+        with self._lock:
+            store = self._stores.get(map_name)
+            if store is not None and store.mtime == mtime:
+                self._stores.move_to_end(map_name)
+                return store
+        
+        geo_data = gpd.read_parquet(path)
+        geometries = geo_data.geometry.values
+        properties = [json.dumps({"growth_stage": stage}) for stage in geo_data["growth_stage"].astype(str)]
+        store = FeatureStore(np.asarray(geometries), properties, shapely.STRtree(geometries), mtime)
+        self.logger.info(f"Loaded feature store {path.name} ({len(properties)} features)")
+        
+        with self._lock:
+            self._stores[map_name] = store
+            while len(self._stores) > MAX_OPEN_STORES:
+                self._stores.popitem(last=False)
+        return store
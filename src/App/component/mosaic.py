@@ -0,0 +1,110 @@
+import math
+import os
+from pathlib import Path
+from typing import List, Sequence
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+import logging
+
+import rasterio
+from rasterio.enums import ColorInterp, MaskFlags
+
+GDAL_TYPES = {
+    "uint8": "Byte", "int8": "Int8", "uint16": "UInt16", "int16": "Int16", "uint32": "UInt32",
+    "int32": "Int32", "float32": "Float32", "float64": "Float64"
+}
+
+logger = logging.getLogger(__name__)
+
+
+def build_virtual_mosaic(paths: Sequence[Path], vrt_path: Path, relative: bool = False) -> Path:
+    """
+    Write a GDAL VRT that mosaics the orthophotos in paths (e.g. the submodels of an
+    ODM split-merge run) on one pixel grid, without copying any pixels. Masked or
+    nodata pixels of a later source do not hide an earlier one where they overlap.
+    With relative, sources are referenced relative to the VRT so both can be moved together.
+    """
+    if not paths:
+        raise ValueError("No orthophotos to mosaic")
+    
+    sources = []
+    for path in paths:
+        with rasterio.open(path) as src:
+            sources.append(dict(
+                path=Path(path).resolve(), crs=src.crs, count=src.count, dtype=src.dtypes[0],
+                bounds=src.bounds, res=src.res, width=src.width, height=src.height,
+                nodata=src.nodata, colorinterp=src.colorinterp, masked=[
+                    MaskFlags.per_dataset in flags or MaskFlags.alpha in flags for flags in src.mask_flag_enums
+                ]
+            ))
+    first = sources[0]
+    for source in sources[1:]:
+        if source["crs"] != first["crs"] or source["count"] != first["count"] or source["dtype"] != first["dtype"]:
+            raise ValueError(
+                f"{source['path'].name} does not match {first['path'].name} in CRS, band count or data type"
+            )
+    
+    res = min(min(source["res"]) for source in sources)
+    west = min(source["bounds"].left for source in sources)
+    north = max(source["bounds"].top for source in sources)
+    east = max(source["bounds"].right for source in sources)
+    south = min(source["bounds"].bottom for source in sources)
+    width, height = math.ceil((east - west) / res), math.ceil((north - south) / res)
+    
+    bands = []
+    for band in range(1, first["count"] + 1):
+        alpha = first["colorinterp"][band - 1] == ColorInterp.alpha
+        lines = [f'  <VRTRasterBand dataType="{GDAL_TYPES[first["dtype"]]}" band="{band}">']
+        if first["nodata"] is not None and not alpha:
+            lines.append(f'    <NoDataValue>{first["nodata"]!r}</NoDataValue>')
+        if alpha:
+            lines.append('    <ColorInterp>Alpha</ColorInterp>')
+        for source in sources:
+            x_off = (source["bounds"].left - west) / res
+            y_off = (north - source["bounds"].top) / res
+            x_size = source["width"] * source["res"][0] / res
+            y_size = source["height"] * source["res"][1] / res
+            filename = (
+                Path(os.path.relpath(source["path"], vrt_path.parent.resolve())).as_posix() if relative
+                else str(source["path"])
+            )
+            lines += [
+                '    <ComplexSource>',
+                f'      <SourceFilename relativeToVRT="{int(relative)}">{escape(filename)}</SourceFilename>',
+                f'      <SourceBand>{band}</SourceBand>',
+                f'      <SrcRect xOff="0" yOff="0" xSize="{source["width"]}" ySize="{source["height"]}"/>',
+                f'      <DstRect xOff="{x_off!r}" yOff="{y_off!r}" xSize="{x_size!r}" ySize="{y_size!r}"/>'
+            ]
+            if alpha:
+                # Transparent alpha must not overwrite an opaque neighbour
+                lines.append('      <NODATA>0</NODATA>')
+            elif source["masked"][band - 1]:
+                lines.append('      <UseMaskBand>true</UseMaskBand>')
+            elif source["nodata"] is not None:
+                lines.append(f'      <NODATA>{source["nodata"]!r}</NODATA>')
+            lines.append('    </ComplexSource>')
+        lines.append('  </VRTRasterBand>')
+        bands.append("\n".join(lines))
+    
+    vrt_path.parent.mkdir(parents=True, exist_ok=True)
+    vrt_path.write_text("\n".join([
+        f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">',
+        f'  <SRS>{escape(first["crs"].to_wkt())}</SRS>',
+        f'  <GeoTransform>{west!r}, {res!r}, 0.0, {north!r}, 0.0, {-res!r}</GeoTransform>',
+        *bands,
+        '</VRTDataset>'
+    ]) + "\n")
+    logger.info(f"Virtual mosaic of {len(sources)} orthophotos ({width}x{height} pixels) written to {vrt_path}")
+    return vrt_path
+
+
+def mosaic_sources(vrt_path: Path) -> List[Path]:
+    """The files a VRT reads, in drawing order."""
+    sources = []
+    for element in ElementTree.parse(vrt_path).getroot().iter("SourceFilename"):
+        path = Path(element.text)
+        if element.get("relativeToVRT") == "1":
+            path = vrt_path.parent / path
+        if path not in sources:
+            sources.append(path)
+    return sources
@@ -0,0 +1,347 @@
+import json
+import mimetypes
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+import logging
+
+from pyodm import Node
+from pyodm.api import Task
+from pyodm.exceptions import NodeConnectionError, NodeResponseError, NodeServerError, OdmError
+from pyodm.types import TaskStatus
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+from src.App.config import Config
+from src.App.component.mosaic import build_virtual_mosaic
+
+IMAGE_EXTENSIONS = ('.tif', '.tiff')
+ORTHOPHOTO = Path("odm_orthophoto") / "odm_orthophoto.tif"
+# Index of the submodel orthophotos of a split-merge run that stopped before merging
+ORTHOPHOTO_MOSAIC = Path("odm_orthophoto") / "odm_orthophoto_mosaic.vrt"
+# Upload progress of a NodeODM task, kept in the project so an interrupted upload resumes
+TASK_STATE_FILE = "nodeodm_task.json"
+UPLOAD_RETRIES = 5
+DOWNLOAD_CHUNK = 1024 * 1024
+# Seconds between container memory samples
+MEMORY_SAMPLE_INTERVAL = 5.0
+MEMORY_UNITS = {"B": 1, "KB": 1e3, "MB": 1e6, "GB": 1e9, "KIB": 2 ** 10, "MIB": 2 ** 20, "GIB": 2 ** 30, "TIB": 2 ** 40}
+
+Log = Callable[[str], None]
+MemorySample = Callable[[float], None]
+
+
+def cli_options(args: Sequence[str]) -> Dict[str, object]:
+    """ODM command-line options ('--pc-quality', 'high', '--skip-3dmodel') as an option dict."""
+    options: Dict[str, object] = {}
+    i = 0
+    while i < len(args):
+        name = args[i].lstrip('-')
+        if i + 1 < len(args) and not args[i + 1].startswith('--'):
+            value = args[i + 1]
+            for cast in (int, float):
+                try:
+                    value = cast(value)
+                    break
+                except ValueError:
+                    continue
+            options[name] = value
+            i += 2
+        else:
+            options[name] = True
+            i += 1
+    return options
+
+
+def parse_memory(text: str) -> Optional[float]:
+    """Bytes in a docker stats size such as '1.5GiB' or '812.4MB'."""
+    match = re.match(r"\s*([\d.]+)\s*([a-zA-Z]+)", text)
+    if not match or match.group(2).upper() not in MEMORY_UNITS:
+        return None
+    return float(match.group(1)) * MEMORY_UNITS[match.group(2).upper()]
+
+
+def find_orthophoto(project_dir: Path) -> Optional[Path]:
+    """
+    The orthophoto of an ODM project: the merged one, or a virtual mosaic of the
+    submodel orthophotos when those are newer (split-merge run ended before merge).
+    """
+    orthophoto = project_dir / ORTHOPHOTO
+    submodels = sorted((project_dir / "submodels").glob(f"submodel_*/{ORTHOPHOTO.as_posix()}"))
+    newest_submodel = max((path.stat().st_mtime for path in submodels), default=0.0)
+    if orthophoto.exists() and orthophoto.stat().st_mtime >= newest_submodel:
+        return orthophoto
+    if not submodels:
+        return None
+    mosaic = project_dir / ORTHOPHOTO_MOSAIC
+    if mosaic.exists() and mosaic.stat().st_mtime >= newest_submodel:
+        return mosaic
+    return build_virtual_mosaic(submodels, mosaic)
+
+
+class OdmBackend:
+    """Runs ODM on a project directory (images in '<project>/images') and returns the orthophoto path."""
+    
+    name = "ODM"
+    
+    def run(self, project_dir: Path, args: Sequence[str], mounts: Sequence[str], log: Log,
+            memory: Optional[MemorySample] = None) -> Path:
+        """log receives every line of ODM output; memory, if given, receives memory use samples in MB."""
+        raise NotImplementedError
+
+
+class LocalDockerBackend(OdmBackend):
+    """The opendronemap/odm container on this machine."""
+    
+    name = "local Docker"
+    
+    def __init__(self, config: Config):
+        self.logger = logging.getLogger(__name__)
+        self.logger.info("LocalDockerBackend initialized successfully")
+    
+    def run(self, project_dir: Path, args: Sequence[str], mounts: Sequence[str], log: Log,
+            memory: Optional[MemorySample] = None) -> Path:
+        project = str(project_dir).replace('\\', '/')
+        container = f"odm-{project_dir.name}-{os.getpid()}"
+        command = [
+            'docker', 'run', '-ti', '--rm', '--name', container,
+            '-v', f"{project}:/datasets/code",
+            # Source directories of symlinked images, mounted read-only at the same path
+            *[arg for mount in mounts for arg in ('-v', f"{mount}:{mount}:ro")],
+            'opendronemap/odm',
+            '--project-path', '/datasets',
+            *args,
+            'code'
+        ]
+        log("Command: " + ' '.join(command))
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, universal_newlines=True)
+        if memory is not None:
+            threading.Thread(target=self._sample_memory, args=(container, process, memory), daemon=True).start()
+        for line in iter(process.stdout.readline, ''):
+            log(line.strip())
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ODM processing failed with exit code {process.returncode}")
+        return find_orthophoto(project_dir) or project_dir / ORTHOPHOTO
+    
+    def _sample_memory(self, container: str, process: subprocess.Popen, memory: MemorySample):
+        """Report the container's memory use from 'docker stats' until the run ends."""
+        while process.poll() is None:
+            try:
+                usage = subprocess.run(
+                    ['docker', 'stats', '--no-stream', '--format', '{{.MemUsage}}', container],
+                    capture_output=True, text=True, timeout=30
+                ).stdout
+                used = parse_memory(usage.split('/')[0])
+                if used is not None:
+                    memory(used / 2 ** 20)
+            except Exception as e:
+                self.logger.debug(f"Memory sample of {container} failed: {e}")
+            time.sleep(MEMORY_SAMPLE_INTERVAL)
+
+
+class NodeOdmBackend(OdmBackend):
+    """
+    NodeODM nodes through pyodm: the project goes to the reachable node with the
+    shortest queue, images are uploaded one by one so an interrupted upload resumes,
+    and only the orthophoto asset is downloaded.
+    """
+    
+    name = "NodeODM"
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        if not config.odm_nodes:
+            raise ValueError("odm.backend is 'nodeodm' but no odm.nodes are configured")
+        self.node_urls = config.odm_nodes
+        self._state_lock = threading.Lock()
+        self.logger.info(f"NodeOdmBackend initialized with {len(self.node_urls)} nodes")
+    
+    def run(self, project_dir: Path, args: Sequence[str], mounts: Sequence[str], log: Log,
+            memory: Optional[MemorySample] = None) -> Path:
+        # Memory use is not reported by NodeODM
+        images_dir = project_dir / "images"
+        images = sorted(p for p in images_dir.iterdir() if p.name.lower().endswith(IMAGE_EXTENSIONS))
+        if not images:
+            raise ValueError(f"No images to process in {images_dir}")
+        
+        options = cli_options(args)
+        # Concurrency was planned for this machine; the node uses all of its own cores
+        options.pop("max-concurrency", None)
+        # A NodeODM task starts from an empty project, so there is nothing to rerun from
+        options.pop("rerun-from", None)
+        # Only the merged orthophoto can be downloaded, so split-merge runs merge on the node
+        options.pop("end-with", None)
+        state_path = project_dir / TASK_STATE_FILE
+        state = self._load_state(state_path, images, options)
+        if state is None:
+            node_url = self.select_node(len(images), log)
+            state = {
+                "node": node_url,
+                "images": [p.name for p in images],
+                "options": options,
+                "uuid": None,
+                "uploaded": [],
+                "committed": False
+            }
+        else:
+            log(f"Resuming NodeODM task {state['uuid']} on {state['node']} ({len(state['uploaded'])} images uploaded)")
+        node = Node.from_url(state["node"])
+        
+        if not state["committed"]:
+            try:
+                self._upload(node, state, state_path, images, log)
+            except NodeResponseError as e:
+                # The node dropped the unfinished task (e.g. after a restart): upload again
+                log(f"NodeODM task {state['uuid']} is gone ({e}); starting a new upload")
+                state.update(uuid=None, uploaded=[], committed=False)
+                self._upload(node, state, state_path, images, log)
+        
+        task = Task(node, state["uuid"])
+        orthophoto_path = project_dir / ORTHOPHOTO
+        try:
+            self._wait(task, log)
+            self._download_orthophoto(node, state["uuid"], orthophoto_path, log)
+        except (RuntimeError, NodeResponseError):
+            # A failed, canceled or vanished task cannot be resumed; the next run starts a new one
+            log(f"Discarding NodeODM task {state['uuid']}")
+            state_path.unlink(missing_ok=True)
+            raise
+        state_path.unlink(missing_ok=True)
+        return orthophoto_path
+    
+    def select_node(self, image_count: int, log: Log) -> str:
+        """The reachable node that accepts image_count images and has the fewest queued tasks."""
+        candidates = []
+        for url in self.node_urls:
+            try:
+                info = Node.from_url(url, timeout=10).info()
+            except OdmError as e:
+                log(f"NodeODM node {url} unavailable: {e}")
+                continue
+            if info.max_images and image_count > info.max_images:
+                log(f"NodeODM node {url} accepts at most {info.max_images} images; skipping")
+                continue
+            candidates.append((info.task_queue_count, len(candidates), url))
+        if not candidates:
+            raise RuntimeError("No NodeODM node is available for this project")
+        queue_length, _, url = min(candidates)
+        log(f"Using NodeODM node {url} ({queue_length} tasks queued)")
+        return url
+    
+    def _load_state(self, state_path: Path, images: List[Path], options: Dict[str, object]) -> Optional[dict]:
+        """The saved task of an earlier run, if it is for the same images and options."""
+        if not state_path.exists():
+            return None
+        try:
+            state = json.loads(state_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get("images") != [p.name for p in images] or state.get("options") != options or not state.get("uuid"):
+            return None
+        return state
+    
+    def _save_state(self, state_path: Path, state: dict):
+        temp_path = state_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(state))
+        os.replace(temp_path, state_path)
+    
+    def _upload(self, node: Node, state: dict, state_path: Path, images: List[Path], log: Log):
+        if state["uuid"] is None:
+            fields = {"name": state_path.parent.name, "options": json.dumps(
+                [{"name": name, "value": value} for name, value in state["options"].items()]
+            )}
+            encoder = MultipartEncoder(fields=fields)
+            result = node.post('/task/new/init', data=encoder, headers={'Content-Type': encoder.content_type})
+            state["uuid"] = result["uuid"]
+            self._save_state(state_path, state)
+        
+        uploaded = set(state["uploaded"])
+        pending = [p for p in images if p.name not in uploaded]
+        log(f"Uploading {len(pending)} of {len(images)} images to NodeODM task {state['uuid']}...")
+        
+        def upload(path: Path):
+            for attempt in range(1, UPLOAD_RETRIES + 1):
+                try:
+                    with open(path, "rb") as f:
+                        encoder = MultipartEncoder(fields={
+                            "images": (path.name, f, mimetypes.guess_type(path.name)[0] or "image/tiff")
+                        })
+                        node.post(
+                            f"/task/new/upload/{state['uuid']}", data=encoder,
+                            headers={'Content-Type': encoder.content_type}
+                        )
+                    break
+                except (NodeConnectionError, NodeServerError) as e:
+                    if attempt == UPLOAD_RETRIES:
+                        raise
+                    self.logger.warning(f"Upload of {path.name} failed ({e}); retry {attempt}")
+                    time.sleep(attempt * 2)
+            with self._state_lock:
+                state["uploaded"].append(path.name)
+                self._save_state(state_path, state)
+                done = len(state["uploaded"])
+            if done % 50 == 0 or done == len(images):
+                log(f"Uploaded {done}/{len(images)} images")
+        
+        with ThreadPoolExecutor(max_workers=self.config.odm_parallel_uploads) as pool:
+            for future in [pool.submit(upload, path) for path in pending]:
+                future.result()
+        
+        node.post(f"/task/new/commit/{state['uuid']}")
+        state["committed"] = True
+        self._save_state(state_path, state)
+        log(f"NodeODM task {state['uuid']} committed")
+    
+    def _wait(self, task: Task, log: Log):
+        """Stream the task's console output until it ends."""
+        line = 0
+        failures = 0
+        last_progress = None
+        while True:
+            try:
+                info = task.info(with_output=line)
+                failures = 0
+            except (NodeConnectionError, NodeServerError) as e:
+                failures += 1
+                if failures > UPLOAD_RETRIES:
+                    raise
+                self.logger.warning(f"NodeODM node unreachable ({e}); retrying")
+                time.sleep(self.config.odm_poll_interval)
+                continue
+            
+            for output in info.output:
+                log(output)
+            line += len(info.output)
+            if info.status == TaskStatus.COMPLETED:
+                log(f"NodeODM task finished in {info.processing_time / 1000:.0f} s")
+                return
+            if info.status in (TaskStatus.FAILED, TaskStatus.CANCELED):
+                raise RuntimeError(f"NodeODM task {info.status.name.lower()}: {info.last_error}")
+            progress = int(info.progress)
+            if progress != last_progress:
+                self.logger.info(f"NodeODM task {task.uuid}: {info.status.name.lower()} {progress}%")
+                last_progress = progress
+            time.sleep(self.config.odm_poll_interval)
+    
+    def _download_orthophoto(self, node: Node, uuid: str, orthophoto_path: Path, log: Log):
+        """Download only the orthophoto asset instead of the all.zip archive."""
+        orthophoto_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = orthophoto_path.with_suffix(".part")
+        response = node.get(f"/task/{uuid}/download/orthophoto.tif", stream=True)
+        with open(temp_path, "wb") as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                f.write(chunk)
+        os.replace(temp_path, orthophoto_path)
+        log(f"Downloaded orthophoto ({orthophoto_path.stat().st_size / 1e6:.1f} MB)")
+
+
+def create_odm_backend(config: Config) -> OdmBackend:
+    if config.odm_backend == "nodeodm":
+        return NodeOdmBackend(config)
+    return LocalDockerBackend(config)
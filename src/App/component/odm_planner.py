@@ -0,0 +1,119 @@
+import math
+import os
+from typing import List, NamedTuple, Optional
+import logging
+
+import psutil
+import rasterio
+
+from src.App.config import Config
+from src.App.component.frame_thinning import ODM_SCALING_EXPONENT
+
+IMAGE_EXTENSIONS = ('.tif', '.tiff')
+PC_QUALITIES = ("high", "medium", "low")
+# Peak memory per image (MB) for 12 MP frames by dense point cloud quality; fast-orthophoto has no dense cloud
+MEMORY_PER_IMAGE_MB = {"high": 40.0, "medium": 20.0, "low": 10.0, "fast": 6.0}
+BASE_MEMORY_GB = 2.0
+# Seconds for one 12 MP image on 8 cores before the n^ODM_SCALING_EXPONENT growth
+RUNTIME_PER_IMAGE_S = {"high": 2.0, "medium": 1.2, "low": 0.8, "fast": 0.4}
+REFERENCE_CORES = 8
+MEMORY_PER_THREAD_GB = 2.0
+
+
+class OdmProfile(NamedTuple):
+    """ODM options for one dataset with the predicted cost."""
+    args: List[str]
+    image_count: int
+    megapixels: float
+    quality: str
+    split: Optional[int]
+    predicted_runtime_s: float
+    predicted_memory_gb: float
+    memory_budget_gb: float
+    
+    def summary(self) -> str:
+        split = f", split into submodels of {self.split} images" if self.split else ""
+        quality = "fast orthophoto" if self.quality == "fast" else f"{self.quality} point cloud"
+        return (
+            f"ODM profile: {self.image_count} images of {self.megapixels:.1f} MP, {quality}{split}; "
+            f"predicted ~{self.predicted_runtime_s / 3600:.1f} h and {self.predicted_memory_gb:.1f} GB peak "
+            f"(budget {self.memory_budget_gb:.1f} GB)"
+        )
+
+
+class OdmProfilePlanner:
+    """
+    Chooses ODM options from the dataset size and the machine: the best point cloud
+    quality that fits in memory, fast-orthophoto or split-merge when none does, and
+    never the products the growth map does not use.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.logger.info("OdmProfilePlanner initialized successfully")
+    
+    def plan(self, images_dir: str) -> OdmProfile:
+        images = sorted(name for name in os.listdir(images_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not images:
+            raise ValueError(f"No images to process in {images_dir}")
+        with rasterio.open(os.path.join(images_dir, images[0])) as src:
+            megapixels = src.width * src.height / 1e6
+        
+        count = len(images)
+        cores = psutil.cpu_count() or 1
+        total_gb = self.config.odm_memory_limit_gb or psutil.virtual_memory().total / 1e9
+        budget_gb = total_gb * self.config.odm_memory_fraction
+        profile = self.config.odm_profile
+        
+        if profile == "fast":
+            candidates = ["fast"]
+        elif profile == "quality":
+            candidates = ["high"]
+        else:
+            candidates = [*PC_QUALITIES, "fast"]
+        quality = next((q for q in candidates if self._memory(q, count, megapixels) <= budget_gb), None)
+        
+        split = None
+        if quality is None:
+            # Nothing fits as one model: split into submodels that do
+            quality = "medium" if profile == "auto" else candidates[0]
+            per_image_gb = self._memory(quality, 1, megapixels) - BASE_MEMORY_GB
+            split = max(1, int((budget_gb - BASE_MEMORY_GB) / per_image_gb))
+        
+        submodel = split or count
+        submodels = math.ceil(count / submodel)
+        memory_gb = self._memory(quality, submodel, megapixels)
+        concurrency = max(1, min(cores, int(budget_gb // MEMORY_PER_THREAD_GB)))
+        runtime_s = submodels * self._runtime(quality, submodel, megapixels, concurrency)
+        
+        args = [
+            '--radiometric-calibration', 'camera+sun',
+            '--orthophoto-resolution', str(self.config.odm_orthophoto_resolution),
+            '--max-concurrency', str(concurrency),
+            # Only the orthophoto is used; skip the textured model and the PDF report
+            '--skip-3dmodel',
+            '--skip-report'
+        ]
+        if quality == "fast":
+            args.append('--fast-orthophoto')
+        else:
+            args += ['--pc-quality', quality]
+        if split:
+            args += ['--split', str(split), '--split-overlap', str(self.config.odm_split_overlap)]
+            if self.config.odm_virtual_mosaic:
+                # The submodel orthophotos are classified as a virtual mosaic; skip the merge
+                args += ['--end-with', 'split']
+        
+        plan = OdmProfile(args, count, megapixels, quality, split, runtime_s, memory_gb, budget_gb)
+        self.logger.info(f"{plan.summary()} on {cores} cores")
+        return plan
+    
+    @staticmethod
+    def _memory(quality: str, count: int, megapixels: float) -> float:
+        return BASE_MEMORY_GB + count * megapixels / 12 * MEMORY_PER_IMAGE_MB[quality] / 1024
+    
+    @staticmethod
+    def _runtime(quality: str, count: int, megapixels: float, cores: int) -> float:
+        speedup = (cores / REFERENCE_CORES) ** 0.7
+        return RUNTIME_PER_IMAGE_S[quality] * count ** ODM_SCALING_EXPONENT * megapixels / 12 / speedup
@@ -0,0 +1,278 @@
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+import logging
+
+from src.App.config import Config
+from src.App.component.frame_thinning import ODM_SCALING_EXPONENT
+from src.App.component.odm_backend import cli_options
+from src.App.component.odm_planner import OdmProfile
+from src.App.component.odm_workspace import ODM_STAGES, OdmRun
+
+STAGE_STARTED = re.compile(r"Running (\w+) stage")
+STAGE_FINISHED = re.compile(r"Finished (\w+) stage")
+# Share of the pipeline runtime per stage, used until there is history for a profile
+DEFAULT_STAGE_SHARES = {
+    "dataset": 0.02, "split": 0.02, "merge": 0.05, "opensfm": 0.35, "openmvs": 0.25,
+    "odm_filterpoints": 0.03, "odm_meshing": 0.08, "mvs_texturing": 0.08, "odm_georeferencing": 0.03,
+    "odm_dem": 0.02, "odm_orthophoto": 0.07, "odm_report": 0.01, "odm_postprocess": 0.01
+}
+# Limits on rescaling the remaining estimate by how far the finished stages were off
+MIN_PACE, MAX_PACE = 0.25, 4.0
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL,
+    backend TEXT,
+    image_count INTEGER,
+    megapixels REAL,
+    quality TEXT,
+    split INTEGER,
+    rerun_from TEXT,
+    total_s REAL,
+    succeeded INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER REFERENCES runs (id),
+    stage TEXT,
+    seconds REAL,
+    peak_memory_mb REAL
+);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run_id);
+"""
+
+
+class StageTiming(NamedTuple):
+    stage: str
+    seconds: float
+    peak_memory_mb: Optional[float]
+
+
+class OdmProgress(NamedTuple):
+    """One progress update of an ODM run."""
+    stage: str
+    stage_number: int
+    stage_count: int
+    percent: int
+    elapsed_s: float
+    eta_s: float
+    
+    def summary(self) -> str:
+        eta = f"{self.eta_s / 3600:.1f} h" if self.eta_s >= 3600 else f"{self.eta_s / 60:.0f} min"
+        return f"ODM {self.stage} (stage {self.stage_number}/{self.stage_count}), {self.percent}% - ~{eta} left"
+
+
+class OdmRunHistory:
+    """Stage timings and peak memory of past ODM runs, for ETAs and capacity planning."""
+    
+    def __init__(self, config: Config):
+        self.logger = logging.getLogger(__name__)
+        self.path = config.odm_history_path
+        self.logger.info(f"OdmRunHistory initialized at {self.path}")
+    
+    def record(self, profile: OdmProfile, backend: str, rerun_from: Optional[str], started_at: float,
+               timings: List[StageTiming], succeeded: bool):
+        with closing(self._connect()) as db, db:
+            run_id = db.execute(
+                "INSERT INTO runs (started_at, backend, image_count, megapixels, quality, split, rerun_from, "
+                "total_s, succeeded) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at, backend, profile.image_count, profile.megapixels, profile.quality, profile.split,
+                 rerun_from, time.time() - started_at, int(succeeded))
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO stages (run_id, stage, seconds, peak_memory_mb) VALUES (?, ?, ?, ?)",
+                [(run_id, t.stage, t.seconds, t.peak_memory_mb) for t in timings]
+            )
+    
+    def stage_costs(self, quality: str, split: bool) -> Dict[str, float]:
+        """Median seconds per stage for one unit of work (see work_units) in successful runs like this one."""
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT s.stage, s.seconds, r.image_count, r.megapixels, r.split FROM stages s "
+                "JOIN runs r ON r.id = s.run_id WHERE r.succeeded = 1 AND r.quality = ? "
+                "AND (r.split IS NOT NULL) = ?",
+                (quality, int(split))
+            ).fetchall()
+        costs: Dict[str, List[float]] = {}
+        for stage, seconds, image_count, megapixels, run_split in rows:
+            costs.setdefault(stage, []).append(seconds / work_units(image_count, megapixels, run_split))
+        return {stage: statistics.median(values) for stage, values in costs.items()}
+    
+    def capacity_report(self) -> List[dict]:
+        """Per quality and stage: runs, median seconds per image and the highest peak memory seen."""
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT r.quality, s.stage, s.seconds / r.image_count, s.peak_memory_mb FROM stages s "
+                "JOIN runs r ON r.id = s.run_id WHERE r.succeeded = 1"
+            ).fetchall()
+        groups: Dict[tuple, List[tuple]] = {}
+        for quality, stage, per_image, memory in rows:
+            groups.setdefault((quality, stage), []).append((per_image, memory))
+        return [
+            {
+                "quality": quality,
+                "stage": stage,
+                "runs": len(values),
+                "median_s_per_image": statistics.median(per_image for per_image, _ in values),
+                "peak_memory_mb": max((memory for _, memory in values if memory is not None), default=None)
+            }
+            for (quality, stage), values in sorted(groups.items(), key=lambda item: (item[0][0], stage_order(item[0][1])))
+        ]
+    
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        db.executescript(HISTORY_SCHEMA)
+        return db
+
+
+def stage_order(stage: str) -> int:
+    return ODM_STAGES.index(stage) if stage in ODM_STAGES else len(ODM_STAGES)
+
+
+def work_units(image_count: int, megapixels: float, split: Optional[int]) -> float:
+    """Relative ODM work: n^ODM_SCALING_EXPONENT per model, scaled by frame size."""
+    submodel = split or image_count
+    submodels = -(-image_count // submodel)
+    return submodels * submodel ** ODM_SCALING_EXPONENT * megapixels / 12
+
+
+class OdmProgressTracker:
+    """
+    Follows an ODM run through its console output: stage transitions give per-stage
+    wall time, memory samples from the backend give per-stage peak memory, and the
+    remaining stages are estimated from past runs of the same profile.
+    """
+    
+    def __init__(self, config: Config, history: OdmRunHistory):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.history = history
+        self._lock = threading.Lock()
+        self.logger.info("OdmProgressTracker initialized successfully")
+    
+    def start(self, profile: OdmProfile, odm_run: OdmRun, backend: str):
+        self.profile = profile
+        self.odm_run = odm_run
+        self.backend = backend
+        self.stages = self._expected_stages(odm_run.args, odm_run.rerun_from)
+        self.predicted = self._predict(profile, self.stages)
+        self.started_at = time.time()
+        self.timings: List[StageTiming] = []
+        self.current: Optional[str] = None
+        self.stage_started = self.started_at
+        self.peak_memory_mb: Optional[float] = None
+        history = "past runs" if self._from_history else "the profile estimate"
+        self.logger.info(
+            f"ODM run of {len(self.stages)} stages, ~{sum(self.predicted.values()) / 3600:.1f} h predicted from {history}"
+        )
+    
+    def feed(self, line: str) -> Optional[OdmProgress]:
+        """Parse one line of ODM output; returns an update when a stage starts or ends."""
+        finished = STAGE_FINISHED.search(line)
+        if finished and finished.group(1) == self.current:
+            self._close_stage()
+            return self.progress()
+        started = STAGE_STARTED.search(line)
+        # During the split stage the submodels print their own stage lines
+        if started and started.group(1) in ODM_STAGES and self.current != "split":
+            self._close_stage()
+            with self._lock:
+                self.current = started.group(1)
+                self.stage_started = time.time()
+                self.peak_memory_mb = None
+            return self.progress()
+        return None
+    
+    def sample_memory(self, memory_mb: float):
+        """Memory use of the ODM process or container, sampled by the backend."""
+        with self._lock:
+            if self.current is not None and (self.peak_memory_mb is None or memory_mb > self.peak_memory_mb):
+                self.peak_memory_mb = memory_mb
+    
+    def progress(self) -> OdmProgress:
+        now = time.time()
+        done = {timing.stage for timing in self.timings}
+        finished_predicted = sum(self.predicted.get(t.stage, 0.0) for t in self.timings)
+        finished_actual = sum(t.seconds for t in self.timings)
+        # Rescale what is left by how fast this machine went through the finished stages
+        pace = min(max(finished_actual / finished_predicted, MIN_PACE), MAX_PACE) if finished_predicted > 0 else 1.0
+        
+        remaining = sum(self.predicted[stage] for stage in self.stages if stage not in done and stage != self.current)
+        if self.current is not None:
+            remaining += max(self.predicted.get(self.current, 0.0) - (now - self.stage_started) / pace, 0.0)
+        eta = remaining * pace
+        elapsed = now - self.started_at
+        percent = int(100 * elapsed / (elapsed + eta)) if elapsed + eta > 0 else 0
+        stage = self.current or (self.timings[-1].stage if self.timings else self.stages[0])
+        number = self.stages.index(stage) + 1 if stage in self.stages else len(done)
+        return OdmProgress(stage, number, len(self.stages), min(percent, 99), elapsed, eta)
+    
+    def finish(self, succeeded: bool) -> List[StageTiming]:
+        """Close the run, store its timings in the history and return them."""
+        self._close_stage()
+        try:
+            self.history.record(
+                self.profile, self.backend, self.odm_run.rerun_from, self.started_at, self.timings, succeeded
+            )
+        except Exception as e:
+            self.logger.error(f"Error recording ODM run history: {e}")
+        return self.timings
+    
+    @staticmethod
+    def report(timings: List[StageTiming]) -> str:
+        parts = []
+        for t in timings:
+            memory = f", {t.peak_memory_mb / 1024:.1f} GB peak" if t.peak_memory_mb is not None else ""
+            parts.append(f"{t.stage} {t.seconds / 60:.1f} min{memory}")
+        return "ODM stage timings: " + "; ".join(parts)
+    
+    def _close_stage(self):
+        with self._lock:
+            if self.current is None:
+                return
+            self.timings.append(StageTiming(self.current, time.time() - self.stage_started, self.peak_memory_mb))
+            self.current = None
+    
+    @staticmethod
+    def _expected_stages(args: List[str], rerun_from: Optional[str]) -> List[str]:
+        options = cli_options(args)
+        stages = list(ODM_STAGES)
+        if "split" not in options:
+            stages = [stage for stage in stages if stage not in ("split", "merge")]
+        if "fast-orthophoto" in options:
+            stages.remove("openmvs")
+        if rerun_from in stages:
+            stages = stages[stages.index(rerun_from):]
+        if options.get("end-with") in stages:
+            stages = stages[:stages.index(options["end-with"]) + 1]
+        return stages
+    
+    def _predict(self, profile: OdmProfile, stages: List[str]) -> Dict[str, float]:
+        """Predicted seconds per stage: from history where available, else a share of the planner's estimate."""
+        try:
+            costs = self.history.stage_costs(profile.quality, bool(profile.split))
+        except Exception as e:
+            self.logger.error(f"Error reading ODM run history: {e}")
+            costs = {}
+        self._from_history = bool(costs)
+        units = work_units(profile.image_count, profile.megapixels, profile.split)
+        shares = dict(DEFAULT_STAGE_SHARES)
+        if profile.split:
+            # The submodels run their whole pipeline inside the split stage; later top-level stages only merge
+            submodel_stages = ODM_STAGES[ODM_STAGES.index("opensfm"):]
+            shares["split"] += sum(shares[stage] for stage in submodel_stages)
+            shares.update({stage: 0.0 for stage in submodel_stages})
+        full_run = self._expected_stages(self.odm_run.args, None)
+        share_total = sum(shares[stage] for stage in full_run)
+        return {
+            stage: costs[stage] * units if stage in costs
+            else profile.predicted_runtime_s * shares[stage] / share_total
+            for stage in stages
+        }
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import logging
+
+from src.App.config import Config
+from src.App.component.ingest_manifest import IngestManifest
+from src.App.component.odm_backend import cli_options, find_orthophoto
+
+IMAGE_EXTENSIONS = ('.tif', '.tiff')
+WORKSPACE_FILE = "workspace.json"
+# ODM pipeline stages in run order (the values --rerun-from accepts)
+ODM_STAGES = (
+    "dataset", "split", "merge", "opensfm", "openmvs", "odm_filterpoints", "odm_meshing",
+    "mvs_texturing", "odm_georeferencing", "odm_dem", "odm_orthophoto", "odm_report", "odm_postprocess"
+)
+# First stage whose output depends on each option; None for options that do not change
+# the results. A change to any option not listed here reruns the whole pipeline.
+OPTION_STAGES = {
+    "max-concurrency": None,
+    "end-with": None,
+    "radiometric-calibration": "opensfm",
+    "fast-orthophoto": "opensfm",
+    "pc-quality": "openmvs",
+    "skip-3dmodel": "odm_meshing",
+    "orthophoto-resolution": "odm_orthophoto",
+    "skip-report": "odm_report",
+}
+
+
+class OdmRun(NamedTuple):
+    """Where and how to run ODM for one image set."""
+    project_dir: Path
+    args: List[str]
+    rerun_from: Optional[str]
+    reuse: bool
+    # The finished orthophoto when reuse is True
+    orthophoto: Optional[Path] = None
+    
+    def summary(self) -> str:
+        if self.reuse:
+            return f"ODM workspace {self.project_dir.name}: same images and options, reusing the orthophoto"
+        if self.rerun_from:
+            return f"ODM workspace {self.project_dir.name}: options changed, rerunning from {self.rerun_from}"
+        return f"ODM workspace {self.project_dir.name}: processing"
+
+
+class OdmWorkspaces:
+    """
+    Persistent ODM projects keyed by a fingerprint of the input images. A repeat run
+    on the same images reruns ODM only from the earliest stage its changed options
+    affect, and skips ODM when nothing changed.
+    """
+    
+    def __init__(self, config: Config, manifest: IngestManifest):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.manifest = manifest
+        self.root = config.odm_workspace_dir
+        self.max_workspaces = config.odm_max_workspaces
+        self.logger.info(f"OdmWorkspaces initialized at {self.root}")
+    
+    def prepare(self, images_dir: str, args: Sequence[str]) -> OdmRun:
+        """Find or create the workspace for the images in images_dir and link the images into it."""
+        fingerprint = self.fingerprint(images_dir)
+        project_dir = self.root / fingerprint
+        state = self._load_state(project_dir)
+        
+        stage = None
+        orthophoto = None
+        if state is not None:
+            stage = self.rerun_stage(state["args"], args)
+            if not state["completed"] and state.get("pending_stage"):
+                # An interrupted rerun left stale outputs after its starting stage
+                stage = self._earliest(stage, state["pending_stage"])
+            if state["completed"] and stage is None:
+                orthophoto = find_orthophoto(project_dir)
+        reuse = orthophoto is not None
+        
+        self._link_images(Path(images_dir), project_dir / "images")
+        self._save_state(project_dir, {
+            "fingerprint": fingerprint,
+            "args": list(args),
+            "completed": reuse,
+            "pending_stage": stage,
+            "last_used": time.time()
+        })
+        self._evict(keep=project_dir)
+        
+        run_args = list(args) + (['--rerun-from', stage] if stage else [])
+        return OdmRun(project_dir, run_args, stage, reuse, orthophoto)
+    
+    def complete(self, run: OdmRun):
+        """Record that ODM finished in the run's workspace."""
+        state = self._load_state(run.project_dir) or {}
+        state.update(completed=True, pending_stage=None, last_used=time.time())
+        self._save_state(run.project_dir, state)
+    
+    def fingerprint(self, images_dir: str) -> str:
+        """Hash of the image names and contents, from the ingest manifest's fast hashes."""
+        known = {frame["dest"]: frame["fast_hash"] for frame in self.manifest.frames()}
+        digest = hashlib.blake2b(digest_size=8)
+        for name in sorted(os.listdir(images_dir)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            fast_hash = known.get(name) or IngestManifest.fast_hash(os.path.join(images_dir, name))
+            digest.update(f"{name}:{fast_hash}\n".encode())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def rerun_stage(previous: Sequence[str], current: Sequence[str]) -> Optional[str]:
+        """Earliest ODM stage affected by the option changes from previous to current, or None."""
+        before, after = cli_options(previous), cli_options(current)
+        changed = {name for name in before.keys() | after.keys() if before.get(name) != after.get(name)}
+        stages = [OPTION_STAGES.get(name, "dataset") for name in changed]
+        if any(stages) and ("split" in before or "split" in after):
+            # Submodels are separate ODM projects; a split-merge run can only be redone whole
+            return "dataset"
+        return OdmWorkspaces._earliest(*stages)
+    
+    @staticmethod
+    def _earliest(*stages: Optional[str]) -> Optional[str]:
+        stages = [stage for stage in stages if stage]
+        return min(stages, key=ODM_STAGES.index) if stages else None
+    
+    def _link_images(self, images_dir: Path, workspace_images: Path):
+        """Make workspace_images mirror images_dir with links, keeping entries that are already right."""
+        workspace_images.mkdir(parents=True, exist_ok=True)
+        names = {name for name in os.listdir(images_dir) if name.lower().endswith(IMAGE_EXTENSIONS)}
+        for name in os.listdir(workspace_images):
+            if name not in names:
+                os.unlink(workspace_images / name)
+        
+        for name in names:
+            src, dest = images_dir / name, workspace_images / name
+            if os.path.lexists(dest):
+                if dest.exists() and os.path.samefile(src, dest):
+                    continue
+                os.unlink(dest)
+            if src.is_symlink():
+                # Keep pointing at the source, which the ODM container mounts at the same path
+                os.symlink(os.readlink(src), dest)
+                continue
+            try:
+                os.link(src, dest)
+            except OSError as e:
+                self.logger.warning(f"Cannot hardlink {src} into the workspace ({e}); copying")
+                shutil.copy2(src, dest)
+    
+    def _load_state(self, project_dir: Path) -> Optional[dict]:
+        try:
+            return json.loads((project_dir / WORKSPACE_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+    
+    def _save_state(self, project_dir: Path, state: dict):
+        project_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = project_dir / (WORKSPACE_FILE + ".tmp")
+        temp_path.write_text(json.dumps(state))
+        os.replace(temp_path, project_dir / WORKSPACE_FILE)
+    
+    def _evict(self, keep: Path):
+        """Delete the least recently used workspaces beyond max_workspaces."""
+        workspaces: Dict[Path, float] = {}
+        for project_dir in self.root.iterdir():
+            if project_dir.is_dir() and project_dir != keep:
+                state = self._load_state(project_dir) or {}
+                workspaces[project_dir] = state.get("last_used", 0.0)
+        
+        for project_dir in sorted(workspaces, key=workspaces.get, reverse=True)[max(self.max_workspaces - 1, 0):]:
+            try:
+                shutil.rmtree(project_dir)
+                self.logger.info(f"Removed least recently used ODM workspace {project_dir.name}")
+            except Exception as e:
+                self.logger.error(f"Error removing ODM workspace {project_dir}: {e}")
@@ -0,0 +1,202 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+import logging
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from pyproj import Transformer
+from rasterio.transform import from_origin
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.tiff_processor import LabelGrid, TiffProcessor
+
+# EXIF/XMP band names that differ from the band mapping keys
+BAND_ALIASES = {"NEAR_IR": "NIR", "NEARIR": "NIR", "REDEDGE": "RED_EDGE", "RE": "RED_EDGE"}
+
+
+class FramePatches(NamedTuple):
+    """Patch features of one capture and where the capture sits on the ground (metres, UTM)."""
+    origins: np.ndarray
+    features: np.ndarray
+    x: float
+    y: float
+    heading: float
+    gsd: float
+    width: int
+    height: int
+
+
+class QuickLookMapper:
+    """
+    Provisional growth map from the raw captures, without ODM: every capture is placed
+    on the ground from its EXIF position, altitude and heading, its patches are
+    classified in one batch, and the per-frame labels are merged by vote onto a
+    common patch grid. Radiometry is uncalibrated, so the result is only indicative.
+    """
+    
+    def __init__(self, config: Config, processor: TiffProcessor):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.processor = processor
+        self.workers = config.quick_look_workers
+        self.flight_height = config.flight_height
+        self.fov_across, _ = config.camera_fov
+        self.logger.info("QuickLookMapper initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def build(self, frames: List[dict], images_dir: str) -> Optional[gpd.GeoDataFrame]:
+        """frames are ingest manifest rows; only images placed in images_dir are used."""
+        captures = self._captures(frames, images_dir)
+        if not captures:
+            self.logger.warning("No geotagged captures for a quick look")
+            return None
+        
+        lats = np.array([capture[0]["gps_lat"] for capture in captures])
+        lons = np.array([capture[0]["gps_lon"] for capture in captures])
+        crs = gpd.GeoSeries(gpd.points_from_xy(lons, lats), crs="EPSG:4326").estimate_utm_crs()
+        xs, ys = Transformer.from_crs("EPSG:4326", crs, always_xy=True).transform(lons, lats)
+        altitudes = [capture[0]["gps_alt"] for capture in captures]
+        median_altitude = float(np.median([a for a in altitudes if a is not None] or [0.0]))
+        
+        jobs = []
+        for i, capture in enumerate(captures):
+            heading = next((frame["heading"] for frame in capture if frame["heading"] is not None), None)
+            if heading is None:
+                # No yaw recorded: assume the camera faces along the flight path
+                before, after = max(i - 1, 0), min(i + 1, len(captures) - 1)
+                heading = math.degrees(math.atan2(xs[after] - xs[before], ys[after] - ys[before])) % 360
+            altitude = altitudes[i]
+            height = max(self.flight_height + ((altitude - median_altitude) if altitude is not None else 0.0), 1.0)
+            jobs.append((capture, float(xs[i]), float(ys[i]), heading, height))
+        
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="quicklook") as pool:
+            patches = [p for p in pool.map(lambda job: self._capture_patches(*job), jobs) if p is not None]
+        if not patches:
+            self.logger.warning("No classifiable patches in the captures")
+            return None
+        
+        feature_matrix = np.vstack([p.features for p in patches])
+        self.logger.info(f"Predicting growth stages for {len(feature_matrix)} patches of {len(patches)} captures...")
+        model = self.processor.model
+        if model.is_cascade:
+            labels = model.predict_cascade(feature_matrix).labels
+        else:
+            labels = model.predict_growth_stages(feature_matrix)
+        
+        offsets = np.cumsum([0] + [len(p.features) for p in patches])
+        grid = self._merge(patches, [labels[a:b] for a, b in zip(offsets[:-1], offsets[1:])], crs)
+        return self.processor.label_grid_to_geodataframe(grid)
+    
+    def _captures(self, frames: List[dict], images_dir: str) -> List[List[dict]]:
+        """Placed, geotagged band images grouped by capture, in flight order."""
+        groups: Dict[tuple, List[dict]] = {}
+        for frame in sorted(frames, key=lambda frame: (frame["taken_at"] or "", frame["path"])):
+            if frame["gps_lat"] is None or frame["gps_lon"] is None:
+                continue
+            if not os.path.exists(os.path.join(images_dir, frame["dest"])):
+                continue
+            key = (frame["taken_at"], round(frame["gps_lat"], 7), round(frame["gps_lon"], 7))
+            groups.setdefault(key, []).append(dict(frame, image=os.path.join(images_dir, frame["dest"])))
+        return list(groups.values())
+    
+    def _capture_patches(self, capture: List[dict], x: float, y: float, heading: float, height: float):
+        try:
+            stack = self._read_bands(capture)
+        except Exception as e:
+            self.logger.warning(f"Skipping capture {capture[0]['path']}: {e}")
+            return None
+        if stack is None:
+            return None
+        
+        origins, features, _, _ = self.processor.extract_patch_features(stack)
+        if not origins:
+            return None
+        _, h, w = stack.shape
+        gsd = 2 * height * math.tan(math.radians(self.fov_across) / 2) / w
+        return FramePatches(np.array(origins), np.vstack(features), x, y, heading, gsd, w, h)
+    
+    def _read_bands(self, capture: List[dict]) -> Optional[np.ndarray]:
+        """Stack the band images of a capture in the order of the configured band mapping."""
+        mapping = self.processor.band_mapping
+        if len(capture) == 1:
+            with rasterio.open(capture[0]["image"]) as src:
+                # Float like the ODM orthophoto, so band arithmetic cannot wrap around
+                return src.read().astype(np.float32) if src.count > max(mapping.values()) else None
+        
+        stack: List[Optional[np.ndarray]] = [None] * (max(mapping.values()) + 1)
+        for i, frame in enumerate(sorted(capture, key=lambda frame: frame["path"])):
+            if frame["band_name"]:
+                name = frame["band_name"].upper().replace(" ", "_").replace("-", "_")
+                index = mapping.get(BAND_ALIASES.get(name, name))
+            else:
+                # Without band names, file order (IMG_0001_1 .. _5) is taken as the mapping order
+                index = i if i < len(stack) else None
+            if index is not None:
+                with rasterio.open(frame["image"]) as src:
+                    stack[index] = src.read(1).astype(np.float32)
+        
+        required = [mapping[band] for band in ("RED", "NIR") if band in mapping]
+        if any(stack[i] is None for i in required):
+            return None
+        reference = stack[required[0]]
+        # Bands not needed by the features (or of another size, e.g. thermal) are left empty
+        return np.stack([
+            band if band is not None and band.shape == reference.shape else np.zeros_like(reference)
+            for band in stack
+        ])
+    
+    def _merge(self, patches: List[FramePatches], labels: List[np.ndarray], crs) -> LabelGrid:
+        """Vote the per-frame patch labels onto one north-up grid of patch-sized cells."""
+        patch_size = self.config.patch_size
+        cell = patch_size * float(np.median([p.gsd for p in patches]))
+        
+        corners = []
+        for p in patches:
+            half = math.hypot(p.width, p.height) / 2 * p.gsd
+            corners.append((p.x - half, p.y - half, p.x + half, p.y + half))
+        corners = np.array(corners)
+        west, south = corners[:, 0].min(), corners[:, 1].min()
+        east, north = corners[:, 2].max(), corners[:, 3].max()
+        grid_w = int(math.ceil((east - west) / cell))
+        grid_h = int(math.ceil((north - south) / cell))
+        votes = np.zeros((grid_h, grid_w, len(self.config.growth_stages)), dtype=np.uint16)
+        
+        for p, frame_labels, (x0, y0, x1, y1) in zip(patches, labels, corners):
+            frame_grid = np.full((p.height // patch_size, p.width // patch_size), -1, dtype=np.int16)
+            frame_grid[p.origins[:, 0] // patch_size, p.origins[:, 1] // patch_size] = frame_labels
+            
+            c0, c1 = int((x0 - west) // cell), int(math.ceil((x1 - west) / cell))
+            r0, r1 = int((north - y1) // cell), int(math.ceil((north - y0) / cell))
+            cols = np.arange(max(c0, 0), min(c1, grid_w))
+            rows = np.arange(max(r0, 0), min(r1, grid_h))
+            dx = (west + (cols + 0.5) * cell - p.x)[None, :]
+            dy = (north - (rows + 0.5) * cell - p.y)[:, None]
+            
+            # Ground offsets to image pixels: image up is the heading, image right is heading + 90
+            theta = math.radians(p.heading)
+            right = dx * math.cos(theta) - dy * math.sin(theta)
+            forward = dx * math.sin(theta) + dy * math.cos(theta)
+            patch_cols = np.floor((p.width / 2 + right / p.gsd) / patch_size).astype(int)
+            patch_rows = np.floor((p.height / 2 - forward / p.gsd) / patch_size).astype(int)
+            inside = (
+                (patch_cols >= 0) & (patch_cols < frame_grid.shape[1]) &
+                (patch_rows >= 0) & (patch_rows < frame_grid.shape[0])
+            )
+            cell_rows, cell_cols = np.broadcast_arrays(rows[:, None], cols[None, :])
+            values = frame_grid[patch_rows[inside], patch_cols[inside]]
+            classified = values >= 0
+            np.add.at(
+                votes,
+                (cell_rows[inside][classified], cell_cols[inside][classified], values[classified]),
+                1
+            )
+        
+        label_grid = votes.argmax(axis=2).astype(np.int16)
+        label_grid[votes.sum(axis=2) == 0] = -1
+        self.logger.info(f"Quick-look grid {grid_w}x{grid_h} cells of {cell:.2f} m from {len(patches)} captures")
+        return LabelGrid(label_grid, from_origin(west, north, cell, cell), crs)
+
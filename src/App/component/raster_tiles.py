@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+from typing import List
+import logging
+import shutil
+
+import numpy as np
+from PIL import Image
+from rasterio.enums import Resampling
+from rasterio.transform import array_bounds, from_bounds
+from rasterio.warp import reproject, transform_bounds
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.vector_tiles import TILE_PIXELS, tile_bounds, tile_range
+from src.App.component.web_map import render_leaflet_page
+
+NODATA = -1
+FILL_OPACITY = 0.7
+
+
+class RasterTileMapWriter:
+    """Renders the patch-grid label raster into a colored PNG XYZ tile pyramid in Web Mercator."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.min_zoom = config.map_min_zoom
+        self.max_zoom = config.map_max_zoom
+        self.logger.info("RasterTileMapWriter initialized successfully")
+    
+    def _palette(self) -> List[int]:
+        """RGB palette: index 0 is nodata (transparent), index label + 1 is the stage color."""
+        colors = ["#000000"] + [
+            self.config.default_colors.get(stage, self.config.default_colors[None])
+            for stage in self.config.growth_stages
+        ]
+        palette = []
+        for color in colors:
+            color = color.lstrip("#")
+            palette.extend(int(color[i:i + 2], 16) for i in (0, 2, 4))
+        return palette
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def write_map(self, label_grid, output_path: Path, backdrop=None) -> Path:
+        """
+        Write '<map name>_tiles/{z}/{x}/{y}.png' next to output_path and an HTML page
+        that shows the pyramid as a Leaflet tile layer.
+        """
+        tiles_dir = output_path.parent / f"{output_path.stem}_tiles"
+        if tiles_dir.exists():
+            shutil.rmtree(tiles_dir)
+        
+        num_tiles = self.write_pyramid(label_grid, tiles_dir)
+        self.logger.info(f"Wrote {num_tiles} raster tiles (z{self.min_zoom}-{self.max_zoom}) to {tiles_dir}")
+        
+        height, width = label_grid.labels.shape
+        west, south, east, north = transform_bounds(
+            label_grid.crs, "EPSG:4326", *array_bounds(height, width, label_grid.transform)
+        )
+        layer_js = f"""
+L.tileLayer({json.dumps(tiles_dir.name + "/{z}/{x}/{y}.png")}, {{
+    minNativeZoom: {self.min_zoom},
+    maxNativeZoom: {self.max_zoom},
+    maxZoom: 22,
+    opacity: {FILL_OPACITY}
+}}).addTo(map);
+"""
+        html = render_leaflet_page(
+            self.config, output_path.stem, (west, south, east, north), layer_js, backdrop=backdrop
+        )
+        output_path.write_text(html, encoding="utf-8")
+        return output_path
+    
+    def write_pyramid(self, label_grid, tiles_dir: Path) -> int:
+        """Warp the label grid into every tile of the pyramid and write non-empty tiles as palette PNGs."""
+        height, width = label_grid.labels.shape
+        mercator_bounds = transform_bounds(
+            label_grid.crs, "EPSG:3857", *array_bounds(height, width, label_grid.transform)
+        )
+        source = label_grid.labels.astype(np.int16)
+        palette = self._palette()
+        num_tiles = 0
+        
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            for x, y in tile_range(mercator_bounds, zoom):
+                tile = np.full((TILE_PIXELS, TILE_PIXELS), NODATA, dtype=np.int16)
+                reproject(
+                    source=source,
+                    destination=tile,
+                    src_transform=label_grid.transform,
+                    src_crs=label_grid.crs,
+                    src_nodata=NODATA,
+                    dst_transform=from_bounds(*tile_bounds(zoom, x, y), TILE_PIXELS, TILE_PIXELS),
+                    dst_crs="EPSG:3857",
+                    dst_nodata=NODATA,
+                    resampling=Resampling.mode
+                )
+                if np.all(tile == NODATA):
+                    continue
+                
+                image = Image.frombytes("P", (TILE_PIXELS, TILE_PIXELS), (tile + 1).astype(np.uint8).tobytes())
+                image.putpalette(palette)
+                tile_path = tiles_dir / str(zoom) / str(x) / f"{y}.png"
+                tile_path.parent.mkdir(parents=True, exist_ok=True)
+                image.save(tile_path, optimize=True, transparency=0)
+                num_tiles += 1
+        
+        return num_tiles
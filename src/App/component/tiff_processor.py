@@ -1,15 +1,36 @@
 import rasterio
-from rasterio.features import shapes
+from rasterio.enums import Resampling
+from rasterio.crs import CRS
+from rasterio.features import sieve
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
 import numpy as np
 import json
 from pathlib import Path
 import geopandas as gpd
-from typing import List, Optional
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+from typing import List, NamedTuple, Optional, Sequence, Union
 import logging
+from datetime import datetime
 
-from src.App.utils import log_execution_time
+from src.App.utils import log_execution_time, majority_filter
 from src.App.config import Config
-from src.App.model.sys_model import GrowthStageModel
+from src.App.model.sys_model import DECISION_STAGES, FEATURE_NAMES, GrowthStageModel
+from src.App.component.vectorizer import GridVectorizer
+from src.App.component.mosaic import build_virtual_mosaic
+
+class LabelGrid(NamedTuple):
+    """Patch-grid growth stage labels (-1 = unclassified) with their georeferencing."""
+    labels: np.ndarray
+    transform: object
+    crs: object
+
+
+# uint8 quantization of class probabilities (value / PROBABILITY_SCALE)
+PROBABILITY_SCALE = 254
+PROBABILITY_NODATA = 255
 
 
 class TiffProcessor:
@@ -18,111 +39,392 @@ class TiffProcessor:
     def __init__(self, config: Config):
         self.config = config
         self.logger = logging.getLogger(__name__)
-        self.model = GrowthStageModel(config.model_path)
+        self.model = GrowthStageModel(
+            config.model_path,
+            fast_model_path=config.fast_model_path if config.cascade_enabled else None,
+            confidence_threshold=config.cascade_confidence_threshold
+        )
         self.band_mapping = config.band_mappings[config.band_mapping_type]
+        self.vectorizer = GridVectorizer(config)
         self.logger.info("TiffProcessor initialized successfully")
     
     @log_execution_time(logging.getLogger(__name__))
     def process_field(
         self,
-        image_path: Path,
-        output_dir: Optional[Path] = None
-    ) -> Optional[Path]:
+        image_path: Union[Path, Sequence[Path]],
+        output_dir: Optional[Path] = None,
+        in_memory: bool = False
+    ) -> Optional[Union[Path, gpd.GeoDataFrame]]:
         """
         Process the field image and generate a GeoJSON with growth stage classifications.
+        With in_memory=True the classified regions are returned as a GeoDataFrame
+        (carrying the image CRS) instead of being written to disk. Several orthophotos
+        (e.g. ODM split-merge submodels) are classified as one virtual mosaic on a
+        single patch grid; the image is read in windows, so no merged raster is built.
         """
         output_dir = output_dir or self.config.output_dir
         output_dir.mkdir(parents=True, exist_ok=True)
         output_geojson_path = output_dir / "classified_output.geojson"
         
+        if not isinstance(image_path, (str, Path)):
+            paths = [Path(path) for path in image_path]
+            if len(paths) == 1:
+                image_path = paths[0]
+            else:
+                image_path = build_virtual_mosaic(paths, output_dir / "orthophoto_mosaic.vrt")
+        image_path = Path(image_path)
         self.logger.info(f"Starting processing for: {image_path.name}")
         
         with rasterio.open(image_path) as src:
-            image_data = src.read()
             transform = src.transform
             nodata_val = src.nodata
             
-            bands, h, w = image_data.shape
+            bands, h, w = src.count, src.height, src.width
             self.logger.info(f"Image dimensions: {h}x{w} pixels, {bands} bands")
             
-            classified_raster = np.full((h, w), fill_value=-1, dtype=np.int16)
-            num_patches_skipped = 0
-            total_patches = 0
+            # One cell per full patch; partial edge patches are never classified.
+            patch_size = self.config.patch_size
+            grid_h, grid_w = h // patch_size, w // patch_size
+            grid_transform = transform * transform.scale(patch_size, patch_size)
+            label_grid = np.full((grid_h, grid_w), fill_value=-1, dtype=np.int16)
             
             self.logger.info("Starting patch processing...")
+            patch_origins, patch_features, total_patches, num_patches_skipped = self._extract_windowed_features(
+                src, nodata_val
+            )
             
-            for r_start in range(0, h, self.config.patch_size):
-                for c_start in range(0, w, self.config.patch_size):
-                    total_patches += 1
-                    r_end = r_start + self.config.patch_size
-                    c_end = c_start + self.config.patch_size
-                    
-                    current_h = min(self.config.patch_size, h - r_start)
-                    current_w = min(self.config.patch_size, w - c_start)
-                    
-                    if current_h < self.config.patch_size or current_w < self.config.patch_size:
-                        num_patches_skipped += 1
-                        continue
-                    
-                    patch_data = image_data[:, r_start:r_end, c_start:c_end]
-                    
-                    if nodata_val is not None and np.all(patch_data == nodata_val):
-                        num_patches_skipped += 1
-                        continue
-                    
-                    if np.sum(patch_data) < self.config.min_pixel_sum_threshold:
-                        num_patches_skipped += 1
-                        continue
-                    
-                    try:
-                        features = self.model.extract_features(patch_data, self.band_mapping)
-                        if any(np.isnan(f) for f in features):
-                            num_patches_skipped += 1
-                            continue
-                            
-                        prediction_label = self.model.predict_growth_stage(features)
-                        classified_raster[r_start:r_end, c_start:c_end] = prediction_label
-                        self.logger.info(f"Processed patch at ({r_start},{c_start}) with label {prediction_label}")
-                    except Exception as e:
-                        self.logger.warning(f"Skipping patch at ({r_start},{c_start}): {e}")
-                        num_patches_skipped += 1
-                        continue
+            if not patch_origins:
+                self.logger.warning("No valid patches found for classification")
+                return None
+            
+            self.logger.info(f"Predicting growth stages for {len(patch_origins)} patches...")
+            feature_matrix = np.vstack(patch_features)
+            rows, cols = (np.array(patch_origins) // patch_size).T
+            decision_grid = None
+            if self.model.is_cascade or self.config.write_probability_raster:
+                prediction = self.model.predict_cascade(feature_matrix)
+                labels = prediction.labels
+                if self.model.is_cascade:
+                    self.logger.info(prediction.summary(self.model.confidence_threshold))
+                    decision_grid = np.zeros((grid_h, grid_w), dtype=np.int16)
+                    decision_grid[rows, cols] = prediction.decided_by
+            else:
+                labels = self.model.predict_growth_stages(feature_matrix)
+            
+            label_grid[rows, cols] = labels
+            
+            if self.config.smoothing_enabled:
+                label_grid = self._smooth_label_grid(label_grid)
+                if decision_grid is not None:
+                    decision_grid[label_grid == -1] = 0
+            
+            if self.config.write_probability_raster:
+                probability_path = output_dir / f"class_probabilities_{datetime.now().strftime('%Y%m%d_%H%M%S')}.tif"
+                self._write_probability_raster(
+                    prediction.probabilities, rows, cols, (grid_h, grid_w),
+                    grid_transform, src.crs, probability_path
+                )
+            
+            if self.config.write_cell_table:
+                cells_path = output_dir / f"classified_cells_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+                self._write_cell_table(
+                    feature_matrix, label_grid, rows, cols, grid_transform, src.crs, cells_path,
+                    prediction=prediction if self.model.is_cascade or self.config.write_probability_raster else None
+                )
             
             self.logger.info(
                 f"Patch processing completed. Processed {total_patches - num_patches_skipped} patches, "
                 f"skipped {num_patches_skipped} patches."
             )
             
-            self.logger.info("Vectorizing classified raster...")
-            geojson_features = []
-            for geom, value in shapes(
-                classified_raster.astype(np.int16),
-                mask=(classified_raster != -1),
-                transform=transform
-            ):
-                if value != -1:
-                    growth_stage_name = self.config.growth_stages[int(value)]
-                    geojson_features.append({
-                        "type": "Feature",
-                        "geometry": geom,
-                        "properties": {"growth_stage": growth_stage_name}
-                    })
-            
-            if not geojson_features:
+            self.logger.info("Vectorizing classified patch grid...")
+            # With a cascade, regions are split by deciding stage as well as label
+            # so every feature records which model classified it.
+            num_stages = len(DECISION_STAGES)
+            if decision_grid is not None:
+                vector_grid = np.where(
+                    label_grid != -1,
+                    label_grid * num_stages + decision_grid,
+                    -1
+                ).astype(np.int16)
+            else:
+                vector_grid = label_grid
+            
+            def to_feature(geom, value):
+                properties = {}
+                if decision_grid is not None:
+                    label, stage = divmod(value, num_stages)
+                    properties["growth_stage"] = self.config.growth_stages[label]
+                    properties["decided_by"] = DECISION_STAGES[stage]
+                else:
+                    properties["growth_stage"] = self.config.growth_stages[value]
+                return {
+                    "type": "Feature",
+                    "geometry": geom,
+                    "properties": properties
+                }
+            
+            # Optionally project only the grid nodes so polygons come out in map coordinates
+            if self.config.emit_wgs84:
+                output_crs = CRS.from_epsg(4326)
+                regions = self.vectorizer.vectorize(vector_grid, grid_transform, nodata=-1, crs=src.crs)
+            else:
+                output_crs = src.crs
+                regions = self.vectorizer.vectorize(vector_grid, grid_transform, nodata=-1)
+            
+            if in_memory:
+                result = self._to_geodataframe(regions, output_crs, split_by_stage=decision_grid is not None)
+                if result.empty:
+                    self.logger.warning("No features were vectorized from the raster")
+                    return None
+                result.attrs["bounds_wgs84"] = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
+                result.attrs["label_grid"] = LabelGrid(label_grid, grid_transform, src.crs)
+                self.logger.info(f"Vectorized {len(result)} features in memory")
+                return result
+            
+            features = (to_feature(geom, value) for geom, value in regions)
+            num_features = self._write_geojson(features, output_crs, output_geojson_path)
+            
+            if not num_features:
                 self.logger.warning("No features were vectorized from the raster")
+                output_geojson_path.unlink(missing_ok=True)
                 return None
             
-            output_geojson_data = {
-                "type": "FeatureCollection",
-                "crs": {
-                    "type": "name",
-                    "properties": {"name": f"EPSG:{src.crs.to_epsg()}"}
-                },
-                "features": geojson_features
+            self.logger.info(f"GeoJSON data saved to {output_geojson_path} ({num_features} features)")
+            return output_geojson_path
+    
+    def extract_patch_features(self, image_data: np.ndarray, nodata_val=None):
+        """
+        Features of every full, non-empty patch of a (bands, h, w) array.
+        Returns (patch origins, feature vectors, total patches, skipped patches).
+        """
+        bands, h, w = image_data.shape
+        num_patches_skipped = 0
+        total_patches = 0
+        patch_origins = []
+        patch_features = []
+        
+        for r_start in range(0, h, self.config.patch_size):
+            for c_start in range(0, w, self.config.patch_size):
+                total_patches += 1
+                r_end = r_start + self.config.patch_size
+                c_end = c_start + self.config.patch_size
+                
+                current_h = min(self.config.patch_size, h - r_start)
+                current_w = min(self.config.patch_size, w - c_start)
+                
+                if current_h < self.config.patch_size or current_w < self.config.patch_size:
+                    num_patches_skipped += 1
+                    continue
+                
+                patch_data = image_data[:, r_start:r_end, c_start:c_end]
+                
+                if nodata_val is not None and np.all(patch_data == nodata_val):
+                    num_patches_skipped += 1
+                    continue
+                
+                if np.sum(patch_data) < self.config.min_pixel_sum_threshold:
+                    num_patches_skipped += 1
+                    continue
+                
+                try:
+                    features = self.model.extract_features(patch_data, self.band_mapping)
+                    if any(np.isnan(f) for f in features):
+                        num_patches_skipped += 1
+                        continue
+                        
+                    patch_origins.append((r_start, c_start))
+                    patch_features.append(features)
+                except Exception as e:
+                    self.logger.warning(f"Skipping patch at ({r_start},{c_start}): {e}")
+                    num_patches_skipped += 1
+                    continue
+        
+        return patch_origins, patch_features, total_patches, num_patches_skipped
+    
+    def _extract_windowed_features(self, src, nodata_val=None):
+        """extract_patch_features over the whole image, read one window of whole patches at a time."""
+        patch_size = self.config.patch_size
+        window_size = patch_size * self.config.window_patches
+        patch_origins = []
+        patch_features = []
+        total_patches = 0
+        num_patches_skipped = 0
+        
+        for row_off in range(0, src.height, window_size):
+            for col_off in range(0, src.width, window_size):
+                window = Window(
+                    col_off, row_off, min(window_size, src.width - col_off), min(window_size, src.height - row_off)
+                )
+                origins, features, total, skipped = self.extract_patch_features(src.read(window=window), nodata_val)
+                patch_origins.extend((r + row_off, c + col_off) for r, c in origins)
+                patch_features.extend(features)
+                total_patches += total
+                num_patches_skipped += skipped
+        
+        return patch_origins, patch_features, total_patches, num_patches_skipped
+    
+    def label_grid_to_geodataframe(self, grid: LabelGrid) -> Optional[gpd.GeoDataFrame]:
+        """Vectorize a patch-grid of labels into the in-memory result process_field returns."""
+        regions = self.vectorizer.vectorize(grid.labels, grid.transform, nodata=-1)
+        result = self._to_geodataframe(regions, grid.crs)
+        if result.empty:
+            return None
+        grid_h, grid_w = grid.labels.shape
+        west, north = grid.transform * (0, 0)
+        east, south = grid.transform * (grid_w, grid_h)
+        result.attrs["bounds_wgs84"] = transform_bounds(grid.crs, "EPSG:4326", west, south, east, north)
+        result.attrs["label_grid"] = grid
+        return result
+    
+    def _to_geodataframe(self, regions, crs, split_by_stage: bool = False) -> gpd.GeoDataFrame:
+        """Collect vectorized (geometry, value) pairs into a GeoDataFrame with column-wise properties."""
+        geometries = []
+        values = []
+        for geom, value in regions:
+            geometries.append(shape(geom))
+            values.append(value)
+        
+        values = np.asarray(values, dtype=np.int64)
+        stage_names = np.asarray(self.config.growth_stages, dtype=object)
+        if split_by_stage:
+            labels, stages = np.divmod(values, len(DECISION_STAGES))
+            columns = {
+                "growth_stage": stage_names[labels],
+                "decided_by": np.asarray(DECISION_STAGES, dtype=object)[stages]
+            }
+        else:
+            columns = {"growth_stage": stage_names[values]}
+        return gpd.GeoDataFrame(columns, geometry=geometries, crs=crs)
+    
+    def _write_geojson(self, features, crs, output_path: Path) -> int:
+        """Stream features into a GeoJSON FeatureCollection and return how many were written."""
+        header = {
+            "type": "FeatureCollection",
+            "crs": {
+                "type": "name",
+                "properties": {"name": f"EPSG:{crs.to_epsg()}"}
             }
+        }
+        count = 0
+        with open(output_path, "w") as f:
+            f.write(json.dumps(header)[:-1] + ', "features": [\n')
+            for feature in features:
+                if count:
+                    f.write(",\n")
+                json.dump(feature, f)
+                count += 1
+            f.write("\n]}\n")
+        return count
+    
+    def _smooth_label_grid(self, label_grid: np.ndarray) -> np.ndarray:
+        """
+        Majority-filter the patch-grid labels and absorb connected regions smaller
+        than the configured minimum size into their largest neighbour.
+        """
+        kernel_size = self.config.smoothing_kernel_size
+        min_region_size = self.config.smoothing_min_region_size
+        
+        smoothed = majority_filter(label_grid, kernel_size=kernel_size, nodata=-1)
+        if min_region_size > 1:
+            valid = smoothed != -1
+            smoothed = sieve(smoothed, size=min_region_size, connectivity=4, mask=valid)
+            smoothed[~valid] = -1
+        
+        self.logger.info(
+            f"Smoothed label grid (kernel {kernel_size}, min region {min_region_size} cells): "
+            f"{int(np.count_nonzero(smoothed != label_grid))} cells relabelled"
+        )
+        return smoothed.astype(np.int16)
+    
+    def _write_cell_table(
+        self,
+        feature_matrix: np.ndarray,
+        label_grid: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        grid_transform,
+        crs,
+        output_path: Path,
+        prediction=None
+    ) -> Path:
+        """
+        Write one feature per classified patch to GeoParquet. Cell boxes are built in
+        a single vectorized shapely call from the grid transform and every column is
+        passed as an array, so no per-feature Python objects are created.
+        """
+        x0, y0 = grid_transform * (cols, rows)
+        x1, y1 = grid_transform * (cols + 1, rows + 1)
+        geometry = shapely.box(np.minimum(x0, x1), np.minimum(y0, y1), np.maximum(x0, x1), np.maximum(y0, y1))
+        
+        labels = label_grid[rows, cols]
+        columns = {
+            "row": rows.astype(np.int32),
+            "col": cols.astype(np.int32),
+            "label": labels,
+            "growth_stage": pd.Categorical.from_codes(labels, categories=self.config.growth_stages)
+        }
+        for i, name in enumerate(FEATURE_NAMES[:feature_matrix.shape[1]]):
+            columns[name] = feature_matrix[:, i].astype(np.float32)
+        if prediction is not None:
+            columns["confidence"] = prediction.confidence.astype(np.float32)
+            if self.model.is_cascade:
+                columns["decided_by"] = pd.Categorical.from_codes(prediction.decided_by, categories=list(DECISION_STAGES))
+        
+        cells = gpd.GeoDataFrame(columns, geometry=geometry, crs=crs)
+        cells.to_parquet(output_path, index=False)
+        self.logger.info(f"Cell table with {len(cells)} patches saved to {output_path}")
+        return output_path
+    
+    def _write_probability_raster(
+        self,
+        probabilities: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        grid_shape: tuple,
+        grid_transform,
+        crs,
+        output_path: Path
+    ) -> Path:
+        """
+        Write per-patch class probabilities as a tiled, compressed uint8 GeoTIFF at
+        patch-grid resolution, one band per growth stage. Probabilities are scaled
+        to 0..254 (value / 254) and 255 marks unclassified cells.
+        """
+        num_classes = probabilities.shape[1]
+        quantized = np.full((num_classes,) + tuple(grid_shape), PROBABILITY_NODATA, dtype=np.uint8)
+        quantized[:, rows, cols] = np.rint(probabilities.T * PROBABILITY_SCALE).astype(np.uint8)
+        
+        profile = {
+            "driver": "GTiff",
+            "height": grid_shape[0],
+            "width": grid_shape[1],
+            "count": num_classes,
+            "dtype": "uint8",
+            "crs": crs,
+            "transform": grid_transform,
+            "nodata": PROBABILITY_NODATA,
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+            "compress": "deflate",
+            "predictor": 2,
+            "interleave": "pixel"
+        }
+        with rasterio.open(output_path, "w", **profile) as dst:
+            dst.write(quantized)
+            for band, stage in enumerate(self.config.growth_stages[:num_classes], start=1):
+                dst.set_band_description(band, stage)
+            dst.update_tags(scale=1 / PROBABILITY_SCALE, patch_size=self.config.patch_size)
             
-            with open(output_geojson_path, "w") as f:
-                json.dump(output_geojson_data, f, indent=2)
-                
-            self.logger.info(f"GeoJSON data saved to {output_geojson_path}")
-            return output_geojson_path
\ No newline at end of file
+            factors = []
+            factor = 2
+            while min(grid_shape) // factor >= 1 and factor <= 64:
+                factors.append(factor)
+                factor *= 2
+            if factors:
+                dst.build_overviews(factors, Resampling.average)
+                dst.update_tags(ns="rio_overview", resampling="average")
+        
+        self.logger.info(f"Class probability raster saved to {output_path}")
+        return output_path
\ No newline at end of file
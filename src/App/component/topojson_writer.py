@@ -0,0 +1,337 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import logging
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.web_map import TOPOJSON_JS, render_leaflet_page
+
+OBJECT_NAME = "growth"
+# Max distance (in quantized units) of a vertex from another ring's segment to be inserted into it
+NODE_TOLERANCE = 1.0
+
+
+class TopoJsonMapWriter:
+    """
+    Encodes growth-stage polygons as quantized TopoJSON with shared arcs and writes a
+    Leaflet page that swaps in per-zoom-bracket simplified arcs. Arcs are simplified
+    with fixed end points, so neighbouring stages share the same simplified boundary
+    and no gaps appear between them. Arcs of polygons that simplification would make
+    invalid keep the next deeper bracket's version.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.quantization = config.topojson_quantization
+        self.zoom_brackets = sorted(config.topojson_zoom_brackets)
+        self.logger.info("TopoJsonMapWriter initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def write_map(self, geo_data: gpd.GeoDataFrame, output_path: Path, bounds_wgs84=None, backdrop=None) -> Path:
+        """Write an HTML map with the TopoJSON topology inlined; geo_data must be in EPSG:4326."""
+        topology, brackets = self.encode(geo_data)
+        bounds = bounds_wgs84 if bounds_wgs84 is not None else geo_data.total_bounds
+        
+        # topology.arcs are the deepest bracket's arcs; zoomBrackets holds the coarser ones
+        layer_js = f"""
+var topology = {json.dumps(topology, separators=(",", ":"))};
+var zoomBrackets = {json.dumps(brackets, separators=(",", ":"))};
+var stageLayer = null;
+var currentArcs = null;
+function arcsForZoom(zoom) {{
+    for (var i = 0; i < zoomBrackets.length; i++) {{
+        if (zoom <= zoomBrackets[i].max_zoom) {{ return zoomBrackets[i].arcs; }}
+    }}
+    return topology.arcs;
+}}
+function renderStages() {{
+    var arcs = arcsForZoom(map.getZoom());
+    if (arcs === currentArcs) {{ return; }}
+    currentArcs = arcs;
+    var bracketTopology = Object.assign({{}}, topology, {{arcs: arcs}});
+    var features = topojson.feature(bracketTopology, bracketTopology.objects.{OBJECT_NAME});
+    if (stageLayer) {{ map.removeLayer(stageLayer); }}
+    stageLayer = L.geoJSON(features, {{
+        style: function (feature) {{ return stageStyle(feature.properties); }},
+        onEachFeature: function (feature, layer) {{ layer.bindTooltip(feature.properties.growth_stage); }}
+    }}).addTo(map);
+}}
+map.on("zoomend", renderStages);
+renderStages();
+"""
+        html = render_leaflet_page(
+            self.config, output_path.stem, bounds, layer_js, js=TOPOJSON_JS, backdrop=backdrop
+        )
+        output_path.write_text(html, encoding="utf-8")
+        self.logger.info(
+            f"TopoJSON map with {len(topology['arcs'])} shared arcs and {len(brackets) + 1} zoom brackets "
+            f"written ({len(html) / 1024:.0f} KiB)"
+        )
+        return output_path
+    
+    def encode(self, geo_data: gpd.GeoDataFrame) -> Tuple[dict, List[dict]]:
+        """
+        Return the TopoJSON topology, whose arcs are simplified for the deepest zoom
+        bracket, and the coarser brackets' delta-encoded arcs that replace
+        topology['arcs'] up to their max_zoom. Brackets that would not remove any
+        point are left out.
+        """
+        x0, y0, x1, y1 = geo_data.total_bounds
+        scale = np.array([
+            (x1 - x0) / (self.quantization - 1) or 1.0,
+            (y1 - y0) / (self.quantization - 1) or 1.0
+        ])
+        translate = np.array([x0, y0])
+        
+        features = self._quantize(geo_data.geometry.values, translate, scale)
+        
+        flat_rings = [ring for polygons in features for polygon in polygons for ring in polygon]
+        noded = iter(self._node_rings(flat_rings))
+        features = [[[next(noded) for _ in polygon] for polygon in polygons] for polygons in features]
+        
+        junctions = self._find_junctions([ring for polygons in features for polygon in polygons for ring in polygon])
+        arcs: List[np.ndarray] = []
+        arc_index: Dict[tuple, int] = {}
+        geometries = []
+        properties = geo_data.drop(columns=geo_data.geometry.name).astype(str).to_dict("records")
+        for polygons, props in zip(features, properties):
+            encoded = [[self._ring_arcs(ring, junctions, arcs, arc_index) for ring in polygon] for polygon in polygons]
+            if not encoded:
+                continue
+            if len(encoded) == 1:
+                geometries.append({"type": "Polygon", "arcs": encoded[0], "properties": props})
+            else:
+                geometries.append({"type": "MultiPolygon", "arcs": encoded, "properties": props})
+        
+        polygon_arcs = [polygon for geometry in geometries for polygon in (
+            [geometry["arcs"]] if geometry["type"] == "Polygon" else geometry["arcs"]
+        )]
+        # Deepest bracket first: each bracket falls back to the next deeper one's arcs
+        levels = []
+        deeper = arcs
+        for max_zoom, tolerance_px in reversed(self.zoom_brackets):
+            # Screen pixel at the bracket's deepest zoom, in quantized units
+            pixel_degrees = 360.0 / (256 * 2 ** max_zoom)
+            tolerance = tolerance_px * pixel_degrees / scale.min()
+            simplified = self._simplify_arcs(arcs, deeper, tolerance, polygon_arcs) if tolerance > 0 else deeper
+            if levels and sum(map(len, simplified)) == sum(map(len, deeper)):
+                # Removes nothing beyond the deeper bracket: that bracket covers this one's zooms too
+                continue
+            levels.append((max_zoom, simplified))
+            deeper = simplified
+        if not levels:
+            levels.append((None, arcs))
+        
+        topology = {
+            "type": "Topology",
+            "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+            "objects": {OBJECT_NAME: {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": self._delta_encode(levels[0][1])
+        }
+        brackets = [
+            {"max_zoom": max_zoom, "arcs": self._delta_encode(simplified)}
+            for max_zoom, simplified in reversed(levels[1:])
+        ]
+        return topology, brackets
+    
+    @staticmethod
+    def _quantize(geometries: np.ndarray, translate: np.ndarray, scale: np.ndarray) -> List[list]:
+        """Features -> polygons -> rings of quantized integer coordinates (open, no closing point)."""
+        parts, part_feature = shapely.get_parts(geometries, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+        closing = np.r_[coord_ring[1:] != coord_ring[:-1], True]
+        coords, coord_ring = np.rint((coords[~closing] - translate) / scale).astype(np.int64), coord_ring[~closing]
+        
+        # Drop points equal to their predecessor in the ring (the first point compares with the last)
+        first = np.flatnonzero(np.r_[True, coord_ring[1:] != coord_ring[:-1]])
+        previous = np.roll(coords, 1, axis=0)
+        previous[first] = coords[np.r_[first[1:], len(coords)] - 1]
+        keep = np.any(coords != previous, axis=1)
+        ring_coords = np.split(coords[keep], np.cumsum(np.bincount(coord_ring[keep], minlength=len(rings)))[:-1])
+        
+        part_rings = [[] for _ in range(len(parts))]
+        for ring, part in zip(ring_coords, ring_part.tolist()):
+            part_rings[part].append(ring)
+        features = [[] for _ in range(len(geometries))]
+        for polygon, feature in zip(part_rings, part_feature.tolist()):
+            # Rings that collapse below a triangle are dropped, with their holes if it is the exterior
+            if polygon and len(polygon[0]) >= 3:
+                features[feature].append([ring for ring in polygon if len(ring) >= 3])
+        return features
+    
+    def _node_rings(self, rings: Sequence[np.ndarray]) -> List[np.ndarray]:
+        """
+        Insert every ring vertex that lies on another ring's segment into that segment,
+        so shared boundaries carry identical vertex sequences (grid polygons have
+        T-junctions where one side has a corner and the other a straight edge).
+        """
+        if not rings:
+            return []
+        starts = np.vstack(rings)
+        ring_ends = np.cumsum([len(ring) for ring in rings])
+        ends = np.roll(starts, -1, axis=0)
+        ends[ring_ends - 1] = starts[ring_ends - np.array([len(ring) for ring in rings])]
+        points = np.unique(starts, axis=0)
+        tree = shapely.STRtree(shapely.points(points))
+        segment_boxes = shapely.box(
+            np.minimum(starts[:, 0], ends[:, 0]) - NODE_TOLERANCE,
+            np.minimum(starts[:, 1], ends[:, 1]) - NODE_TOLERANCE,
+            np.maximum(starts[:, 0], ends[:, 0]) + NODE_TOLERANCE,
+            np.maximum(starts[:, 1], ends[:, 1]) + NODE_TOLERANCE
+        )
+        segment_idx, point_idx = tree.query(segment_boxes)
+        
+        a = starts[segment_idx].astype(np.float64)
+        d = ends[segment_idx] - a
+        ap = points[point_idx] - a
+        length2 = np.einsum("ij,ij->i", d, d)
+        t = np.einsum("ij,ij->i", ap, d) / length2
+        distance = np.abs(d[:, 0] * ap[:, 1] - d[:, 1] * ap[:, 0]) / np.sqrt(length2)
+        on_segment = (t > 0) & (t < 1) & (distance <= NODE_TOLERANCE)
+        
+        if not on_segment.any():
+            return list(rings)
+        
+        # Insert after each segment's start vertex, ordered along the segment
+        segments, params, inserted = segment_idx[on_segment], t[on_segment], point_idx[on_segment]
+        order = np.lexsort((params, segments))
+        noded = np.insert(starts, segments[order] + 1, points[inserted[order]], axis=0)
+        ring_of_segment = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+        lengths = np.bincount(ring_of_segment, minlength=len(rings)) + np.bincount(
+            ring_of_segment[segments], minlength=len(rings)
+        )
+        return np.split(noded, np.cumsum(lengths)[:-1])
+    
+    @staticmethod
+    def _find_junctions(rings: Sequence[np.ndarray]) -> set:
+        """Points where the set of neighbouring vertices differs between occurrences."""
+        neighbours: Dict[tuple, frozenset] = {}
+        junctions = set()
+        for ring in rings:
+            points = [tuple(p) for p in ring.tolist()]
+            n = len(points)
+            for i, point in enumerate(points):
+                around = frozenset((points[i - 1], points[(i + 1) % n]))
+                seen = neighbours.setdefault(point, around)
+                if seen != around:
+                    junctions.add(point)
+        return junctions
+    
+    @staticmethod
+    def _ring_arcs(ring: np.ndarray, junctions: set, arcs: List[np.ndarray], arc_index: Dict[tuple, int]) -> List[int]:
+        """Cut a ring at junctions into arcs, reusing existing arcs (reversed as ~index)."""
+        points = [tuple(p) for p in ring.tolist()]
+        cuts = [i for i, point in enumerate(points) if point in junctions]
+        
+        if not cuts:
+            # Closed arc with no junctions: canonical start at the smallest point
+            start = points.index(min(points))
+            forward = points[start:] + points[:start]
+            backward = [forward[0]] + forward[:0:-1]
+            for candidate, reference in ((forward, 1), (backward, -1)):
+                key = tuple(candidate + [candidate[0]])
+                if key in arc_index:
+                    index = arc_index[key]
+                    return [index if reference == 1 else ~index]
+            key = tuple(forward + [forward[0]])
+            arc_index[key] = len(arcs)
+            arcs.append(np.array(key, dtype=np.int64))
+            return [arc_index[key]]
+        
+        points = points[cuts[0]:] + points[:cuts[0]]
+        cuts = [i - cuts[0] for i in cuts] + [len(points)]
+        points.append(points[0])
+        references = []
+        for begin, end in zip(cuts[:-1], cuts[1:]):
+            key = tuple(points[begin:end + 1])
+            if key in arc_index:
+                references.append(arc_index[key])
+            elif key[::-1] in arc_index:
+                references.append(~arc_index[key[::-1]])
+            else:
+                arc_index[key] = len(arcs)
+                arcs.append(np.array(key, dtype=np.int64))
+                references.append(arc_index[key])
+        return references
+    
+    @classmethod
+    def _simplify_arcs(cls, arcs: Sequence[np.ndarray], fallback: Sequence[np.ndarray], tolerance: float,
+                       polygons: Sequence[List[List[int]]]) -> List[np.ndarray]:
+        """
+        Douglas-Peucker per arc; end points stay fixed so shared boundaries stay shared.
+        The arcs of every polygon that comes out invalid (crossing rings, rings under
+        four points) are put back to their fallback version until all polygons are valid.
+        """
+        if not arcs:
+            return []
+        lines = shapely.linestrings(np.vstack(arcs), indices=np.repeat(np.arange(len(arcs)), [len(arc) for arc in arcs]))
+        coords, index = shapely.get_coordinates(
+            shapely.simplify(lines, tolerance, preserve_topology=False), return_index=True
+        )
+        splits = np.cumsum(np.bincount(index, minlength=len(arcs)))[:-1]
+        result = np.split(np.rint(coords).astype(np.int64), splits)
+        if not polygons:
+            return result
+        
+        # Flat arc references with the ring of each reference and the polygon of each ring
+        ring_references = [ring for polygon in polygons for ring in polygon]
+        references = np.fromiter((reference for ring in ring_references for reference in ring), dtype=np.int64)
+        reference_ring = np.repeat(np.arange(len(ring_references)), [len(ring) for ring in ring_references])
+        ring_polygon = np.repeat(np.arange(len(polygons)), [len(polygon) for polygon in polygons])
+        arc_ids = np.where(references >= 0, references, ~references)
+        while True:
+            invalid = cls._invalid_polygons(result, references, reference_ring, ring_polygon, len(polygons))
+            reverted = [
+                i for i in np.unique(arc_ids[invalid[ring_polygon[reference_ring]]]).tolist()
+                if result[i] is not fallback[i]
+            ]
+            if not reverted:
+                return result
+            # Reverted arcs are rechecked with every other polygon that uses them on the next pass
+            for i in reverted:
+                result[i] = fallback[i]
+    
+    @staticmethod
+    def _invalid_polygons(arcs: Sequence[np.ndarray], references: np.ndarray, reference_ring: np.ndarray,
+                          ring_polygon: np.ndarray, polygon_count: int) -> np.ndarray:
+        """Mask of the polygons whose rings, decoded from arcs, are shorter than four points or invalid."""
+        lengths = np.array([len(arc) for arc in arcs])
+        arc_starts = np.cumsum(lengths) - lengths
+        arc_ids = np.where(references >= 0, references, ~references)
+        # Every arc after the first of a ring starts at the previous arc's last point
+        skip = np.r_[False, reference_ring[1:] == reference_ring[:-1]].astype(np.int64)
+        taken = lengths[arc_ids] - skip
+        offset = np.arange(taken.sum()) - np.repeat(np.cumsum(taken) - taken - skip, taken)
+        point_index = np.repeat(arc_starts[arc_ids], taken) + np.where(
+            np.repeat(references < 0, taken), np.repeat(lengths[arc_ids] - 1, taken) - offset, offset
+        )
+        point_ring = np.repeat(reference_ring, taken)
+        
+        invalid = np.zeros(polygon_count, dtype=bool)
+        invalid[ring_polygon[np.bincount(point_ring, minlength=len(ring_polygon)) < 4]] = True
+        checked = ~invalid[ring_polygon[point_ring]]
+        _, ring_ids = np.unique(point_ring[checked], return_inverse=True)
+        linear_rings = shapely.linearrings(np.vstack(arcs)[point_index[checked]], indices=ring_ids)
+        checked_polygons, polygon_ids = np.unique(ring_polygon[np.unique(point_ring[checked])], return_inverse=True)
+        invalid[checked_polygons] = ~shapely.is_valid(shapely.polygons(linear_rings, indices=polygon_ids))
+        return invalid
+    
+    @staticmethod
+    def _delta_encode(arcs: Sequence[np.ndarray]) -> List[list]:
+        """TopoJSON delta encoding of every arc: the first point, then differences."""
+        if not arcs:
+            return []
+        points = np.vstack(arcs)
+        starts = np.cumsum([0] + [len(arc) for arc in arcs])
+        deltas = points.copy()
+        deltas[1:] -= points[:-1]
+        deltas[starts[:-1]] = points[starts[:-1]]
+        flat = deltas.tolist()
+        return [flat[begin:end] for begin, end in zip(starts[:-1], starts[1:])]
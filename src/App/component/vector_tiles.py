@@ -0,0 +1,136 @@
+import json
+import math
+from pathlib import Path
+from typing import Iterator, Tuple
+import logging
+import shutil
+
+import geopandas as gpd
+import mapbox_vector_tile
+import numpy as np
+import shapely
+
+from src.App.utils import log_execution_time
+from src.App.config import Config
+from src.App.component.web_map import VECTOR_TILES_JS, render_leaflet_page
+
+# Half the width of the EPSG:3857 world square
+WEB_MERCATOR_ORIGIN = 20037508.342789244
+TILE_PIXELS = 256
+MVT_EXTENT = 4096
+# Extra margin (in tile pixels) around each clipped tile so polygon edges do not show seams
+TILE_BUFFER_PIXELS = 4
+LAYER_NAME = "growth"
+
+
+def tile_size_meters(zoom: int) -> float:
+    return 2 * WEB_MERCATOR_ORIGIN / (2 ** zoom)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """EPSG:3857 bounds (minx, miny, maxx, maxy) of an XYZ tile."""
+    size = tile_size_meters(zoom)
+    minx = -WEB_MERCATOR_ORIGIN + x * size
+    maxy = WEB_MERCATOR_ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_range(bounds, zoom: int) -> Iterator[Tuple[int, int]]:
+    """Yield every (x, y) XYZ tile index covering EPSG:3857 bounds at a zoom level."""
+    size = tile_size_meters(zoom)
+    last = 2 ** zoom - 1
+    minx, miny, maxx, maxy = bounds
+    x0 = max(0, int(math.floor((minx + WEB_MERCATOR_ORIGIN) / size)))
+    x1 = min(last, int(math.floor((maxx + WEB_MERCATOR_ORIGIN) / size)))
+    y0 = max(0, int(math.floor((WEB_MERCATOR_ORIGIN - maxy) / size)))
+    y1 = min(last, int(math.floor((WEB_MERCATOR_ORIGIN - miny) / size)))
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+class VectorTileMapWriter:
+    """Writes a z/x/y Mapbox Vector Tile pyramid and a lightweight Leaflet page that loads it."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.min_zoom = config.map_min_zoom
+        self.max_zoom = config.map_max_zoom
+        self.logger.info("VectorTileMapWriter initialized successfully")
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def write_map(self, geo_data: gpd.GeoDataFrame, output_path: Path, bounds_wgs84=None, backdrop=None) -> Path:
+        """
+        Write the tile pyramid to '<map name>_tiles/' next to output_path and an HTML
+        page that only fetches the tiles in view.
+        """
+        tiles_dir = output_path.parent / f"{output_path.stem}_tiles"
+        if tiles_dir.exists():
+            shutil.rmtree(tiles_dir)
+        
+        mercator = geo_data.to_crs("EPSG:3857")
+        num_tiles = self.write_pyramid(mercator, tiles_dir)
+        self.logger.info(f"Wrote {num_tiles} vector tiles (z{self.min_zoom}-{self.max_zoom}) to {tiles_dir}")
+        
+        bounds = bounds_wgs84 if bounds_wgs84 is not None else geo_data.to_crs("EPSG:4326").total_bounds
+        layer_js = f"""
+L.growthTileLayer({json.dumps(tiles_dir.name + "/{z}/{x}/{y}.pbf")}, {{
+    minNativeZoom: {self.min_zoom},
+    maxNativeZoom: {self.max_zoom},
+    maxZoom: 22,
+    layer: {json.dumps(LAYER_NAME)},
+    style: stageStyle
+}}).on("mouseover", function (e) {{
+    L.popup({{closeButton: false}})
+        .setLatLng(e.latlng)
+        .setContent(e.layer.properties.growth_stage)
+        .openOn(map);
+}}).addTo(map);
+"""
+        html = render_leaflet_page(
+            self.config, output_path.stem, bounds, layer_js, js=VECTOR_TILES_JS, backdrop=backdrop
+        )
+        output_path.write_text(html, encoding="utf-8")
+        return output_path
+    
+    def write_pyramid(self, mercator: gpd.GeoDataFrame, tiles_dir: Path) -> int:
+        """Encode every zoom level of the pyramid; geometries must be in EPSG:3857."""
+        properties = mercator.drop(columns=mercator.geometry.name).astype(str).to_dict("records")
+        geometries = mercator.geometry.values
+        tree = shapely.STRtree(geometries)
+        total_bounds = mercator.total_bounds
+        num_tiles = 0
+        
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            # Simplify to half a screen pixel at this zoom, per polygon, topology preserved
+            pixel = tile_size_meters(zoom) / TILE_PIXELS
+            simplified = shapely.simplify(geometries, pixel / 2, preserve_topology=True)
+            buffer = pixel * TILE_BUFFER_PIXELS
+            
+            for x, y in tile_range(total_bounds, zoom):
+                minx, miny, maxx, maxy = tile_bounds(zoom, x, y)
+                candidates = tree.query(shapely.box(minx - buffer, miny - buffer, maxx + buffer, maxy + buffer))
+                if candidates.size == 0:
+                    continue
+                clipped = shapely.clip_by_rect(
+                    simplified[candidates], minx - buffer, miny - buffer, maxx + buffer, maxy + buffer
+                )
+                keep = ~shapely.is_empty(clipped)
+                if not np.any(keep):
+                    continue
+                
+                features = [
+                    {"geometry": geometry, "properties": properties[i]}
+                    for geometry, i in zip(clipped[keep], candidates[keep])
+                ]
+                tile = mapbox_vector_tile.encode(
+                    {"name": LAYER_NAME, "features": features},
+                    default_options={"quantize_bounds": (minx, miny, maxx, maxy), "extents": MVT_EXTENT}
+                )
+                tile_path = tiles_dir / str(zoom) / str(x) / f"{y}.pbf"
+                tile_path.parent.mkdir(parents=True, exist_ok=True)
+                tile_path.write_bytes(tile)
+                num_tiles += 1
+        
+        return num_tiles
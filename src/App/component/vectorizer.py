@@ -0,0 +1,165 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+from rasterio.features import shapes
+from rasterio.transform import Affine
+from shapely.affinity import affine_transform
+from shapely.geometry import mapping, shape
+from shapely.ops import unary_union
+
+from src.App.config import Config
+
+
+def _vectorize_tile(
+    tile: np.ndarray,
+    row_off: int,
+    col_off: int,
+    grid_shape: Tuple[int, int],
+    affine_params: List[float],
+    nodata: int,
+    nodes: Optional[np.ndarray] = None
+):
+    """
+    Vectorize one tile of the label grid in grid-cell coordinates.
+    Polygons that touch an inner tile seam are returned unmerged (still in cell
+    coordinates) so they can be stitched with their neighbours; all others are
+    returned as final GeoJSON geometries in map coordinates. When the tile's
+    grid-node coordinates are given, vertices are looked up there instead of
+    going through the affine transform.
+    """
+    grid_h, grid_w = grid_shape
+    tile_h, tile_w = tile.shape
+    seams = (
+        col_off if col_off > 0 else None,
+        row_off if row_off > 0 else None,
+        col_off + tile_w if col_off + tile_w < grid_w else None,
+        row_off + tile_h if row_off + tile_h < grid_h else None
+    )
+    
+    a, b, d, e, xoff, yoff = affine_params
+    linear = np.array([[a, d], [b, e]])
+    offset = np.array([xoff, yoff])
+    
+    finished = []
+    seam_polygons = []
+    cell_transform = Affine.translation(col_off, row_off)
+    for geom, value in shapes(tile, mask=(tile != nodata), transform=cell_transform):
+        if value == nodata:
+            continue
+        rings = [np.asarray(ring) for ring in geom["coordinates"]]
+        minx, miny = rings[0].min(axis=0)
+        maxx, maxy = rings[0].max(axis=0)
+        if minx == seams[0] or miny == seams[1] or maxx == seams[2] or maxy == seams[3]:
+            seam_polygons.append((int(value), shape(geom)))
+        elif nodes is not None:
+            coordinates = [
+                nodes[ring[:, 1].astype(np.int64) - row_off, ring[:, 0].astype(np.int64) - col_off].tolist()
+                for ring in rings
+            ]
+            finished.append(({"type": "Polygon", "coordinates": coordinates}, int(value)))
+        else:
+            coordinates = [(ring @ linear + offset).tolist() for ring in rings]
+            finished.append(({"type": "Polygon", "coordinates": coordinates}, int(value)))
+    return finished, seam_polygons
+
+
+class GridVectorizer:
+    """Vectorizes patch-grid label arrays tile by tile in parallel worker processes."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.tile_size = config.vectorization_tile_size
+        self.workers = config.vectorization_workers or os.cpu_count() or 1
+        self.logger.info("GridVectorizer initialized successfully")
+    
+    def vectorize(
+        self,
+        label_grid: np.ndarray,
+        transform,
+        nodata: int = -1,
+        crs=None
+    ) -> Iterator[Tuple[dict, int]]:
+        """
+        Yield (GeoJSON geometry, value) pairs for every connected region of the grid.
+        Regions inside a tile are yielded as soon as their tile finishes; regions
+        crossing tile seams are unioned per value once all tiles are done.
+        If the source crs is given, geometries are emitted in EPSG:4326.
+        """
+        grid_h, grid_w = label_grid.shape
+        affine_params = [transform.a, transform.b, transform.d, transform.e, transform.c, transform.f]
+        nodes = self._grid_nodes_wgs84(transform, crs, grid_h, grid_w) if crs is not None else None
+        tiles = [
+            (r, c)
+            for r in range(0, grid_h, self.tile_size)
+            for c in range(0, grid_w, self.tile_size)
+        ]
+        
+        def tile_args(origin):
+            r, c = origin
+            return (
+                label_grid[r:r + self.tile_size, c:c + self.tile_size],
+                r, c, (grid_h, grid_w), affine_params, nodata,
+                nodes[r:r + self.tile_size + 1, c:c + self.tile_size + 1] if nodes is not None else None
+            )
+    
+        if len(tiles) == 1 or self.workers == 1:
+            self.logger.info(f"Vectorizing {len(tiles)} tile(s) serially")
+            results = (_vectorize_tile(*tile_args(origin)) for origin in tiles)
+            yield from self._stream(results, affine_params, nodes)
+            return
+        
+        self.logger.info(f"Vectorizing {len(tiles)} tiles with {self.workers} workers")
+        yield from self._stream(self._run_parallel(tiles, tile_args), affine_params, nodes)
+    
+    def _grid_nodes_wgs84(self, transform, crs, grid_h: int, grid_w: int) -> np.ndarray:
+        """Project every grid node to lon/lat once; returns a (grid_h + 1, grid_w + 1, 2) array."""
+        cols, rows = np.meshgrid(np.arange(grid_w + 1), np.arange(grid_h + 1))
+        xs, ys = transform * (cols, rows)
+        transformer = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+        lon, lat = transformer.transform(xs, ys)
+        self.logger.info(f"Projected {lon.size} grid nodes to EPSG:4326")
+        return np.stack([lon, lat], axis=-1)
+    
+    def _run_parallel(self, tiles, tile_args):
+        """Run tiles through a process pool, keeping at most 2 x workers tiles in flight."""
+        max_in_flight = self.workers * 2
+        pending = set()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for origin in tiles:
+                pending.add(executor.submit(_vectorize_tile, *tile_args(origin)))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in pending:
+                yield future.result()
+    
+    def _stream(self, results, affine_params, nodes=None) -> Iterator[Tuple[dict, int]]:
+        seam_polygons: Dict[int, list] = {}
+        for finished, seam in results:
+            yield from finished
+            for value, polygon in seam:
+                seam_polygons.setdefault(value, []).append(polygon)
+        
+        num_seam = sum(len(polygons) for polygons in seam_polygons.values())
+        if num_seam:
+            self.logger.info(f"Stitching {num_seam} polygons along tile seams")
+        for value, polygons in seam_polygons.items():
+            merged = unary_union(polygons)
+            parts = merged.geoms if hasattr(merged, "geoms") else [merged]
+            for part in parts:
+                if nodes is not None:
+                    yield mapping(shapely.transform(part, lambda xy: self._lookup_nodes(nodes, xy))), value
+                else:
+                    yield mapping(affine_transform(part, affine_params)), value
+    
+    @staticmethod
+    def _lookup_nodes(nodes: np.ndarray, xy: np.ndarray) -> np.ndarray:
+        """Map (col, row) grid-node coordinates to their projected coordinates."""
+        return nodes[np.rint(xy[:, 1]).astype(np.int64), np.rint(xy[:, 0]).astype(np.int64)]
@@ -0,0 +1,225 @@
+import base64
+import json
+import re
+from pathlib import Path
+from string import Template
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.App.config import Config
+from src.App.component.backdrop import Backdrop
+
+# Web assets shipped under Config.web_assets_dir: path -> CDN URL for map.assets 'cdn'
+# (None for the scripts written for these maps, which always load from the vendored copy)
+WEB_ASSETS = {
+    "leaflet.css": "https://unpkg.com/leaflet@1.9.4/dist/leaflet.css",
+    "leaflet.js": "https://unpkg.com/leaflet@1.9.4/dist/leaflet.js",
+    "images/layers.png": "https://unpkg.com/leaflet@1.9.4/dist/images/layers.png",
+    "images/layers-2x.png": "https://unpkg.com/leaflet@1.9.4/dist/images/layers-2x.png",
+    "images/marker-icon.png": "https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon.png",
+    "images/marker-icon-2x.png": "https://unpkg.com/leaflet@1.9.4/dist/images/marker-icon-2x.png",
+    "images/marker-shadow.png": "https://unpkg.com/leaflet@1.9.4/dist/images/marker-shadow.png",
+    # MVT decoding and canvas tile layer (L.growthTileLayer)
+    "vector-tiles.js": None,
+    # topojson.feature() for Polygon/MultiPolygon collections
+    "topojson-feature.js": None
+}
+LEAFLET_CSS = ["leaflet.css"]
+LEAFLET_JS = ["leaflet.js"]
+VECTOR_TILES_JS = ["vector-tiles.js"]
+TOPOJSON_JS = ["topojson-feature.js"]
+LEAFLET_IMAGES = [name for name in WEB_ASSETS if name.startswith("images/")]
+# Assets beyond Leaflet that a map.mode's pages load
+MODE_ASSETS = {"vector_tiles": VECTOR_TILES_JS, "topojson": TOPOJSON_JS}
+
+OSM_TILE_URL = "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# fetch() cannot read file:// URLs in Chromium (QWebEngineView), so local
+# tile requests fall back to XMLHttpRequest.
+FILE_FETCH_SHIM = """
+(function () {
+    var nativeFetch = window.fetch;
+    window.fetch = function (url, options) {
+        if (location.protocol !== "file:" || /^https?:/i.test(url)) {
+            return nativeFetch(url, options);
+        }
+        return new Promise(function (resolve) {
+            var xhr = new XMLHttpRequest();
+            xhr.open("GET", url);
+            xhr.responseType = "blob";
+            xhr.onload = function () {
+                resolve({
+                    ok: xhr.status === 0 || xhr.status === 200,
+                    blob: function () { return Promise.resolve(xhr.response); },
+                    arrayBuffer: function () { return xhr.response.arrayBuffer(); }
+                });
+            };
+            xhr.onerror = function () { resolve({ok: false}); };
+            xhr.send();
+        });
+    };
+})();
+"""
+
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+<title>$title</title>
+$styles
+$scripts
+<style>html, body, #map { height: 100%; width: 100%; margin: 0; padding: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+$shim
+var colors = $colors;
+var map = L.map("map", {maxZoom: 22});
+map.fitBounds($bounds);
+L.tileLayer($basemap_url, {
+    maxZoom: 22,
+    maxNativeZoom: $basemap_max_zoom,
+    attribution: "&copy; OpenStreetMap contributors"
+}).addTo(map);
+$backdrop
+function stageStyle(properties) {
+    return {
+        fill: true,
+        fillColor: colors[properties.growth_stage] || colors["null"],
+        fillOpacity: 0.7,
+        color: "black",
+        weight: 0.2
+    };
+}
+$layers
+</script>
+</body>
+</html>
+""")
+
+
+def basemap_url(config: Config, map_name: str) -> str:
+    """Basemap tile URL template; local basemaps are exported to '<map name>_basemap/'."""
+    if config.basemap_source == "local":
+        return f"{map_name}_basemap/{{z}}/{{x}}/{{y}}.png"
+    return OSM_TILE_URL
+
+
+def vendored_asset(config: Config, name: str) -> Path:
+    """Path of a vendored asset; a missing one is an error rather than a silent CDN dependency."""
+    path = config.web_assets_dir / name
+    if not path.is_file():
+        raise FileNotFoundError(
+            f"Web asset {name} is missing from {config.web_assets_dir}; restore it from the repository "
+            f"(resource/web), or set map.assets to 'cdn'"
+        )
+    return path
+
+
+def missing_web_assets(config: Config) -> List[str]:
+    """Vendored assets the configured map.mode needs that are not in Config.web_assets_dir."""
+    needed = [*LEAFLET_CSS, *LEAFLET_JS, *LEAFLET_IMAGES, *MODE_ASSETS.get(config.map_mode, [])]
+    if config.map_assets == "cdn":
+        needed = [name for name in needed if WEB_ASSETS[name] is None]
+    return [name for name in needed if not (config.web_assets_dir / name).is_file()]
+
+
+def asset_url(config: Config, name: str) -> str:
+    """file:// URL of a vendored asset, or its CDN URL when map.assets is 'cdn' and it has one."""
+    if config.map_assets == "cdn" and WEB_ASSETS[name] is not None:
+        return WEB_ASSETS[name]
+    path = vendored_asset(config, name)
+    # Pages served over HTTP may not load file:// URLs; the map server serves the assets
+    return f"/assets/{name}" if config.map_mode == "server" else path.resolve().as_uri()
+
+
+def _inline_css_images(config: Config, css: str) -> str:
+    """Embed the images a stylesheet references (e.g. Leaflet's layer control icon) as data URIs."""
+    def data_uri(match: re.Match) -> str:
+        image = base64.b64encode(vendored_asset(config, match.group(1)).read_bytes()).decode("ascii")
+        return f"url(data:image/png;base64,{image})"
+    return re.sub(r"url\((images/[\w-]+\.png)\)", data_uri, css)
+
+
+def _asset_tag(config: Config, name: str, link: str, embed: str) -> str:
+    if config.map_assets == "inline":
+        text = vendored_asset(config, name).read_text(encoding="utf-8")
+        if name.endswith(".css"):
+            text = _inline_css_images(config, text)
+        # A literal "</script" would end the surrounding <script> element
+        return embed.format(text.replace("</script", "<\\/script"))
+    return link.format(asset_url(config, name))
+
+
+def asset_tags(config: Config, css: Sequence[str], js: Sequence[str]) -> Tuple[str, str]:
+    """
+    Return the <head> style and script tags for the named assets. With map.assets
+    'inline' the vendored files are embedded, so the page needs no other files.
+    """
+    styles = [_asset_tag(config, name, '<link rel="stylesheet" href="{}"/>', "<style>\n{}\n</style>") for name in css]
+    scripts = [_asset_tag(config, name, '<script src="{}"></script>', "<script>\n{}\n</script>") for name in js]
+    return "\n".join(styles), "\n".join(scripts)
+
+
+def leaflet_bounds(bounds: Sequence[float]) -> List[List[float]]:
+    """Convert (west, south, east, north) to Leaflet's [[south, west], [north, east]]."""
+    west, south, east, north = bounds
+    return [[south, west], [north, east]]
+
+
+def backdrop_js(backdrop: Optional[Backdrop]) -> str:
+    """Orthophoto image overlay under the growth layers, switchable from a layer control."""
+    if backdrop is None:
+        return ""
+    return f"""var backdrop = L.imageOverlay({json.dumps(backdrop.image)}, {json.dumps(leaflet_bounds(backdrop.bounds_wgs84))}).addTo(map);
+L.control.layers(null, {{"Orthophoto": backdrop}}).addTo(map);"""
+
+
+def leaflet_page_parts(
+    config: Config,
+    map_name: str,
+    bounds: Sequence[float],
+    css: Sequence[str] = (),
+    js: Sequence[str] = (),
+    backdrop: Optional[Backdrop] = None
+) -> Tuple[str, str]:
+    """
+    Split the Leaflet page around its layer slot so writers can stream layer
+    JavaScript between the two halves instead of building the page in memory.
+    """
+    colors: Dict[str, str] = {
+        ("null" if stage is None else stage): color
+        for stage, color in config.default_colors.items()
+    }
+    styles, scripts = asset_tags(config, [*LEAFLET_CSS, *css], [*LEAFLET_JS, *js])
+    page = PAGE_TEMPLATE.safe_substitute(
+        title=map_name,
+        styles=styles,
+        scripts=scripts,
+        shim=FILE_FETCH_SHIM,
+        colors=json.dumps(colors),
+        bounds=json.dumps(leaflet_bounds(bounds)),
+        basemap_url=json.dumps(basemap_url(config, map_name)),
+        basemap_max_zoom=config.basemap_max_zoom if config.basemap_source == "local" else 19,
+        backdrop=backdrop_js(backdrop)
+    )
+    head, tail = page.split("$layers")
+    return head, tail
+
+
+def render_leaflet_page(
+    config: Config,
+    map_name: str,
+    bounds: Sequence[float],
+    layers_js: str,
+    css: Sequence[str] = (),
+    js: Sequence[str] = (),
+    backdrop: Optional[Backdrop] = None
+) -> str:
+    """
+    Render a standalone Leaflet page with the configured basemap, an optional
+    orthophoto backdrop, the growth-stage color table and the given layer JavaScript.
+    """
+    head, tail = leaflet_page_parts(config, map_name, bounds, css, js, backdrop)
+    return head + layers_js + tail
@@ -1,7 +1,7 @@
 import sys
 import os
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 from src.App.utils import load_config, setup_logging
@@ -45,6 +45,10 @@ class Config:
     def patch_size(self) -> int:
         return self.config.get("processing", {}).get("patch_size", 64)
     
+    @property
+    def window_patches(self) -> int:
+        return int(self.config.get("processing", {}).get("window_patches", 32))
+    
     @property
     def min_pixel_sum_threshold(self) -> int:
         return self.config.get("processing", {}).get("min_pixel_sum_threshold", 5000)
@@ -57,6 +61,217 @@ class Config:
     def model_path(self) -> Path:
         return self.app / "model" / "XGB_model_v13.joblib"
     
+    @property
+    def cascade_enabled(self) -> bool:
+        return bool(self.config.get("cascade", {}).get("enabled", False))
+    
+    @property
+    def fast_model_path(self) -> Path:
+        return self.app / self.config.get("cascade", {}).get("fast_model", "model/XGB_model_fast.joblib")
+    
+    @property
+    def cascade_confidence_threshold(self) -> float:
+        return float(self.config.get("cascade", {}).get("confidence_threshold", 0.8))
+    
+    @property
+    def write_probability_raster(self) -> bool:
+        return bool(self.config.get("outputs", {}).get("probability_raster", False))
+    
+    @property
+    def write_cell_table(self) -> bool:
+        return bool(self.config.get("outputs", {}).get("cell_table", False))
+    
+    @property
+    def smoothing_enabled(self) -> bool:
+        return bool(self.config.get("smoothing", {}).get("enabled", False))
+    
+    @property
+    def smoothing_kernel_size(self) -> int:
+        return int(self.config.get("smoothing", {}).get("kernel_size", 3))
+    
+    @property
+    def smoothing_min_region_size(self) -> int:
+        return int(self.config.get("smoothing", {}).get("min_region_size", 4))
+    
+    @property
+    def vectorization_tile_size(self) -> int:
+        return int(self.config.get("vectorization", {}).get("tile_size", 1024))
+    
+    @property
+    def vectorization_workers(self) -> int:
+        # 0 means one worker per CPU core
+        return int(self.config.get("vectorization", {}).get("workers", 0))
+    
+    @property
+    def emit_wgs84(self) -> bool:
+        return bool(self.config.get("vectorization", {}).get("emit_wgs84", False))
+    
+    @property
+    def ingest_mode(self) -> str:
+        return self.config.get("ingest", {}).get("mode", "auto")
+    
+    @property
+    def ingest_copy_workers(self) -> int:
+        return int(self.config.get("ingest", {}).get("copy_workers", 4))
+    
+    @property
+    def odm_profile(self) -> str:
+        return self.config.get("odm", {}).get("profile", "auto")
+    
+    @property
+    def odm_orthophoto_resolution(self) -> float:
+        return float(self.config.get("odm", {}).get("orthophoto_resolution", 0.02))
+    
+    @property
+    def odm_memory_fraction(self) -> float:
+        return float(self.config.get("odm", {}).get("memory_fraction", 0.8))
+    
+    @property
+    def odm_memory_limit_gb(self) -> float:
+        return float(self.config.get("odm", {}).get("memory_limit_gb", 0))
+    
+    @property
+    def odm_split_overlap(self) -> int:
+        return int(self.config.get("odm", {}).get("split_overlap", 50))
+    
+    @property
+    def odm_backend(self) -> str:
+        return self.config.get("odm", {}).get("backend", "local")
+    
+    @property
+    def odm_nodes(self) -> List[str]:
+        return list(self.config.get("odm", {}).get("nodes") or [])
+    
+    @property
+    def odm_parallel_uploads(self) -> int:
+        return int(self.config.get("odm", {}).get("parallel_uploads", 4))
+    
+    @property
+    def odm_poll_interval(self) -> float:
+        return float(self.config.get("odm", {}).get("poll_interval", 5))
+    
+    @property
+    def odm_virtual_mosaic(self) -> bool:
+        return bool(self.config.get("odm", {}).get("virtual_mosaic", True))
+    
+    @property
+    def odm_workspace_dir(self) -> Path:
+        workspace_dir = self.config.get("odm", {}).get("workspace_dir")
+        # Next to temp/images by default, so the images can be hardlinked into the workspaces
+        return self.root_dir / workspace_dir if workspace_dir else self.root_dir / "odm_workspaces"
+    
+    @property
+    def odm_max_workspaces(self) -> int:
+        return int(self.config.get("odm", {}).get("max_workspaces", 3))
+    
+    @property
+    def thinning_enabled(self) -> bool:
+        return bool(self.config.get("thinning", {}).get("enabled", False))
+    
+    @property
+    def thinning_target_overlap(self) -> float:
+        return float(self.config.get("thinning", {}).get("target_overlap", 0.75))
+    
+    @property
+    def flight_height(self) -> float:
+        return float(self.config.get("flight", {}).get("height", 60))
+    
+    @property
+    def camera_fov(self) -> Tuple[float, float]:
+        across, along = self.config.get("flight", {}).get("fov", [47.2, 34.4])
+        return float(across), float(along)
+    
+    @property
+    def quick_look_enabled(self) -> bool:
+        return bool(self.config.get("quick_look", {}).get("enabled", False))
+    
+    @property
+    def quick_look_workers(self) -> int:
+        workers = int(self.config.get("quick_look", {}).get("workers", 0))
+        return workers if workers > 0 else (os.cpu_count() or 1)
+    
+    @property
+    def map_mode(self) -> str:
+        return self.config.get("map", {}).get("mode", "leaflet")
+    
+    @property
+    def map_min_zoom(self) -> int:
+        return int(self.config.get("map", {}).get("min_zoom", 12))
+    
+    @property
+    def map_max_zoom(self) -> int:
+        return int(self.config.get("map", {}).get("max_zoom", 19))
+    
+    @property
+    def topojson_quantization(self) -> int:
+        return int(self.config.get("map", {}).get("topojson", {}).get("quantization", 100000))
+    
+    @property
+    def topojson_zoom_brackets(self) -> List[Tuple[int, float]]:
+        brackets = self.config.get("map", {}).get("topojson", {}).get("zoom_brackets", [[14, 1.0], [16, 1.0], [18, 0.5]])
+        return [(int(zoom), float(tolerance)) for zoom, tolerance in brackets]
+    
+    @property
+    def map_assets(self) -> str:
+        return self.config.get("map", {}).get("assets", "local")
+    
+    @property
+    def map_server_port(self) -> int:
+        return int(self.config.get("map_server", {}).get("port", 0))
+    
+    @property
+    def map_server_cache_size(self) -> int:
+        return int(self.config.get("map_server", {}).get("cache_size", 256))
+    
+    @property
+    def backdrop_enabled(self) -> bool:
+        return bool(self.config.get("backdrop", {}).get("enabled", True))
+    
+    @property
+    def backdrop_max_size(self) -> int:
+        return int(self.config.get("backdrop", {}).get("max_size", 2048))
+    
+    @property
+    def basemap_source(self) -> str:
+        return self.config.get("basemap", {}).get("source", "online")
+    
+    @property
+    def basemap_mbtiles_path(self) -> Optional[Path]:
+        mbtiles = self.config.get("basemap", {}).get("mbtiles")
+        return self.app / mbtiles if mbtiles else None
+    
+    @property
+    def basemap_max_zoom(self) -> int:
+        return int(self.config.get("basemap", {}).get("max_zoom", 18))
+    
+    @property
+    def basemap_tile_url(self) -> str:
+        return self.config.get("basemap", {}).get("tile_url", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+    
+    @property
+    def basemap_cache_enabled(self) -> bool:
+        return bool(self.config.get("basemap", {}).get("cache", {}).get("enabled", True))
+    
+    @property
+    def basemap_fetch_missing(self) -> bool:
+        return bool(self.config.get("basemap", {}).get("cache", {}).get("fetch_missing", False))
+    
+    @property
+    def basemap_fetch_max_zoom(self) -> int:
+        return int(self.config.get("basemap", {}).get("cache", {}).get("fetch_max_zoom", 16))
+    
+    @property
+    def basemap_fetch_max_tiles(self) -> int:
+        return int(self.config.get("basemap", {}).get("cache", {}).get("fetch_max_tiles", 250))
+    
+    @property
+    def basemap_fetch_timeout(self) -> float:
+        return float(self.config.get("basemap", {}).get("cache", {}).get("fetch_timeout", 3))
+    
+    @property
+    def basemap_cache_max_bytes(self) -> int:
+        return int(self.config.get("basemap", {}).get("cache", {}).get("max_size_mb", 512) * 1024 * 1024)
+
     @property
     def temp_dir(self) -> Path:
         # Points to root/temp
@@ -79,6 +294,22 @@ class Config:
     def resource_dir(self) -> Path:
         return self.app / "resource"
     
+    @property
+    def web_assets_dir(self) -> Path:
+        return self.resource_dir / "web"
+    
+    @property
+    def basemap_cache_path(self) -> Path:
+        return self.resource_dir / "basemap_cache.mbtiles"
+    
+    @property
+    def ingest_manifest_path(self) -> Path:
+        return self.resource_dir / "ingest_manifest.sqlite"
+    
+    @property
+    def odm_history_path(self) -> Path:
+        return self.resource_dir / "odm_history.sqlite"
+    
     @property
     def otho_photo_backup_dir(self) -> Path:
         return self.app / "img_backup"
@@ -92,9 +323,20 @@ class Config:
             self.logger.error(error_msg)
             raise FileNotFoundError(error_msg)
         
+        if self.cascade_enabled and not self.fast_model_path.exists():
+            error_msg = f"Cascade fast model not found at {self.fast_model_path}"
+            self.logger.error(error_msg)
+            raise FileNotFoundError(error_msg)
+        
+        if self.basemap_mbtiles_path is not None and not self.basemap_mbtiles_path.exists():
+            error_msg = f"Basemap MBTiles not found at {self.basemap_mbtiles_path}"
+            self.logger.error(error_msg)
+            raise FileNotFoundError(error_msg)
+        
         # Create necessary directories
         self.temp_map_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.resource_dir.mkdir(parents=True, exist_ok=True)
+        self.odm_workspace_dir.mkdir(parents=True, exist_ok=True)
         
         self.logger.info("All paths validated successfully")
\ No newline at end of file
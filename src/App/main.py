@@ -1,7 +1,8 @@
 import os
 import sys
 import shutil
-import subprocess
+import threading
+import time
 from pathlib import Path
 from queue import Queue
 import logging
@@ -9,6 +10,16 @@ from datetime import datetime
 from src.App.config import Config
 from src.App.component.tiff_processor import TiffProcessor
 from src.App.component.map_generator import MapGenerator
+from src.App.component.map_server import MapServer
+from src.App.component.ingest import ImageIngest
+from src.App.component.ingest_manifest import IngestManifest
+from src.App.component.frame_thinning import FrameThinner
+from src.App.component.odm_planner import OdmProfilePlanner
+from src.App.component.odm_backend import create_odm_backend
+from src.App.component.odm_workspace import OdmWorkspaces
+from src.App.component.odm_progress import OdmProgressTracker, OdmRunHistory
+from src.App.component.quick_look import QuickLookMapper
+from src.App.component.web_map import missing_web_assets
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
                              QPushButton, QLabel, QFileDialog, QProgressBar, QListWidget, QListWidgetItem, QDialog, QComboBox, QMessageBox, QTextEdit, QSplitter, QStackedWidget, QGraphicsDropShadowEffect, QFrame)
 from PyQt5.QtWebEngineWidgets import QWebEngineView
@@ -40,78 +51,222 @@ class LogEmitter(QtCore.QObject):
 
 class CopyThread(QThread):
     progress = pyqtSignal(int)
+    status = pyqtSignal(str)
     finished = pyqtSignal()
     error = pyqtSignal(str)
     log = pyqtSignal(str)
-    def __init__(self, directories, temp_dir):
+    # Image count of a large selection; the GUI answers with confirm_large()
+    large_selection = pyqtSignal(int)
+    cancelled = pyqtSignal()
+    # Seconds between progress/throughput updates
+    PROGRESS_INTERVAL = 0.25
+    # Selections above this many images need the user's confirmation
+    LARGE_SELECTION = 500
+    def __init__(self, directories, temp_dir, ingest, manifest, thinner=None):
         super().__init__()
         self.directories = directories
         self.temp_dir = temp_dir
-        self.counter = 1
+        self.ingest = ingest
+        self.manifest = manifest
+        self.thinner = thinner
+        self._lock = threading.Lock()
+        self._confirmed = threading.Event()
+        self._proceed = False
+        self._last_emit = 0.0
+    def confirm_large(self, proceed):
+        """Answer to large_selection, from the GUI thread."""
+        self._proceed = proceed
+        self._confirmed.set()
     def run(self):
         try:
-            self._clear_temp_directory()
-            copied = 0
-            total_files = sum(1 for dir in self.directories for root, _, files in os.walk(dir) for file in files if file.lower().endswith(('.tif', '.tiff')))
-            for directory in self.directories:
-                for root, _, files in os.walk(directory):
-                    for file in files:
-                        if file.lower().endswith(('.tif', '.tiff')): # Only copy .tif and .tiff files
-                            src_path = os.path.join(root, file)
-                            ext = os.path.splitext(file)[1]
-                            new_name = f"image_{self.counter:04d}{ext}"
-                            dest_path = os.path.join(self.temp_dir, new_name)
-                            shutil.copy2(src_path, dest_path)
-                            self.counter += 1
-                            copied += 1
-                            self.progress.emit(int(copied / total_files * 100))
-                            self.log.emit(f"Copied {file} to temp directory")
-                            QtCore.QCoreApplication.processEvents()
+            # Walking the selection, hashing and reading EXIF can take minutes on slow media
+            self.status.emit("Scanning selected directories...")
+            files = self.manifest.scan(self.directories, self._on_scanned)
+            if not files:
+                self.error.emit("No .TIF or .TIFF images found in selected directories.")
+                return
+            if len(files) > self.LARGE_SELECTION:
+                self.large_selection.emit(len(files))
+                self._confirmed.wait()
+                if not self._proceed:
+                    self.cancelled.emit()
+                    return
+            plan = self.manifest.plan(files, self.temp_dir, self._on_checked)
+            for path in plan.duplicates:
+                self.log.emit(f"Skipping {path}: same content as another selected image")
+            unchanged, to_place = plan.unchanged, plan.to_place
+            if self.thinner is not None:
+                # Redundant captures are dropped before they are placed, not after
+                thinning = self.thinner.thin(self.manifest.frames())
+                self.log.emit(thinning.report)
+                unchanged = [dest for dest in unchanged if dest in thinning.kept]
+                to_place = [(source, dest) for source, dest in to_place if dest in thinning.kept]
+            self._remove_stale(set(unchanged))
+            jobs = [(source.path, os.path.join(self.temp_dir, dest), source.size) for source, dest in to_place]
+            self.total_bytes = sum(size for _, _, size in jobs) or 1
+            self.done_bytes = 0
+            self._last_emit = 0.0
+            started = self._phase_start = time.monotonic()
+            self._phase_bytes = 0
+            self._phase = "Linking"
+            
+            to_copy = []
+            for src_path, dest_path, size in jobs:
+                if self.ingest.link(src_path, dest_path) is None:
+                    to_copy.append((src_path, dest_path))
+                else:
+                    self._on_bytes(size)
+            
+            if to_copy:
+                self.log.emit(f"Copying {len(to_copy)} images that could not be linked...")
+                self._phase = "Copying"
+                self._phase_start = time.monotonic()
+                self._phase_bytes = self.done_bytes
+                self.ingest.copy_files(to_copy, self._on_bytes)
+            
+            self.progress.emit(100)
+            self.log.emit(
+                f"Image ingest: {len(unchanged)} unchanged, {self.ingest.summary()} "
+                f"({sum(size for _, _, size in jobs) / 1e9:.2f} GB in {time.monotonic() - started:.1f} s)"
+            )
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
-    def _clear_temp_directory(self):
+    def _due(self):
+        now = time.monotonic()
+        if now - self._last_emit < self.PROGRESS_INTERVAL:
+            return False
+        self._last_emit = now
+        return True
+    def _on_scanned(self, found):
+        if self._due():
+            self.status.emit(f"Scanning selected directories: {found} images found")
+    def _on_checked(self, checked, total):
+        if self._due() or checked == total:
+            self.progress.emit(int(checked / total * 100))
+            self.status.emit(f"Checking images against the ingest manifest: {checked} of {total}")
+    def _on_bytes(self, size):
+        """Byte progress from the worker threads, emitted at most every PROGRESS_INTERVAL."""
+        with self._lock:
+            self.done_bytes += size
+            now = time.monotonic()
+            if now - self._last_emit < self.PROGRESS_INTERVAL:
+                return
+            self._last_emit = now
+            done = self.done_bytes
+        elapsed = now - self._phase_start
+        rate = (done - self._phase_bytes) / elapsed / 1e6 if elapsed > 0 else 0.0
+        self.progress.emit(int(done / self.total_bytes * 100))
+        self.status.emit(
+            f"{self._phase} images: {done / 1e9:.2f} of {self.total_bytes / 1e9:.2f} GB ({rate:.0f} MB/s)"
+        )
+    def _remove_stale(self, keep):
+        """Remove everything in the image directory except the unchanged images of this selection."""
         for filename in os.listdir(self.temp_dir):
+            if filename in keep:
+                continue
             file_path = os.path.join(self.temp_dir, filename)
             try:
-                if os.path.isfile(file_path):
+                # Links from an earlier ingest are removed without touching their targets
+                if os.path.isfile(file_path) or os.path.islink(file_path):
                     os.unlink(file_path)
             except Exception as e:
                 self.log.emit(f"Error deleting {file_path}: {e}")
 
 class ODMThread(QThread):
-    finished = pyqtSignal()
+    finished = pyqtSignal(Path)
     error = pyqtSignal(str)
     log = pyqtSignal(str)
-    def __init__(self, project_dir):
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    # ODM is actually processing (not reusing an earlier workspace's orthophoto)
+    processing = pyqtSignal()
+    # Seconds between progress/ETA updates within a stage
+    PROGRESS_INTERVAL = 5.0
+    def __init__(self, backend, workspaces, tracker, images_dir, profile=None):
         super().__init__()
-        self.project_dir = project_dir.replace('\\', '/')
+        # Local Docker or NodeODM, from odm.backend
+        self.backend = backend
+        # Persistent ODM projects keyed by the input images
+        self.workspaces = workspaces
+        # Stage timings, peak memory and ETA from the ODM output
+        self.tracker = tracker
+        self.images_dir = images_dir
+        # ODM options and predicted cost from the profile planner
+        self.profile = profile
+        self._last_update = 0.0
 
     def run(self):
         try:
-            command = [
-                'docker', 'run', '-ti', '--rm',
-                '-v', f"{self.project_dir}:/datasets/code",
-                'opendronemap/odm',
-                '--project-path', '/datasets',
-                '--radiometric-calibration', 'camera+sun',
-                '--orthophoto-resolution', '0.02',
-                '--pc-quality', 'high',
-                'code'
-            ]
-            self.log.emit("Starting ODM processing with custom command...")
-            self.log.emit("Command: " + ' '.join(command))
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, universal_newlines=True)
-            for line in iter(process.stdout.readline, ''):
-                self.log.emit(line.strip())
-            process.wait()
-            if process.returncode != 0:
-                self.error.emit(f"ODM processing failed with exit code {process.returncode}")
-            else:
-                self.finished.emit()
+            odm_run = self.workspaces.prepare(self.images_dir, self.profile.args)
+            self.log.emit(odm_run.summary())
+            if odm_run.reuse:
+                self.finished.emit(odm_run.orthophoto)
+                return
+            # Source directories of the symlinked images, mounted read-only at the same path
+            mounts = ImageIngest.mounts(str(odm_run.project_dir / "images"))
+            self.log.emit(f"Starting ODM processing on {self.backend.name}...")
+            self.processing.emit()
+            self.tracker.start(self.profile, odm_run, self.backend.name)
+            try:
+                orthophoto = self.backend.run(
+                    odm_run.project_dir, odm_run.args, mounts, self._on_line, self.tracker.sample_memory
+                )
+            except Exception:
+                self.tracker.finish(succeeded=False)
+                raise
+            self.log.emit(self.tracker.report(self.tracker.finish(succeeded=True)))
+            self.workspaces.complete(odm_run)
+            self.progress.emit(100)
+            self.finished.emit(orthophoto)
         except Exception as e:
             self.error.emit(str(e))
 
+    def _on_line(self, line):
+        self.log.emit(line)
+        update = self.tracker.feed(line)
+        now = time.monotonic()
+        if update is None and now - self._last_update >= self.PROGRESS_INTERVAL:
+            update = self.tracker.progress()
+        if update is not None:
+            self._last_update = now
+            self.progress.emit(update.percent)
+            self.status.emit(update.summary())
+
+class QuickLookThread(QThread):
+    finished = pyqtSignal(Path)
+    error = pyqtSignal(str)
+    log = pyqtSignal(str)
+    # Emitted last on every path, after finished or error
+    done = pyqtSignal()
+    def __init__(self, mapper, generator, manifest, images_dir, config):
+        super().__init__()
+        self.mapper = mapper
+        self.generator = generator
+        self.manifest = manifest
+        self.images_dir = images_dir
+        self.config = config
+    
+    def run(self):
+        try:
+            self.log.emit("Building quick-look map from the capture footprints...")
+            classified = self.mapper.build(self.manifest.frames(), self.images_dir)
+            if classified is None:
+                self.log.emit("Quick look skipped: no geotagged captures could be classified")
+                return
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            map_path = self.generator.generate_map(
+                classified,
+                self.config.output_dir,
+                map_name=f"sugarcane_quicklook_{timestamp}.html",
+                provisional=True
+            )
+            self.finished.emit(map_path)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.done.emit()
+
 class MapGenerationThread(QThread):
     finished = pyqtSignal(Path)
     error = pyqtSignal(str)
@@ -131,12 +286,13 @@ class MapGenerationThread(QThread):
             self.progress.emit(25)
             self.log_emitter.emit("Starting image processing", "info")
            
-            geojson_path = self.processor.process_field(
+            classified = self.processor.process_field(
                 self.image_path,
-                self.config.output_dir
+                self.config.output_dir,
+                in_memory=True
             )
            
-            if not geojson_path:
+            if classified is None:
                 error_msg = "No valid features found in the image."
                 self.log_emitter.emit(error_msg, "error")
                 self.error.emit(error_msg)
@@ -150,9 +306,10 @@ class MapGenerationThread(QThread):
             map_name = f"sugarcane_growth_map_{timestamp}.html"
            
             map_path = self.generator.generate_map(
-                geojson_path,
+                classified,
                 self.config.output_dir,
-                map_name=map_name
+                map_name=map_name,
+                orthophoto_path=Path(self.image_path)
             )
            
             self.progress.emit(100)
@@ -352,6 +509,22 @@ class MainWindow(QMainWindow):
         self.config = Config()
         self.processor = TiffProcessor(self.config)
         self.generator = MapGenerator(self.config)
+        self.manifest = IngestManifest(self.config)
+        self.odm_planner = OdmProfilePlanner(self.config)
+        self.odm_workspaces = OdmWorkspaces(self.config, self.manifest)
+        self.odm_tracker = OdmProgressTracker(self.config, OdmRunHistory(self.config))
+        self.quick_look = QuickLookMapper(self.config, self.processor)
+        self.quick_look_map = None
+        self.final_map_ready = False
+        # The quick look shares the processor and map generator with the final map generation
+        self.quick_look_running = False
+        self.map_generation_pending = False
+        
+        # Local feature server for map.mode "server" maps
+        self.map_server = None
+        if self.config.map_mode == "server":
+            self.map_server = MapServer(self.config)
+            self.map_server.start()
        
         self.project_dir = os.path.join(os.getcwd(), 'temp')
         self.temp_dir = os.path.join(self.project_dir, 'images')
@@ -369,6 +542,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Sugarcane Growth Stage Visualizer")
         self.resize(1200, 800)
         self.populate_existing_maps()
+        
+        missing_assets = missing_web_assets(self.config)
+        if missing_assets:
+            self.log_message(
+                f"Map web assets missing from {self.config.web_assets_dir}: {', '.join(missing_assets)}. "
+                f"Map generation fails until they are restored from the repository's resource/web",
+                "warning"
+            )
 
     def init_ui(self):
         central_widget = QWidget()
@@ -706,8 +887,9 @@ class MainWindow(QMainWindow):
         self.current_preview_map = map_path
         self.current_preview_item = item
        
-        # Load the map in the preview view
-        self.preview_web_view.setUrl(QUrl.fromLocalFile(str(map_path)))
+        # Load the map in the preview view, through the map server when it can serve it
+        server_url = self.map_server.url_for(map_path) if self.map_server else None
+        self.preview_web_view.setUrl(QUrl(server_url) if server_url else QUrl.fromLocalFile(str(map_path)))
        
         # Switch to preview view
         self.show_preview_view()
@@ -744,14 +926,8 @@ class MainWindow(QMainWindow):
                 row = self.maps_list.row(self.current_preview_item)
                 self.maps_list.takeItem(row)
                
-                # Also delete associated files (JSON, etc.)
-                base_name = map_path.stem
-                for file_type in ['.json', '.geojson']:
-                    associated_file = map_path.parent / f"{base_name}{file_type}"
-                    if associated_file.exists():
-                        associated_file.unlink()
-                        self.log_message(f"Deleted associated file: {associated_file.name}")
-               
+                self._delete_associated_files(map_path)
+                
                 # Switch back to main view
                 self.show_main_view()
                
@@ -766,6 +942,22 @@ class MainWindow(QMainWindow):
                 self.log_message(error_msg, "error")
                 QMessageBox.warning(self, "Deletion Error", error_msg)
 
+    def _delete_associated_files(self, map_path):
+        """Delete the files written next to a map (JSON, backdrop, feature store, tiles)."""
+        base_name = map_path.stem
+        for file_type in ['.json', '.geojson', '_backdrop.png', '_features.parquet']:
+            associated_file = map_path.parent / f"{base_name}{file_type}"
+            if associated_file.exists():
+                associated_file.unlink()
+                self.log_message(f"Deleted associated file: {associated_file.name}")
+        
+        # Tile pyramids and local basemap tiles written next to the map
+        for suffix in ("_tiles", "_basemap"):
+            tiles_dir = map_path.parent / f"{base_name}{suffix}"
+            if tiles_dir.is_dir():
+                shutil.rmtree(tiles_dir)
+                self.log_message(f"Deleted associated tiles: {tiles_dir.name}")
+    
     def start_new_project(self):
         """Start a new project - called from both welcome and main views"""
         # Disable both buttons
@@ -786,6 +978,11 @@ class MainWindow(QMainWindow):
             if isinstance(view.model(), QtWidgets.QFileSystemModel):
                 view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
        
+        # Totals from the ingest manifest; directories are only walked when ingesting
+        summary_label = QLabel("", dialog)
+        dialog.layout().addWidget(summary_label, dialog.layout().rowCount(), 0, 1, -1)
+        dialog.currentChanged.connect(lambda path: summary_label.setText(self.describe_directory(path)))
+       
         if dialog.exec_() == QDialog.Accepted:
             self.selected_dirs = dialog.selectedFiles()
             if self.selected_dirs:
@@ -797,56 +994,133 @@ class MainWindow(QMainWindow):
             self.create_btn_main.setEnabled(True)
         dialog.deleteLater()
 
+    def describe_directory(self, path):
+        if not os.path.isdir(path):
+            return ""
+        summary = self.manifest.directory_summary(path)
+        if summary is None:
+            return "Not scanned yet"
+        scanned = datetime.fromtimestamp(summary.scanned_at).strftime("%Y-%m-%d %H:%M")
+        note = " - changed since, rescanned on ingest" if summary.stale else ""
+        return f"{summary.file_count} TIFF images, {summary.total_bytes / 1e9:.2f} GB (scanned {scanned}{note})"
+    
     def start_copy_images(self):
-        total_files = sum(1 for directory in self.selected_dirs for root, _, files in os.walk(directory) for file in files if file.lower().endswith(('.tif', '.tiff')))
-        if total_files == 0:
-            self.log_message("No .TIF or .TIFF images found in selected directories.")
-            # Re-enable buttons
-            if hasattr(self.welcome_view, 'create_btn'):
-                self.welcome_view.create_btn.setEnabled(True)
-            self.create_btn_main.setEnabled(True)
-            return
-        if total_files > 500:
-            msg = f"Large dataset detected ({total_files} images). This may require significant memory and time.\nProceed?"
-            reply = QMessageBox.question(self, 'Warning', msg, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-            if reply == QMessageBox.No:
-                # Re-enable buttons
-                if hasattr(self.welcome_view, 'create_btn'):
-                    self.welcome_view.create_btn.setEnabled(True)
-                self.create_btn_main.setEnabled(True)
-                return
         self.progress.setVisible(True)
         self.progress.setRange(0, 100)
         self.progress.setValue(0)
-        self.status.setText("Copying images to temp directory...")
+        self.status.setText("Placing images in temp directory...")
         self.status.setVisible(True)
-        self.copy_worker = CopyThread(self.selected_dirs, self.temp_dir)
+        # The selection is scanned on the worker thread, not here
+        self.copy_worker = CopyThread(
+            self.selected_dirs, self.temp_dir, ImageIngest(self.config), self.manifest,
+            FrameThinner(self.config) if self.config.thinning_enabled else None
+        )
         self.copy_worker.progress.connect(self.progress.setValue)
+        self.copy_worker.status.connect(self.status.setText)
+        self.copy_worker.large_selection.connect(self.confirm_large_selection)
+        self.copy_worker.cancelled.connect(self.on_copy_cancelled)
         self.copy_worker.finished.connect(self.on_copy_finished)
         self.copy_worker.error.connect(self.on_error)
         self.copy_worker.log.connect(self.log_message)
         self.copy_worker.start()
+    
+    def confirm_large_selection(self, total_files):
+        msg = f"Large dataset detected ({total_files} images). This may require significant memory and time.\nProceed?"
+        reply = QMessageBox.question(self, 'Warning', msg, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        self.copy_worker.confirm_large(reply == QMessageBox.Yes)
+    
+    def on_copy_cancelled(self):
+        # Re-enable buttons
+        if hasattr(self.welcome_view, 'create_btn'):
+            self.welcome_view.create_btn.setEnabled(True)
+        self.create_btn_main.setEnabled(True)
+        self.progress.setVisible(False)
+        self.status.setText("Image processing cancelled")
 
     def on_copy_finished(self):
         self.log_message("Image copying completed. Starting ODM processing...")
         self.progress.setRange(0, 0) # Busy mode
+        self.final_map_ready = False
         self.start_odm_processing()
+    
+    def start_quick_look(self):
+        self.quick_look_worker = QuickLookThread(
+            self.quick_look, self.generator, self.manifest, self.temp_dir, self.config
+        )
+        self.quick_look_worker.finished.connect(self.on_quick_look_ready)
+        self.quick_look_worker.error.connect(lambda message: self.log_message(f"Quick look failed: {message}", "warning"))
+        self.quick_look_worker.log.connect(self.log_message)
+        self.quick_look_worker.done.connect(self.on_quick_look_done)
+        self.quick_look_running = True
+        self.quick_look_worker.start()
+    
+    def on_quick_look_done(self):
+        self.quick_look_running = False
+        if self.map_generation_pending:
+            self.map_generation_pending = False
+            self.start_map_generation()
+    
+    def on_quick_look_ready(self, map_path):
+        if self.final_map_ready:
+            # ODM finished first; the provisional map is no longer needed
+            self._remove_map(map_path)
+            return
+        self.quick_look_map = map_path
+        self.log_message(f"Provisional map saved to: {map_path}")
+        self.populate_existing_maps()
+        for i in range(self.maps_list.count()):
+            item = self.maps_list.item(i)
+            if Path(item.data(Qt.UserRole)) == map_path:
+                self.maps_list.setCurrentItem(item)
+                self.preview_existing_map(item)
+                break
+        self.status.setText("Provisional map ready; ODM is still running for the final map...")
+    
+    def _remove_map(self, map_path):
+        if map_path.exists():
+            map_path.unlink()
+        self._delete_associated_files(map_path)
 
     def start_odm_processing(self):
-        self.status.setText("Running ODM processing (this may take a while)...")
-        self.odm_worker = ODMThread(self.project_dir)
+        try:
+            profile = self.odm_planner.plan(self.temp_dir)
+            backend = create_odm_backend(self.config)
+        except Exception as e:
+            self.on_error(f"Cannot plan ODM processing: {e}")
+            return
+        self.log_message(profile.summary())
+        self.status.setText(
+            f"Running ODM processing (predicted ~{profile.predicted_runtime_s / 3600:.1f} h, "
+            f"{profile.predicted_memory_gb:.1f} GB)..."
+        )
+        self.progress.setRange(0, 100)
+        self.progress.setValue(0)
+        self.odm_worker = ODMThread(
+            backend, self.odm_workspaces, self.odm_tracker, self.temp_dir, profile
+        )
+        self.odm_worker.progress.connect(self.progress.setValue)
+        self.odm_worker.status.connect(self.status.setText)
         self.odm_worker.finished.connect(self.on_odm_finished)
         self.odm_worker.error.connect(self.on_error)
         self.odm_worker.log.connect(self.log_message)
+        if self.config.quick_look_enabled:
+            # Only while ODM runs: a reused workspace goes straight to map generation
+            self.odm_worker.processing.connect(self.start_quick_look)
         self.odm_worker.start()
 
-    def on_odm_finished(self):
+    def on_odm_finished(self, orthophoto_path):
         self.log_message("ODM processing completed. Starting map generation...")
+        self.ortho_path = orthophoto_path
         self.progress.setRange(0, 100)
         self.progress.setValue(0)
         if not self.ortho_path.exists():
             self.on_error("Orthophoto not found after ODM processing.")
             return
+        if self.quick_look_running:
+            # Never run both on the same processor, vectorizer pool and map output
+            self.log_message("Waiting for the quick-look map before generating the final map...")
+            self.map_generation_pending = True
+            return
         self.start_map_generation()
 
     def start_map_generation(self):
@@ -872,6 +1146,13 @@ class MainWindow(QMainWindow):
         self.progress.setVisible(False)
         self.status.setText(f"Map generated successfully: {map_path.name}")
         self.log_message(f"Map saved to: {map_path}")
+        
+        # The final map replaces the provisional quick look
+        self.final_map_ready = True
+        if self.quick_look_map is not None:
+            self._remove_map(self.quick_look_map)
+            self.log_message(f"Removed provisional map: {self.quick_look_map.name}")
+            self.quick_look_map = None
        
         # Add to existing maps and preview it
         self.populate_existing_maps()
@@ -899,6 +1180,11 @@ class MainWindow(QMainWindow):
         self.log_display.insertPlainText(new_text)
         self.log_display.moveCursor(QTextCursor.End)
 
+    def closeEvent(self, event):
+        if self.map_server:
+            self.map_server.stop()
+        super().closeEvent(event)
+
 def main():
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
@@ -1,19 +1,68 @@
 from pathlib import Path
 import joblib
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 import numpy as np
 import logging
 
 from src.App.utils import calculate_ndvi, calculate_ndwi, log_execution_time
 
+# Which model of the cascade produced the final label of a patch
+DECISION_STAGES = ("fast", "heavy")
+FAST_STAGE = 0
+HEAVY_STAGE = 1
+
+# Column names of the vector returned by GrowthStageModel.extract_features
+FEATURE_NAMES = [
+    "ndvi_mean", "ndvi_std",
+    "ndwi_mean", "ndwi_std",
+    "nir_p75",
+    "green_upper_quartile_fraction"
+]
+
+
+class CascadePrediction(NamedTuple):
+    """Per-patch result of a (possibly two-stage) batched prediction."""
+    labels: np.ndarray
+    confidence: np.ndarray
+    decided_by: np.ndarray
+    probabilities: np.ndarray
+    
+    def summary(self, threshold: float) -> str:
+        total = len(self.labels)
+        fast = int(np.count_nonzero(self.decided_by == FAST_STAGE))
+        heavy = total - fast
+        fast_share = (fast / total * 100) if total else 0.0
+        return (
+            f"Cascade threshold {threshold:.2f}: fast model decided {fast}/{total} patches "
+            f"({fast_share:.1f}%), heavy model decided {heavy}; "
+            f"mean confidence {float(np.mean(self.confidence)) if total else 0.0:.3f}"
+        )
+
+
 class GrowthStageModel:
     """Wrapper class for the growth stage prediction model."""
     
-    def __init__(self, model_path: Path):
+    def __init__(
+        self,
+        model_path: Path,
+        fast_model_path: Optional[Path] = None,
+        confidence_threshold: float = 0.8
+    ):
         self.logger = logging.getLogger(__name__)
         self.model = self._load_model(model_path)
+        self.fast_model = self._load_model(fast_model_path) if fast_model_path else None
+        self.confidence_threshold = confidence_threshold
+        self.num_classes = self._count_classes()
+        if self.fast_model is not None:
+            self.logger.info(
+                f"Model cascade enabled (confidence threshold {self.confidence_threshold})"
+            )
         self.logger.info("GrowthStageModel initialized successfully")
     
+    @property
+    def is_cascade(self) -> bool:
+        return self.fast_model is not None
+    
     def _load_model(self, model_path: Path):
         """Load the trained model."""
         try:
@@ -24,6 +73,20 @@ class GrowthStageModel:
             self.logger.error(f"Failed to load model from {model_path}: {e}")
             raise
     
+    def _count_classes(self) -> int:
+        """Number of label columns shared by every model of the cascade."""
+        models = [m for m in (self.model, self.fast_model) if m is not None]
+        labels = [int(np.max(m.classes_)) + 1 for m in models if hasattr(m, "classes_")]
+        return max(labels) if labels else 0
+    
+    def _predict_proba(self, model, features: np.ndarray) -> np.ndarray:
+        """Class probabilities with one column per label value (0..num_classes-1)."""
+        proba = model.predict_proba(features)
+        classes = getattr(model, "classes_", np.arange(proba.shape[1])).astype(int)
+        aligned = np.zeros((proba.shape[0], max(self.num_classes, proba.shape[1])), dtype=np.float32)
+        aligned[:, classes] = proba
+        return aligned
+    
     @log_execution_time(logging.getLogger(__name__))
     def predict_growth_stage(self, features: List[float]) -> int:
         """Predict growth stage from extracted features."""
@@ -35,6 +98,48 @@ class GrowthStageModel:
             self.logger.error(f"Prediction failed: {e}")
             raise
     
+    @log_execution_time(logging.getLogger(__name__))
+    def predict_growth_stages(self, features: np.ndarray) -> np.ndarray:
+        """Predict growth stages for a (patches x features) matrix in one call."""
+        try:
+            predictions = np.asarray(self.model.predict(features)).astype(np.int16)
+            self.logger.debug(f"Predicted {len(predictions)} growth stages")
+            return predictions
+        except Exception as e:
+            self.logger.error(f"Batch prediction failed: {e}")
+            raise
+    
+    @log_execution_time(logging.getLogger(__name__))
+    def predict_cascade(self, features: np.ndarray) -> CascadePrediction:
+        """
+        Score every patch with the fast model and send only the patches whose
+        top-class probability is below the confidence threshold to the heavy model.
+        Without a fast model every patch is decided by the heavy model.
+        """
+        try:
+            n = features.shape[0]
+            if self.fast_model is None:
+                proba = self._predict_proba(self.model, features)
+                decided_by = np.full(n, HEAVY_STAGE, dtype=np.uint8)
+            else:
+                proba = self._predict_proba(self.fast_model, features)
+                decided_by = np.full(n, FAST_STAGE, dtype=np.uint8)
+                unsure = proba.max(axis=1) < self.confidence_threshold
+                if np.any(unsure):
+                    proba[unsure] = self._predict_proba(self.model, features[unsure])
+                    decided_by[unsure] = HEAVY_STAGE
+                self.logger.debug(f"{int(np.count_nonzero(unsure))}/{n} patches escalated to heavy model")
+            
+            return CascadePrediction(
+                labels=proba.argmax(axis=1).astype(np.int16),
+                confidence=proba.max(axis=1),
+                decided_by=decided_by,
+                probabilities=proba
+            )
+        except Exception as e:
+            self.logger.error(f"Cascade prediction failed: {e}")
+            raise
+    
     @log_execution_time(logging.getLogger(__name__))
     def extract_features(self, patch_array: np.ndarray, band_mapping: dict) -> np.ndarray:
         """Extract features from a multispectral patch array."""
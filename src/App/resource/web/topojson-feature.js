@@ -0,0 +1,70 @@
+// TopoJSON decoding for the growth-stage maps: the part of topojson-client's
+// topojson.feature() that TopoJsonMapWriter pages use (quantized, delta-encoded
+// Polygon and MultiPolygon geometries in a GeometryCollection).
+(function (global) {
+    "use strict";
+
+    function decodeArcs(topology) {
+        var transform = topology.transform;
+        var scale = transform ? transform.scale : [1, 1];
+        var translate = transform ? transform.translate : [0, 0];
+        return topology.arcs.map(function (arc) {
+            var x = 0, y = 0;
+            return arc.map(function (point) {
+                if (transform) {
+                    x += point[0];
+                    y += point[1];
+                } else {
+                    x = point[0];
+                    y = point[1];
+                }
+                return [x * scale[0] + translate[0], y * scale[1] + translate[1]];
+            });
+        });
+    }
+
+    // Consecutive arcs share their joining point; a negative index is the reversed arc ~index
+    function ring(arcs, references) {
+        var points = [];
+        references.forEach(function (reference) {
+            var arc = reference < 0 ? arcs[~reference].slice().reverse() : arcs[reference];
+            if (points.length) {
+                points.pop();
+            }
+            points = points.concat(arc);
+        });
+        return points;
+    }
+
+    function polygon(arcs, rings) {
+        return rings.map(function (references) { return ring(arcs, references); });
+    }
+
+    function geometry(arcs, o) {
+        if (o.type === "Polygon") {
+            return {type: "Polygon", coordinates: polygon(arcs, o.arcs)};
+        }
+        if (o.type === "MultiPolygon") {
+            return {type: "MultiPolygon", coordinates: o.arcs.map(function (rings) { return polygon(arcs, rings); })};
+        }
+        return null;
+    }
+
+    function toFeature(arcs, o) {
+        var feature = {type: "Feature", properties: o.properties || {}, geometry: geometry(arcs, o)};
+        if (o.id !== undefined) {
+            feature.id = o.id;
+        }
+        return feature;
+    }
+
+    function feature(topology, o) {
+        var arcs = decodeArcs(topology);
+        if (o.type === "GeometryCollection") {
+            return {type: "FeatureCollection", features: o.geometries.map(function (g) { return toFeature(arcs, g); })};
+        }
+        return toFeature(arcs, o);
+    }
+
+    global.topojson = {feature: feature};
+})(this);
@@ -0,0 +1,294 @@
+// Mapbox Vector Tile layer for the growth-stage maps: decodes the polygon tiles
+// VectorTileMapWriter writes (MVT version 2 protobuf) and draws them on canvas tiles.
+// L.growthTileLayer(url, {layer, style, ...GridLayer options}) fires "mouseover"
+// with {latlng, layer: {properties}} when the pointer enters another feature.
+(function (global) {
+    "use strict";
+
+    var MOVE_TO = 1, LINE_TO = 2, CLOSE_PATH = 7, POLYGON = 3;
+    var textDecoder = new TextDecoder("utf-8");
+
+    function Reader(bytes) {
+        this.bytes = bytes;
+        this.pos = 0;
+    }
+
+    Reader.prototype.varint = function () {
+        var result = 0, shift = 0, b;
+        do {
+            b = this.bytes[this.pos++];
+            result += (b & 0x7f) * Math.pow(2, shift);
+            shift += 7;
+        } while (b & 0x80);
+        return result;
+    };
+
+    Reader.prototype.zigzag = function () {
+        var n = this.varint();
+        return n % 2 === 1 ? -(n + 1) / 2 : n / 2;
+    };
+
+    Reader.prototype.end = function () {
+        var length = this.varint();
+        return this.pos + length;
+    };
+
+    Reader.prototype.string = function () {
+        var end = this.end(), text = textDecoder.decode(this.bytes.subarray(this.pos, end));
+        this.pos = end;
+        return text;
+    };
+
+    Reader.prototype.packed = function () {
+        var end = this.end(), values = [];
+        while (this.pos < end) {
+            values.push(this.varint());
+        }
+        return values;
+    };
+
+    Reader.prototype.skip = function (wireType) {
+        if (wireType === 0) {
+            this.varint();
+        } else if (wireType === 1) {
+            this.pos += 8;
+        } else if (wireType === 2) {
+            this.pos = this.end();
+        } else if (wireType === 5) {
+            this.pos += 4;
+        } else {
+            throw new Error("Unsupported protobuf wire type " + wireType);
+        }
+    };
+
+    // Calls read(field, wireType) for every field up to end
+    Reader.prototype.fields = function (end, read) {
+        while (this.pos < end) {
+            var key = this.varint();
+            read(key >> 3, key & 7);
+        }
+    };
+
+    function readValue(reader) {
+        var end = reader.end(), value = null;
+        var view = new DataView(reader.bytes.buffer, reader.bytes.byteOffset);
+        reader.fields(end, function (field, wireType) {
+            if (field === 1) {
+                value = reader.string();
+            } else if (field === 2) {
+                value = view.getFloat32(reader.pos, true);
+                reader.pos += 4;
+            } else if (field === 3) {
+                value = view.getFloat64(reader.pos, true);
+                reader.pos += 8;
+            } else if (field === 4 || field === 5) {
+                value = reader.varint();
+            } else if (field === 6) {
+                value = reader.zigzag();
+            } else if (field === 7) {
+                value = reader.varint() === 1;
+            } else {
+                reader.skip(wireType);
+            }
+        });
+        return value;
+    }
+
+    function readFeature(reader) {
+        var end = reader.end(), feature = {tags: [], type: 0, geometry: []};
+        reader.fields(end, function (field, wireType) {
+            if (field === 2) {
+                feature.tags = reader.packed();
+            } else if (field === 3) {
+                feature.type = reader.varint();
+            } else if (field === 4) {
+                feature.geometry = reader.packed();
+            } else {
+                reader.skip(wireType);
+            }
+        });
+        return feature;
+    }
+
+    function readLayer(reader) {
+        var end = reader.end(), layer = {name: "", extent: 4096, keys: [], values: [], features: []};
+        reader.fields(end, function (field, wireType) {
+            if (field === 1) {
+                layer.name = reader.string();
+            } else if (field === 2) {
+                layer.features.push(readFeature(reader));
+            } else if (field === 3) {
+                layer.keys.push(reader.string());
+            } else if (field === 4) {
+                layer.values.push(readValue(reader));
+            } else if (field === 5) {
+                layer.extent = reader.varint();
+            } else {
+                reader.skip(wireType);
+            }
+        });
+        return layer;
+    }
+
+    // Layers of an MVT tile by name; polygon features carry properties and rings in tile units
+    function decodeTile(bytes) {
+        var reader = new Reader(bytes), layers = {};
+        reader.fields(bytes.length, function (field, wireType) {
+            if (field !== 3) {
+                reader.skip(wireType);
+                return;
+            }
+            var layer = readLayer(reader);
+            layers[layer.name] = {
+                extent: layer.extent,
+                features: layer.features.filter(function (feature) { return feature.type === POLYGON; }).map(
+                    function (feature) {
+                        var properties = {};
+                        for (var i = 0; i + 1 < feature.tags.length; i += 2) {
+                            properties[layer.keys[feature.tags[i]]] = layer.values[feature.tags[i + 1]];
+                        }
+                        return {properties: properties, rings: decodeRings(feature.geometry)};
+                    }
+                )
+            };
+        });
+        return layers;
+    }
+
+    function decodeRings(commands) {
+        var rings = [], ring = null, x = 0, y = 0, i = 0;
+        var zigzag = function (n) { return n % 2 === 1 ? -(n + 1) / 2 : n / 2; };
+        while (i < commands.length) {
+            var command = commands[i] & 0x7, count = commands[i] >> 3;
+            i++;
+            if (command === CLOSE_PATH) {
+                ring = null;
+                continue;
+            }
+            for (var j = 0; j < count; j++) {
+                x += zigzag(commands[i++]);
+                y += zigzag(commands[i++]);
+                if (command === MOVE_TO) {
+                    ring = [];
+                    rings.push(ring);
+                }
+                if (ring !== null && (command === MOVE_TO || command === LINE_TO)) {
+                    ring.push([x, y]);
+                }
+            }
+        }
+        return rings;
+    }
+
+    var hitContext = document.createElement("canvas").getContext("2d");
+
+    var GrowthTileLayer = L.GridLayer.extend({
+        options: {
+            layer: "growth",
+            style: function () { return {}; }
+        },
+
+        initialize: function (url, options) {
+            this._url = url;
+            L.GridLayer.prototype.initialize.call(this, options);
+        },
+
+        onAdd: function (map) {
+            L.GridLayer.prototype.onAdd.call(this, map);
+            this._hovered = null;
+            map.on("mousemove", this._onMouseMove, this);
+        },
+
+        onRemove: function (map) {
+            map.off("mousemove", this._onMouseMove, this);
+            L.GridLayer.prototype.onRemove.call(this, map);
+        },
+
+        createTile: function (coords, done) {
+            var tile = L.DomUtil.create("canvas", "leaflet-tile");
+            var size = this.getTileSize();
+            tile.width = size.x;
+            tile.height = size.y;
+            tile.features = [];
+            var url = L.Util.template(this._url, {z: coords.z, x: coords.x, y: coords.y});
+            var self = this;
+            fetch(url).then(function (response) {
+                return response.ok ? response.arrayBuffer() : null;
+            }).then(function (buffer) {
+                var layer = buffer && buffer.byteLength ? decodeTile(new Uint8Array(buffer))[self.options.layer] : null;
+                if (layer) {
+                    self._drawTile(tile, layer, size);
+                }
+                done(null, tile);
+            }, function () {
+                // Tiles outside the field are not written
+                done(null, tile);
+            });
+            return tile;
+        },
+
+        _drawTile: function (tile, layer, size) {
+            var context = tile.getContext("2d");
+            var scale = size.x / layer.extent;
+            layer.features.forEach(function (feature) {
+                var path = new Path2D();
+                feature.rings.forEach(function (ring) {
+                    ring.forEach(function (point, i) {
+                        if (i === 0) {
+                            path.moveTo(point[0] * scale, point[1] * scale);
+                        } else {
+                            path.lineTo(point[0] * scale, point[1] * scale);
+                        }
+                    });
+                    path.closePath();
+                });
+                var style = this.options.style(feature.properties);
+                if (style.fill !== false) {
+                    context.globalAlpha = style.fillOpacity === undefined ? 0.2 : style.fillOpacity;
+                    context.fillStyle = style.fillColor || style.color || "#3388ff";
+                    context.fill(path, "evenodd");
+                }
+                if (style.weight) {
+                    context.globalAlpha = style.opacity === undefined ? 1 : style.opacity;
+                    context.strokeStyle = style.color || "#3388ff";
+                    context.lineWidth = style.weight;
+                    context.stroke(path);
+                }
+                tile.features.push({path: path, properties: feature.properties});
+            }, this);
+        },
+
+        _onMouseMove: function (e) {
+            var zoom = this._tileZoom;
+            if (zoom === undefined) {
+                return;
+            }
+            var size = this.getTileSize();
+            var point = this._map.project(e.latlng, zoom);
+            var coords = L.point(Math.floor(point.x / size.x), Math.floor(point.y / size.y));
+            coords.z = zoom;
+            var entry = this._tiles[this._tileCoordsToKey(coords)];
+            var x = point.x - coords.x * size.x, y = point.y - coords.y * size.y;
+            var hovered = null;
+            if (entry) {
+                for (var i = entry.el.features.length - 1; i >= 0; i--) {
+                    if (hitContext.isPointInPath(entry.el.features[i].path, x, y, "evenodd")) {
+                        hovered = entry.el.features[i];
+                        break;
+                    }
+                }
+            }
+            if (hovered !== this._hovered) {
+                this._hovered = hovered;
+                if (hovered) {
+                    this.fire("mouseover", {latlng: e.latlng, layer: {properties: hovered.properties}});
+                }
+            }
+        }
+    });
+
+    L.growthTileLayer = function (url, options) {
+        return new GrowthTileLayer(url, options);
+    };
+    global.decodeGrowthTile = decodeTile;
+})(this);
@@ -118,4 +118,38 @@ def calculate_ndvi(nir_band: np.ndarray, red_band: np.ndarray) -> np.ndarray:
 
 def calculate_ndwi(nir_band: np.ndarray, green: np.ndarray) -> np.ndarray:
     """Calculate Normalized Difference Water Index (NDWI)."""
-    return (nir_band - green) / (nir_band + green + 1e-10)
\ No newline at end of file
+    return (nir_band - green) / (nir_band + green + 1e-10)
+
+def majority_filter(labels: np.ndarray, kernel_size: int = 3, nodata: int = -1) -> np.ndarray:
+    """
+    Replace every labelled cell with the most frequent label in its
+    kernel_size x kernel_size neighbourhood (ties keep the original label).
+    Window counts come from one integral image per class, so the cost is
+    O(classes * cells) regardless of kernel size. Nodata cells are left untouched.
+    """
+    if kernel_size < 1 or kernel_size % 2 == 0:
+        raise ValueError(f"kernel_size must be a positive odd number, got {kernel_size}")
+    
+    valid = labels != nodata
+    classes = np.unique(labels[valid])
+    if kernel_size == 1 or classes.size < 2:
+        return labels.copy()
+    
+    pad = kernel_size // 2
+    best_label = labels.copy()
+    best_count = np.zeros(labels.shape, dtype=np.int32)
+    own_count = np.zeros(labels.shape, dtype=np.int32)
+    for value in classes:
+        is_class = labels == value
+        integral = np.pad(
+            np.pad(is_class.astype(np.int32), pad).cumsum(axis=0).cumsum(axis=1),
+            ((1, 0), (1, 0))
+        )
+        k = kernel_size
+        counts = integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+        better = counts > best_count
+        best_label[better] = value
+        best_count[better] = counts[better]
+        own_count[is_class] = counts[is_class]
+    
+    return np.where(valid & (best_count > own_count), best_label, labels).astype(labels.dtype)
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+WEB_ASSETS_DIR = Path(__file__).resolve().parents[1] / "src" / "App" / "resource" / "web"
+
+
+class StubConfig:
+    """The Config properties the components read, sized for small test rasters."""
+
+    patch_size = 64
+    window_patches = 4
+    min_pixel_sum_threshold = 5000
+    band_mapping_type = "ODM"
+    band_mappings = {"ODM": {"RED": 0, "GREEN": 1, "BLUE": 2, "NIR": 3, "RED_EDGE": 4}}
+    growth_stages = ["germination", "tillering", "grand_growth", "ripening"]
+    default_colors = {
+        "germination": "#B3E5FC", "tillering": "#8BC34A", "grand_growth": "#4CAF50", "ripening": "#FFEB3B", None: "#808080"
+    }
+    cascade_enabled = False
+    cascade_confidence_threshold = 0.8
+    vectorization_tile_size = 1024
+    vectorization_workers = 1
+    emit_wgs84 = False
+    smoothing_enabled = False
+    smoothing_kernel_size = 3
+    smoothing_min_region_size = 4
+    write_probability_raster = False
+    write_cell_table = False
+    map_mode = "leaflet"
+    map_assets = "local"
+    map_min_zoom = 12
+    map_max_zoom = 19
+    map_server_port = 0
+    map_server_cache_size = 8
+    topojson_quantization = 100000
+    topojson_zoom_brackets = [(14, 1.0), (16, 1.0), (18, 0.5)]
+    basemap_source = "online"
+    basemap_max_zoom = 18
+    backdrop_enabled = False
+    web_assets_dir = WEB_ASSETS_DIR
+
+    def __init__(self, root: Path, **overrides):
+        self.model_path = root / "model.joblib"
+        self.fast_model_path = root / "fast_model.joblib"
+        self.output_dir = root / "output"
+        for name, value in overrides.items():
+            setattr(self, name, value)
+
+
+@pytest.fixture
+def config(tmp_path):
+    """A StubConfig with small growth-stage models trained on synthetic patch features."""
+    rng = np.random.default_rng(1)
+    features = rng.normal(size=(400, 6))
+    features[:, 0] = rng.uniform(-1, 1, 400)
+    features[:, 4] = rng.uniform(0, 9000, 400)
+    labels = np.digitize(features[:, 0], [-0.3, 0.0, 0.3])
+    config = StubConfig(tmp_path)
+    joblib.dump(RandomForestClassifier(20, random_state=0).fit(features, labels), config.model_path)
+    joblib.dump(LogisticRegression(max_iter=500).fit(features, labels), config.fast_model_path)
+    return config
+
+
+@pytest.fixture
+def orthophoto(tmp_path):
+    """A 5-band float32 orthophoto in UTM with distinct quadrants and a nodata corner."""
+    height, width = 640, 768
+    rng = np.random.default_rng(0)
+    data = rng.uniform(100, 3000, size=(5, height, width)).astype(np.float32)
+    data[3, : height // 2] *= 3
+    data[0, :, : width // 2] *= 2
+    data[:, -70:, -90:] = 0
+    path = tmp_path / "odm_orthophoto.tif"
+    with rasterio.open(
+        path, "w", driver="GTiff", height=height, width=width, count=5, dtype="float32",
+        crs="EPSG:32644", transform=from_origin(500000, 800000, 0.05, 0.05), nodata=0
+    ) as dst:
+        dst.write(data)
+    return path
@@ -0,0 +1,35 @@
+import json
+import urllib.request
+
+import geopandas as gpd
+
+from src.App.component.map_server import FEATURES_SUFFIX, MapServer, ServerMapWriter
+from src.App.component.tiff_processor import TiffProcessor
+
+
+def test_write_map_from_in_memory_result(config, orthophoto, tmp_path):
+    config.map_mode = "server"
+    geo_data = TiffProcessor(config).process_field(orthophoto, tmp_path / "run", in_memory=True).to_crs("EPSG:4326")
+    assert "label_grid" in geo_data.attrs
+
+    map_path = config.output_dir / "field.html"
+    config.output_dir.mkdir()
+    ServerMapWriter(config).write_map(geo_data, map_path)
+
+    store = gpd.read_parquet(config.output_dir / f"field{FEATURES_SUFFIX}")
+    assert len(store) == len(geo_data)
+    assert list(store.columns) == ["growth_stage", "geometry"]
+    assert map_path.exists()
+
+    server = MapServer(config)
+    base_url = f"http://127.0.0.1:{server.start()}"
+    try:
+        west, south, east, north = geo_data.total_bounds
+        url = f"{base_url}/features/field?bbox={west},{south},{east},{north}&zoom=18"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            features = json.load(response)["features"]
+        assert {f["properties"]["growth_stage"] for f in features} == set(geo_data["growth_stage"].dropna())
+        with urllib.request.urlopen(f"{base_url}/assets/leaflet.js", timeout=10) as response:
+            assert response.status == 200
+    finally:
+        server.stop()
@@ -0,0 +1,147 @@
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.App.component import odm_backend
+from src.App.component.odm_backend import ORTHOPHOTO, TASK_STATE_FILE, NodeOdmBackend
+
+ODM_ARGS = [
+    "--orthophoto-resolution", "0.02", "--max-concurrency", "4", "--rerun-from", "dataset",
+    "--end-with", "odm_orthophoto", "--skip-3dmodel", "--split", "300"
+]
+
+
+class NodeOdmStub:
+    """A NodeODM API on loopback: tasks complete after two polls and serve a fake orthophoto."""
+
+    def __init__(self, queue_count=0, fail_uploads=()):
+        self.queue_count = queue_count
+        # Upload request numbers (1-based) answered with HTTP 500
+        self.fail_uploads = set(fail_uploads)
+        self.upload_requests = 0
+        self.tasks = {}
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b"", content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def reply_json(self, data):
+                self.reply(200, json.dumps(data).encode())
+
+            def do_GET(self):
+                stub.requests.append(("GET", self.path))
+                path = self.path.split("?")[0]
+                if path == "/info":
+                    return self.reply_json({"version": "2.0.0", "taskQueueCount": stub.queue_count, "maxImages": None})
+                match = re.fullmatch(r"/task/([^/]+)/info", path)
+                if match and match.group(1) in stub.tasks:
+                    task = stub.tasks[match.group(1)]
+                    task["polls"] += 1
+                    return self.reply_json({
+                        "uuid": match.group(1), "name": "field", "dateCreated": 0, "processingTime": 1000,
+                        "status": {"code": 40 if task["polls"] > 2 else 20}, "options": [],
+                        "imagesCount": len(task["images"]), "progress": min(100, task["polls"] * 50), "output": []
+                    })
+                match = re.fullmatch(r"/task/([^/]+)/download/orthophoto\.tif", path)
+                if match and match.group(1) in stub.tasks:
+                    return self.reply(200, b"orthophoto" * 1000, "image/tiff")
+                self.reply_json({"error": "Not found"})
+
+            def do_POST(self):
+                stub.requests.append(("POST", self.path))
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/task/new/init":
+                    task_id = str(uuid.uuid4())
+                    options = re.search(rb'name="options"\r\n\r\n(.*?)\r\n--', body, re.S).group(1)
+                    stub.tasks[task_id] = {"options": json.loads(options), "images": [], "polls": 0}
+                    return self.reply_json({"uuid": task_id})
+                match = re.fullmatch(r"/task/new/upload/(.+)", self.path)
+                if match and match.group(1) in stub.tasks:
+                    stub.upload_requests += 1
+                    if stub.upload_requests in stub.fail_uploads:
+                        return self.reply(500)
+                    stub.tasks[match.group(1)]["images"] += [n.decode() for n in re.findall(rb'filename="([^"]+)"', body)]
+                    return self.reply_json({"success": True})
+                match = re.fullmatch(r"/task/new/commit/(.+)", self.path)
+                if match and match.group(1) in stub.tasks:
+                    return self.reply_json({"uuid": match.group(1)})
+                self.reply_json({"error": "Invalid uuid"})
+
+        return Handler
+
+
+@pytest.fixture
+def nodes():
+    stubs = []
+
+    def start(**kwargs):
+        stubs.append(NodeOdmStub(**kwargs))
+        return stubs[-1]
+
+    yield start
+    for stub in stubs:
+        stub.server.shutdown()
+        stub.server.server_close()
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    # No back-off between upload retries
+    monkeypatch.setattr(odm_backend.time, "sleep", lambda seconds: None)
+    project_dir = tmp_path / "project"
+    (project_dir / "images").mkdir(parents=True)
+    for i in range(4):
+        (project_dir / "images" / f"IMG_{i:04d}.tif").write_bytes(bytes([i]) * 2048)
+    return project_dir
+
+
+def backend(config, *urls):
+    config.odm_backend = "nodeodm"
+    config.odm_nodes = list(urls)
+    config.odm_parallel_uploads = 1
+    config.odm_poll_interval = 0
+    return NodeOdmBackend(config)
+
+
+def test_node_selection_skips_unreachable_node(config, nodes):
+    busy, idle = nodes(queue_count=3), nodes(queue_count=0)
+    log = []
+    url = backend(config, "http://127.0.0.1:1", busy.url, idle.url).select_node(4, log.append)
+    assert url == idle.url
+    assert any("http://127.0.0.1:1 unavailable" in line for line in log)
+
+
+def test_run_retries_failed_upload_and_downloads_only_orthophoto(config, nodes, project):
+    node = nodes(fail_uploads=[2])
+    orthophoto = backend(config, node.url).run(project, ODM_ARGS, [], lambda line: None)
+
+    assert orthophoto == project / ORTHOPHOTO
+    assert orthophoto.read_bytes() == b"orthophoto" * 1000
+    assert not (project / TASK_STATE_FILE).exists()
+    (task,) = node.tasks.values()
+    # The upload answered with 500 was sent again, and every image arrived once
+    assert node.upload_requests == 5
+    assert sorted(task["images"]) == sorted(p.name for p in (project / "images").iterdir())
+
+    options = {option["name"]: option["value"] for option in task["options"]}
+    assert options == {"orthophoto-resolution": 0.02, "skip-3dmodel": True, "split": 300}
+    downloads = [path for _, path in node.requests if "/download/" in path]
+    assert downloads == [f"/task/{next(iter(node.tasks))}/download/orthophoto.tif"]
@@ -0,0 +1,56 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from rasterio import features
+from rasterio.transform import from_origin
+from scipy import ndimage
+
+from src.App.component.topojson_writer import OBJECT_NAME, TopoJsonMapWriter
+
+
+def stage_polygons(config, size=120):
+    """Growth-stage regions of a noisy 3.2 m label grid, as the vectorizer emits them."""
+    stages = config.growth_stages
+    labels = ndimage.median_filter(np.random.default_rng(5).integers(0, 4, size=(size, size)).astype(np.uint8), size=2)
+    transform = from_origin(81.0, 7.25, 3.2 / 111320, 3.2 / 111320)
+    shapes = list(features.shapes(labels, transform=transform))
+    return gpd.GeoDataFrame(
+        {"growth_stage": [stages[int(value)] for _, value in shapes]},
+        geometry=[shapely.geometry.shape(geometry) for geometry, _ in shapes],
+        crs="EPSG:4326"
+    )
+
+
+def decode(topology, arcs):
+    """Polygons of every feature, decoded from delta-encoded arcs like topojson-client does."""
+    points = [np.cumsum(np.array(arc), axis=0) for arc in arcs]
+    scale, translate = (np.array(topology["transform"][key]) for key in ("scale", "translate"))
+
+    def ring(references):
+        parts = [points[i] if i >= 0 else points[~i][::-1] for i in references]
+        return np.vstack([parts[0]] + [part[1:] for part in parts[1:]]) * scale + translate
+
+    polygons = []
+    for geometry in topology["objects"][OBJECT_NAME]["geometries"]:
+        for polygon in [geometry["arcs"]] if geometry["type"] == "Polygon" else geometry["arcs"]:
+            rings = [ring(references) for references in polygon]
+            polygons.append(shapely.Polygon(rings[0], rings[1:]) if all(len(r) >= 4 for r in rings) else None)
+    return polygons
+
+
+def test_every_zoom_bracket_decodes_to_valid_polygons(config):
+    geo_data = stage_polygons(config)
+    topology, brackets = TopoJsonMapWriter(config).encode(geo_data)
+
+    arc_sets = [bracket["arcs"] for bracket in brackets] + [topology["arcs"]]
+    point_counts = [sum(len(arc) for arc in arcs) for arcs in arc_sets]
+    assert brackets, "the coarse brackets should simplify this grid"
+    # No duplicate arc sets: each bracket removes points, ordered from coarse to the deepest in topology
+    assert point_counts == sorted(set(point_counts))
+    assert [bracket["max_zoom"] for bracket in brackets] == sorted(bracket["max_zoom"] for bracket in brackets)
+
+    expected_area = shapely.area(geo_data.geometry.values).sum()
+    for arcs in arc_sets:
+        polygons = decode(topology, arcs)
+        assert all(polygon is not None and polygon.is_valid for polygon in polygons)
+        assert abs(shapely.area(np.array(polygons)).sum() - expected_area) < 0.01 * expected_area
@@ -0,0 +1,25 @@
+import re
+
+import pytest
+
+from src.App.component.web_map import MODE_ASSETS, WEB_ASSETS, missing_web_assets, render_leaflet_page
+
+
+@pytest.mark.parametrize("mode", ["leaflet", *MODE_ASSETS])
+def test_every_map_mode_has_its_assets_in_the_repository(config, mode):
+    config.map_mode = mode
+    assert missing_web_assets(config) == []
+
+    config.map_assets = "inline"
+    page = render_leaflet_page(config, "field", (81.0, 7.2, 81.1, 7.3), "", js=MODE_ASSETS.get(mode, []))
+    # Nothing is fetched for the page itself; only basemap tiles come from the network
+    assert not re.search(r'<(script|link)[^>]+(src|href)=', page)
+    for name in MODE_ASSETS.get(mode, []):
+        assert (config.web_assets_dir / name).read_text(encoding="utf-8").splitlines()[0] in page
+
+
+def test_cdn_assets_keep_the_repository_scripts_local(config):
+    config.map_assets = "cdn"
+    page = render_leaflet_page(config, "field", (81.0, 7.2, 81.1, 7.3), "", js=MODE_ASSETS["topojson"])
+    assert WEB_ASSETS["leaflet.js"] in page
+    assert (config.web_assets_dir / "topojson-feature.js").resolve().as_uri() in page